@@ -12,7 +12,7 @@ import os
 # Añade el directorio padre al path para importar los módulos
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.tracker import Tracker
+from src.tracker import Tracker, ejecutar
 
 
 # Configuración de la página
@@ -108,7 +108,7 @@ def pagina_inicio():
         with col1:
             if st.button("🔄 Actualizar Todos los Precios", type="primary"):
                 with st.spinner("Actualizando precios..."):
-                    resultados = tracker.actualizar_todos_los_precios()
+                    resultados = ejecutar(tracker.actualizar_todos_los_precios())
                     
                     exitos = sum(1 for r in resultados if r['exito'])
                     st.success(f"✅ Se actualizaron {exitos} de {len(resultados)} productos")
@@ -142,7 +142,7 @@ def pagina_agregar_producto():
         
         if test_url and url:
             with st.spinner("Probando URL..."):
-                resultado = tracker.probar_url(url)
+                resultado = ejecutar(tracker.probar_url(url))
                 
                 if resultado['accesible']:
                     if resultado['precio']:
@@ -158,7 +158,7 @@ def pagina_agregar_producto():
             else:
                 with st.spinner("Añadiendo producto..."):
                     precio_obj = precio_objetivo if precio_objetivo > 0 else None
-                    resultado = tracker.agregar_producto(nombre, url, precio_obj)
+                    resultado = ejecutar(tracker.agregar_producto(nombre, url, precio_obj))
                     
                     if resultado['exito']:
                         st.success(resultado['mensaje'])
@@ -211,7 +211,7 @@ def pagina_productos_seguidos():
         with col1:
             if st.button("🔄 Actualizar Precio"):
                 with st.spinner("Actualizando..."):
-                    resultado = tracker.actualizar_precio(producto_id)
+                    resultado = ejecutar(tracker.actualizar_precio(producto_id))
                     
                     if resultado['exito']:
                         st.success(f"✅ Precio actualizado: ${resultado['precio_actual']:.2f}")
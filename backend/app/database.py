@@ -62,24 +62,46 @@ class Producto(Base):
     precio_actual = Column(Float, nullable=True)
     precio_objetivo = Column(Float, nullable=True)
     tienda = Column(String, nullable=True)  # Amazon, MercadoLibre, etc.
+    listing_id = Column(Integer, ForeignKey("listings.id"), nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relaciones
     user = relationship("User", back_populates="productos")
+    listing = relationship("Listing", back_populates="productos")
+    # Registros anteriores a los listados: son solo de este producto y se borran con él
     historial = relationship("HistorialPrecio", back_populates="producto", cascade="all, delete-orphan")
 
 
+class Listing(Base):
+    """Modelo de listado compartido: una página de producto única por URL canónica"""
+    __tablename__ = "listings"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    url_canonica = Column(String, unique=True, index=True, nullable=False)
+    tienda = Column(String, nullable=True)
+    precio_actual = Column(Float, nullable=True)
+    ultima_actualizacion = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relaciones
+    productos = relationship("Producto", back_populates="listing")
+    historial = relationship("HistorialPrecio", back_populates="listing")
+
+
 class HistorialPrecio(Base):
-    """Modelo de historial de precios"""
+    """Modelo de historial de precios (uno por listado, compartido entre usuarios)"""
     __tablename__ = "historial_precios"
     
     id = Column(Integer, primary_key=True, index=True)
-    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False, index=True)
+    listing_id = Column(Integer, ForeignKey("listings.id"), nullable=True, index=True)
+    # Solo en registros creados antes de la tabla de listados
+    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=True, index=True)
     precio = Column(Float, nullable=False)
     fecha = Column(DateTime, default=datetime.utcnow, index=True)
     
     # Relaciones
+    listing = relationship("Listing", back_populates="historial")
     producto = relationship("Producto", back_populates="historial")
 
 
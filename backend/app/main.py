@@ -17,8 +17,14 @@ load_dotenv()
 # Añadir el directorio raíz al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from backend.app.routers import auth, productos_auth, feedback, historial, alertas
+from backend.app.routers import auth, productos_auth, feedback, historial, alertas, scraper
 from backend.app.database import init_db
+from src.browser_sessions import get_session_store
+from src.http_client import close_http_engine
+from src.extraction_executor import close_extraction_executor
+from src.extraction_stats import get_extraction_stats
+from src.fetch_ladder import get_fetch_ladder
+from src.rate_limiter import get_domain_scheduler
 
 
 # Configuración de eventos de inicio/cierre
@@ -63,14 +69,61 @@ async def lifespan(app: FastAPI):
                     END IF;
                 END $$;
             """))
+            # Listados compartidos: productos.listing_id e historial por listado
+            conn.execute(text("""
+                DO $$ 
+                BEGIN
+                    IF NOT EXISTS (SELECT 1 FROM information_schema.columns 
+                                  WHERE table_name='productos' AND column_name='listing_id') THEN
+                        ALTER TABLE productos ADD COLUMN listing_id INTEGER REFERENCES listings(id);
+                        CREATE INDEX IF NOT EXISTS ix_productos_listing_id ON productos(listing_id);
+                    END IF;
+                    IF NOT EXISTS (SELECT 1 FROM information_schema.columns 
+                                  WHERE table_name='historial_precios' AND column_name='listing_id') THEN
+                        ALTER TABLE historial_precios ADD COLUMN listing_id INTEGER REFERENCES listings(id);
+                        CREATE INDEX IF NOT EXISTS ix_historial_precios_listing_id ON historial_precios(listing_id);
+                    END IF;
+                    ALTER TABLE historial_precios ALTER COLUMN producto_id DROP NOT NULL;
+                END $$;
+            """))
             conn.commit()
             print("Migraciones completadas exitosamente")
     except Exception as e:
         print(f"Error en migraciones: {str(e)}")
+    try:
+        from backend.app.database import SessionLocal
+        from backend.app.services.listings import asignar_listings_pendientes
+        db = SessionLocal()
+        try:
+            migrados = asignar_listings_pendientes(db)
+            if migrados:
+                print(f"Productos vinculados a listados compartidos: {migrados}")
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"Error al vincular listados: {str(e)}")
     print("Base de datos lista")
+    # Lanzar el navegador una sola vez por proceso (Playwright es opcional)
+    if os.getenv("BROWSER_POOL_ENABLED", "True") == "True":
+        try:
+            from src.browser_pool import get_browser_pool
+            await get_browser_pool().start()
+        except Exception as e:
+            print(f"⚠️  Pool de navegadores no disponible: {e}")
     yield
     # Shutdown
     print("Cerrando Price Tracker API...")
+    await close_http_engine()
+    close_extraction_executor()
+    get_extraction_stats().save()
+    get_fetch_ladder().save()
+    get_session_store().save()
+    get_domain_scheduler().save()
+    try:
+        from src.browser_pool import close_browser_pool
+        await close_browser_pool()
+    except ImportError:
+        pass
 
 
 # Crear aplicación FastAPI
@@ -172,7 +225,13 @@ async def root():
 # Health check
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "version": "3.0.0"}
+    resultado = {"status": "healthy", "version": "3.0.0"}
+    try:
+        from src.browser_pool import get_browser_pool
+        resultado["browser_pool"] = await get_browser_pool().health_check()
+    except ImportError:
+        resultado["browser_pool"] = None
+    return resultado
 
 
 # Incluir routers
@@ -181,6 +240,7 @@ app.include_router(productos_auth.router, prefix="/api")
 app.include_router(feedback.router, prefix="/api")
 app.include_router(historial.router, prefix="/api")
 app.include_router(alertas.router, prefix="/api")
+app.include_router(scraper.router, prefix="/api")
 
 
 if __name__ == "__main__":
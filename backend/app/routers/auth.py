@@ -465,6 +465,7 @@ async def clear_all_users(
         db.execute(text("DELETE FROM email_verifications"))
         db.execute(text("DELETE FROM historial_precios"))
         db.execute(text("DELETE FROM productos"))
+        db.execute(text("DELETE FROM listings"))
         db.execute(text("DELETE FROM users"))
         db.commit()
         
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 from ..database import get_db, Producto as ProductoModel, HistorialPrecio, User
 from ..schemas import PrecioHistorial
 from ..security import get_current_active_user
+from ..services.listings import historial_de_producto
 
 router = APIRouter(prefix="/historial", tags=["Historial"])
 
@@ -29,9 +30,7 @@ async def obtener_historial(
             detail="Producto no encontrado"
         )
     
-    historial = db.query(HistorialPrecio).filter(
-        HistorialPrecio.producto_id == producto_id
-    ).order_by(HistorialPrecio.fecha.asc()).all()
+    historial = historial_de_producto(db, producto).order_by(HistorialPrecio.fecha.asc()).all()
     
     return [
         PrecioHistorial(
@@ -6,11 +6,11 @@ Author: HellSpawn
 """
 from fastapi import APIRouter, HTTPException, status, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from sqlalchemy import and_, func, or_
+from typing import List, Set
 from datetime import datetime
 
-from ..database import get_db, Producto as ProductoModel, HistorialPrecio, User
+from ..database import get_db, Producto as ProductoModel, HistorialPrecio, Listing, User
 from ..schemas import (
     Producto, ProductoCreate, ProductoUpdate, ProductoDetalle,
     TestURLRequest, TestURLResponse, ActualizarPrecioResponse,
@@ -18,14 +18,33 @@ from ..schemas import (
 )
 from ..security import get_current_active_user
 from ..utils import detectar_tienda, calcular_ahorro_porcentual
+from ..services.listings import obtener_o_crear_listing, registrar_precio, historial_de_producto
 
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 from src.scraper import PriceScraper
+from src.rate_limiter import get_domain_scheduler
+from src.result_cache import get_result_cache
+from src.urls import canonical_url
+from src.render_admission import RenderRejected, render_user
 
 router = APIRouter(prefix="/productos", tags=["Productos"])
 scraper = PriceScraper()
+scrape_scheduler = get_domain_scheduler()
+# /test-url deja aquí su resultado: crear el producto justo después no repite el scrape
+result_cache = get_result_cache()
+# Llamadas interactivas (test-url, actualizar un producto) en modo carrera: menor latencia
+RACE_INTERACTIVE = os.getenv("SCRAPER_RACE_INTERACTIVE", "False") == "True"
+
+
+def _render_saturado(e: RenderRejected) -> HTTPException:
+    """Respuesta 503 cuando no hubo turno de render (cola llena o espera agotada)"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
 
 
 @router.get("/", response_model=List[Producto])
@@ -44,9 +63,7 @@ async def listar_productos(
     resultado = []
     for p in productos:
         # Obtener estadísticas del historial
-        historial = db.query(HistorialPrecio).filter(
-            HistorialPrecio.producto_id == p.id
-        ).all()
+        historial = historial_de_producto(db, p).all()
         
         precios = [h.precio for h in historial]
         precio_min = min(precios) if precios else None
@@ -100,9 +117,7 @@ async def obtener_producto(
         )
     
     # Obtener historial ordenado por fecha
-    historial = db.query(HistorialPrecio).filter(
-        HistorialPrecio.producto_id == producto_id
-    ).order_by(HistorialPrecio.fecha.desc()).all()
+    historial = historial_de_producto(db, producto).order_by(HistorialPrecio.fecha.desc()).all()
     
     precios = [h.precio for h in historial]
     precio_min = min(precios) if precios else None
@@ -141,10 +156,10 @@ async def crear_producto(
     Crear un nuevo producto y obtener su precio inicial
     Se asocia automáticamente al usuario actual
     """
-    # Verificar duplicados por URL para el mismo usuario
-    existente = db.query(ProductoModel).filter(
+    # Verificar duplicados por listado (misma URL canónica) para el mismo usuario
+    existente = db.query(ProductoModel).outerjoin(Listing).filter(
         ProductoModel.user_id == current_user.id,
-        ProductoModel.url == producto.url
+        or_(Listing.url_canonica == canonical_url(producto.url), ProductoModel.url == producto.url)
     ).first()
     if existente:
         raise HTTPException(
@@ -152,40 +167,44 @@ async def crear_producto(
             detail="Este producto ya fue registrado"
         )
 
+    # Los renders de esta petición se atribuyen al usuario (turnos rotativos)
+    render_user.set(str(current_user.id))
     try:
-        precio_inicial = None
+        # Si la URL se acaba de probar en /test-url se reutiliza ese precio
+        guardado = result_cache.lookup(producto.url)
+        precio_inicial = guardado['precio'] if guardado else None
         try:
-            precio_inicial = await scraper.get_price(producto.url)
+            if precio_inicial is None:
+                precio_inicial = await scraper.get_price(producto.url)
+            else:
+                print(f"♻️  Precio de /test-url reutilizado para {producto.url}: ${precio_inicial}")
         except Exception as scraping_error:
             # Log y continuar para permitir registro manual
             print(f"Error al obtener precio inicial: {scraping_error}")
         
         nueva_tienda = detectar_tienda(producto.url)
+        listing = obtener_o_crear_listing(db, producto.url)
         nuevo_producto = ProductoModel(
             user_id=current_user.id,
             nombre=producto.nombre,
             url=producto.url,
             precio_objetivo=producto.precio_objetivo,
-            precio_actual=precio_inicial,
-            tienda=nueva_tienda
+            precio_actual=precio_inicial if precio_inicial is not None else listing.precio_actual,
+            tienda=nueva_tienda,
+            listing_id=listing.id
         )
         
         db.add(nuevo_producto)
         db.flush()
         
         if precio_inicial is not None:
-            historial = HistorialPrecio(
-                producto_id=nuevo_producto.id,
-                precio=precio_inicial
-            )
-            db.add(historial)
+            # El historial es del listado: lo comparten todos sus dueños
+            registrar_precio(db, listing, precio_inicial)
         
         db.commit()
         db.refresh(nuevo_producto)
         
-        historial_registros = db.query(HistorialPrecio).filter(
-            HistorialPrecio.producto_id == nuevo_producto.id
-        ).all()
+        historial_registros = historial_de_producto(db, nuevo_producto).all()
         precios = [registro.precio for registro in historial_registros]
         precio_min = min(precios) if precios else None
         precio_max = max(precios) if precios else None
@@ -251,9 +270,7 @@ async def actualizar_producto(
     db.refresh(producto)
     
     # Obtener estadísticas
-    historial = db.query(HistorialPrecio).filter(
-        HistorialPrecio.producto_id == producto_id
-    ).all()
+    historial = historial_de_producto(db, producto).all()
     
     precios = [h.precio for h in historial]
     precio_min = min(precios) if precios else None
@@ -285,7 +302,8 @@ async def eliminar_producto(
     db: Session = Depends(get_db)
 ):
     """
-    Eliminar un producto y todo su historial
+    Eliminar un producto y sus registros de historial anteriores a los listados
+    El listado y su historial compartido se conservan para los demás usuarios
     Solo puede eliminar el dueño del producto
     """
     producto = db.query(ProductoModel).filter(
@@ -326,9 +344,10 @@ async def actualizar_precio(
             detail="Producto no encontrado"
         )
     
+    render_user.set(str(current_user.id))
     try:
         # Obtener nuevo precio
-        nuevo_precio = await scraper.get_price(producto.url)
+        nuevo_precio = await scraper.get_price(producto.url, race=RACE_INTERACTIVE)
         
         if nuevo_precio is None:
             return ActualizarPrecioResponse(
@@ -339,16 +358,11 @@ async def actualizar_precio(
                 alerta=False
             )
         
-        # Actualizar precio actual
+        # Actualizar precio actual e historial del listado (para todos sus dueños)
+        if producto.listing is None:
+            producto.listing = obtener_o_crear_listing(db, producto.url)
         producto.precio_actual = nuevo_precio
-        db.commit()
-        
-        # Agregar al historial
-        historial = HistorialPrecio(
-            producto_id=producto_id,
-            precio=nuevo_precio
-        )
-        db.add(historial)
+        registrar_precio(db, producto.listing, nuevo_precio)
         db.commit()
         
         alerta = False
@@ -365,6 +379,8 @@ async def actualizar_precio(
             alerta=alerta
         )
     
+    except RenderRejected as e:
+        raise _render_saturado(e)
     except Exception as e:
         return ActualizarPrecioResponse(
             exito=False,
@@ -389,10 +405,17 @@ async def actualizar_todos_precios(
     ).all()
     
     resultados = []
+    registrados: Set[int] = set()
+    
+    # MercadoLibre en lote vía API; el resto en paralelo entre tiendas,
+    # respetando los límites de cada dominio
+    render_user.set(str(current_user.id))
+    precios = await scraper.get_prices([p.url for p in productos], scheduler=scrape_scheduler)
     
-    for producto in productos:
+    for producto, nuevo_precio in zip(productos, precios):
         try:
-            nuevo_precio = await scraper.get_price(producto.url)
+            if isinstance(nuevo_precio, Exception):
+                raise nuevo_precio
             
             if nuevo_precio is None:
                 resultados.append(ActualizarPrecioResponse(
@@ -406,11 +429,12 @@ async def actualizar_todos_precios(
             
             producto.precio_actual = nuevo_precio
             
-            historial = HistorialPrecio(
-                producto_id=producto.id,
-                precio=nuevo_precio
-            )
-            db.add(historial)
+            # Un registro por listado, aunque el usuario tenga variantes de la URL
+            if producto.listing is None:
+                producto.listing = obtener_o_crear_listing(db, producto.url)
+            if producto.listing.id not in registrados:
+                registrar_precio(db, producto.listing, nuevo_precio)
+                registrados.add(producto.listing.id)
             
             alerta = False
             if producto.precio_objetivo and nuevo_precio <= producto.precio_objetivo:
@@ -448,25 +472,27 @@ async def test_url(
     Probar si una URL es accesible y se puede extraer el precio
     No requiere crear el producto
     """
+    render_user.set(str(current_user.id))
     try:
         print(f"🔍 [test_url] Probando URL: {request.url}")
-        precio = await scraper.get_price(request.url)
-        print(f"📊 [test_url] Precio obtenido: {precio}")
+        # Una sola descarga con desglose de tiempos y nivel de extracción
+        diagnostico = await scraper.test_url(request.url, race=RACE_INTERACTIVE)
+        print(f"📊 [test_url] Precio obtenido: {diagnostico['precio']} ({diagnostico['tier']}) "
+              f"en {diagnostico['tiempos'].get('total_ms')} ms")
         
         from urllib.parse import urlparse
-        domain = urlparse(request.url).netloc
+        diagnostico['domain'] = urlparse(request.url).netloc
         
-        if precio is None:
+        if diagnostico['precio'] is None:
             print("⚠️ [test_url] Precio es None, retornando error")
+            diagnostico['accesible'] = False
+            diagnostico['error'] = diagnostico['error'] or "No se pudo extraer el precio"
         
-        return TestURLResponse(
-            url=request.url,
-            accesible=precio is not None,
-            precio=precio,
-            error=None if precio else "No se pudo extraer el precio",
-            domain=domain
-        )
+        return TestURLResponse(**diagnostico)
     
+    except RenderRejected as e:
+        print(f"⏳ [test_url] Render rechazado: {e}")
+        raise _render_saturado(e)
     except Exception as e:
         print(f"❌ [test_url] Excepción capturada: {type(e).__name__}: {e}")
         import traceback
@@ -506,18 +532,24 @@ async def obtener_estadisticas(
         if p.precio_actual <= p.precio_objetivo
     )
     
-    # Total de registros en historial
-    producto_ids = [p.id for p in db.query(ProductoModel.id).filter(
+    # Total de registros en historial (de los listados que rastrea el usuario)
+    propios = db.query(ProductoModel.id, ProductoModel.listing_id).filter(
         ProductoModel.user_id == current_user.id
-    ).all()]
+    ).all()
+    producto_ids = [p.id for p in propios]
+    listing_ids = [p.listing_id for p in propios if p.listing_id is not None]
+    filtro_historial = or_(
+        and_(HistorialPrecio.listing_id.in_(listing_ids), HistorialPrecio.producto_id.is_(None)),
+        HistorialPrecio.producto_id.in_(producto_ids)
+    )
     
     total_registros = db.query(func.count(HistorialPrecio.id)).filter(
-        HistorialPrecio.producto_id.in_(producto_ids)
+        filtro_historial
     ).scalar() if producto_ids else 0
     
     # Última actualización
     ultimo_registro = db.query(HistorialPrecio).filter(
-        HistorialPrecio.producto_id.in_(producto_ids)
+        filtro_historial
     ).order_by(HistorialPrecio.fecha.desc()).first() if producto_ids else None
     
     return EstadisticasResponse(
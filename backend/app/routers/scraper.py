@@ -0,0 +1,142 @@
+"""
+Router de diagnóstico del scraper - Estadísticas de extracción, cachés y pool de procesos
+Requiere token JWT
+
+Author: HellSpawn
+"""
+from fastapi import APIRouter, Depends
+from typing import Any, Dict
+
+from ..database import User
+from ..security import get_current_active_user
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from src.browser_sessions import get_session_store
+from src.circuit_breaker import get_circuit_breakers
+from src.extraction_executor import get_extraction_executor
+from src.extraction_stats import get_extraction_stats
+from src.fetch_ladder import get_fetch_ladder
+from src.http_cache import get_http_cache
+from src.rate_limiter import get_domain_scheduler
+from src.render_admission import get_render_admission
+from src.result_cache import get_result_cache
+
+router = APIRouter(prefix="/scraper", tags=["Scraper"])
+
+
+@router.get("/extraccion")
+async def estadisticas_extraccion(
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """
+    Estadísticas por tienda de cada selector y nivel de extracción
+
+    Un selector con `caido: true` acumula varios fallos seguidos: probablemente
+    la tienda cambió su diseño. Requiere autenticación.
+    """
+    return get_extraction_stats().stats()
+
+
+@router.get("/estrategias")
+async def estadisticas_estrategias(
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """
+    Escalera de estrategias por host
+
+    `base` es la estrategia por la que empieza cada scrape ('api', 'static',
+    'cookies' o 'render'); `niveles` cuenta éxitos y fallos de cada una.
+    Requiere autenticación.
+    """
+    return get_fetch_ladder().stats()
+
+
+@router.get("/circuitos")
+async def estado_circuitos(
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """
+    Circuit breakers por tienda
+
+    `state` es 'closed' (normal), 'open' (la tienda encadenó fallos y sus
+    scrapes fallan al instante durante `retry_in_s`) o 'half_open' (una
+    petición de prueba en curso). `rejected` cuenta peticiones no enviadas.
+    Requiere autenticación.
+    """
+    return get_circuit_breakers().stats()
+
+
+@router.get("/limites")
+async def limites_por_tienda(
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """
+    Límites de ritmo y concurrencia por tienda
+
+    Con SCRAPER_AIMD se aprenden solos: suben poco a poco con cada respuesta
+    sana y se recortan a la mitad ante un 429, un 503 o una página de captcha.
+    `throttles` cuenta esas señales.
+    Requiere autenticación.
+    """
+    return get_domain_scheduler().stats()
+
+
+@router.get("/sesiones")
+async def estadisticas_sesiones(
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """
+    Sesiones de navegador cosechadas por host
+
+    Cookies obtenidas con un render de Playwright que el tier 'cookies'
+    reutiliza en descargas HTTP hasta que caducan; el storage state
+    (cookies y localStorage) se carga además en los contextos nuevos de Chromium.
+    Requiere autenticación.
+    """
+    return get_session_store().stats()
+
+
+@router.get("/cache")
+async def estadisticas_cache(
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """
+    Estado de las cachés del scraper
+
+    - `resultados`: precios compartidos entre usuarios por URL canónica
+      (aciertos, scrapes reales y peticiones agrupadas)
+    - `http`: revalidación condicional (ETag / Last-Modified)
+    """
+    return {
+        "resultados": get_result_cache().stats(),
+        "http": get_http_cache().stats(),
+    }
+
+
+@router.get("/extractor")
+async def estadisticas_extractor(
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """
+    Estado del pool de procesos de extracción
+
+    `offloaded` cuenta las páginas parseadas fuera del event loop e `inline`
+    las que, por ser pequeñas o por estar el pool deshabilitado, se parsearon
+    en el proceso de la API.
+    """
+    return get_extraction_executor().stats()
+
+
+@router.get("/render")
+async def estadisticas_render(
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """
+    Control de admisión de renders con Playwright
+
+    `active` renders en curso de `max_concurrent`, `queued` en espera (de
+    `users_waiting` usuarios) y `rejected` respondidos con 503 + Retry-After.
+    """
+    return get_render_admission().stats()
@@ -4,7 +4,7 @@ Modelos Pydantic para validación de datos
 Author: HellSpawn
 """
 from pydantic import BaseModel, HttpUrl, Field, EmailStr
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
 
@@ -121,6 +121,12 @@ class TestURLResponse(BaseModel):
     precio: Optional[float]
     error: Optional[str]
     domain: str
+    # Diagnóstico: nivel que obtuvo el precio, tamaño y tiempos por fase (ms)
+    tier: Optional[str] = None
+    detalle: Optional[str] = None
+    status_code: Optional[int] = None
+    bytes: int = 0
+    tiempos: Dict[str, Optional[float]] = {}
 
 
 class ActualizarPrecioResponse(BaseModel):
@@ -0,0 +1,128 @@
+"""
+Servicio de listados compartidos
+Agrupa los productos de todos los usuarios que apuntan a la misma página
+(misma URL canónica) en un único listado, con un solo historial de precios
+
+Author: HellSpawn
+"""
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Query, Session
+
+from ..database import HistorialPrecio, Listing, Producto
+from ..utils import detectar_tienda
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from src.urls import canonical_url
+
+# Un precio repetido dentro de esta ventana no genera otro registro
+HISTORY_MIN_INTERVAL = timedelta(seconds=float(os.getenv("LISTING_HISTORY_MIN_INTERVAL", "600")))
+
+
+def obtener_o_crear_listing(db: Session, url: str) -> Listing:
+    """
+    Obtiene el listado de una URL, creándolo si es la primera vez que se rastrea
+
+    Args:
+        db: Sesión de base de datos
+        url: URL del producto (cualquier variante)
+
+    Returns:
+        Listado con id asignado
+    """
+    url_canonica = canonical_url(url)
+    listing = db.query(Listing).filter(Listing.url_canonica == url_canonica).first()
+    if listing:
+        return listing
+
+    listing = Listing(url_canonica=url_canonica, tienda=detectar_tienda(url))
+    try:
+        # Savepoint: si otra petición lo creó a la vez, se reutiliza el suyo
+        with db.begin_nested():
+            db.add(listing)
+            db.flush()
+    except IntegrityError:
+        listing = db.query(Listing).filter(Listing.url_canonica == url_canonica).one()
+    return listing
+
+
+def registrar_precio(db: Session, listing: Listing, precio: float) -> bool:
+    """
+    Registra un precio obtenido para un listado y lo propaga a todos los
+    productos que lo rastrean (de cualquier usuario)
+
+    Args:
+        db: Sesión de base de datos
+        listing: Listado scrapeado
+        precio: Precio obtenido
+
+    Returns:
+        True si se agregó un registro al historial (False si era un duplicado reciente)
+    """
+    ahora = datetime.utcnow()
+    duplicado = (
+        listing.precio_actual == precio
+        and listing.ultima_actualizacion is not None
+        and ahora - listing.ultima_actualizacion < HISTORY_MIN_INTERVAL
+    )
+
+    listing.precio_actual = precio
+    db.query(Producto).filter(Producto.listing_id == listing.id).update(
+        {Producto.precio_actual: precio}, synchronize_session='fetch'
+    )
+    if duplicado:
+        return False
+
+    listing.ultima_actualizacion = ahora
+    db.add(HistorialPrecio(listing_id=listing.id, precio=precio, fecha=ahora))
+    return True
+
+
+def historial_de_producto(db: Session, producto: Producto) -> Query:
+    """
+    Consulta del historial visible para un producto: el compartido de su
+    listado más los registros propios anteriores a los listados (los de
+    otros productos del mismo listado son privados de su dueño)
+
+    Args:
+        db: Sesión de base de datos
+        producto: Producto del usuario
+
+    Returns:
+        Query de HistorialPrecio (sin ordenar)
+    """
+    if producto.listing_id is None:
+        return db.query(HistorialPrecio).filter(HistorialPrecio.producto_id == producto.id)
+    return db.query(HistorialPrecio).filter(or_(
+        and_(HistorialPrecio.listing_id == producto.listing_id, HistorialPrecio.producto_id.is_(None)),
+        HistorialPrecio.producto_id == producto.id,
+    ))
+
+
+def asignar_listings_pendientes(db: Session) -> int:
+    """
+    Migra los productos creados antes de los listados: les asigna su listado
+    y vincula sus registros de historial
+
+    Args:
+        db: Sesión de base de datos
+
+    Returns:
+        Número de productos migrados
+    """
+    pendientes = db.query(Producto).filter(Producto.listing_id.is_(None)).all()
+    for producto in pendientes:
+        listing = obtener_o_crear_listing(db, producto.url)
+        producto.listing_id = listing.id
+        if listing.precio_actual is None:
+            listing.precio_actual = producto.precio_actual
+        db.query(HistorialPrecio).filter(
+            HistorialPrecio.producto_id == producto.id,
+            HistorialPrecio.listing_id.is_(None),
+        ).update({HistorialPrecio.listing_id: listing.id}, synchronize_session=False)
+    db.commit()
+    return len(pendientes)
@@ -1,3 +1,5 @@
+import os
+import tempfile
 from typing import Dict
 
 import pytest
@@ -5,6 +7,9 @@ from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+# Datos persistentes del scraper (escalera, sesiones, límites aprendidos) fuera del repo
+os.environ.setdefault("SCRAPER_CACHE_DIR", tempfile.mkdtemp(prefix="scraper_cache_"))
+
 from backend.app.database import Base, get_db, User
 from backend.app.main import app
 from backend.app.security import get_password_hash, create_access_token
@@ -1,17 +1,44 @@
+from datetime import datetime, timedelta
 from typing import Any, Dict
 
 import pytest
 
+from backend.app.database import HistorialPrecio, Listing, Producto as ProductoModel, User
 from backend.app.routers import productos_auth
+from backend.app.security import create_access_token, get_password_hash
+from backend.app.services.listings import asignar_listings_pendientes, obtener_o_crear_listing, registrar_precio
+from src.render_admission import RenderRejected
+from src.result_cache import ScrapeResultCache
 
 
 class FakeScraper:
-    def __init__(self, price: float | None):
+    def __init__(self, price: float | None, results: ScrapeResultCache | None = None):
         self.price = price
+        self.llamadas = 0
+        self.results = results
 
-    async def get_price(self, url: str) -> float | None:  # pragma: no cover - clarifies signature
+    async def get_price(self, url: str, race: bool = False) -> float | None:  # pragma: no cover - clarifies signature
+        self.llamadas += 1
         return self.price
 
+    async def get_prices(self, urls, scheduler=None):
+        self.llamadas += 1
+        return [self.price for _ in urls]
+
+    async def test_url(self, url: str, race: bool = False) -> Dict[str, Any]:
+        self.llamadas += 1
+        if self.results and self.price is not None:
+            self.results.store(url, {"precio": self.price, "tier": "selector", "detalle": None})
+        return {
+            "url": url, "accesible": True, "precio": self.price, "error": None, "domain": "",
+            "tier": "selector", "detalle": None, "status_code": 200, "bytes": 1024,
+            "tiempos": {"total_ms": 12.0},
+        }
+
+
+def _headers(user: User) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+
 
 def test_crear_producto_registra_historial(monkeypatch, client, auth_headers):
     fake_scraper = FakeScraper(price=120.5)
@@ -58,4 +85,129 @@ def test_alertas_endpoint_con_precio_objetivo(monkeypatch, client, auth_headers)
     assert len(alertas) == 1
     assert alertas[0]["nombre"] == "Monitor"
     assert alertas[0]["precio_actual"] == pytest.approx(90.0)
-    assert alertas[0]["ahorro"] == pytest.approx(5.0)
\ No newline at end of file
+    assert alertas[0]["ahorro"] == pytest.approx(5.0)
+
+def test_estadisticas_de_extraccion_requieren_autenticacion(client, auth_headers):
+    assert client.get("/api/scraper/extraccion").status_code == 401
+
+    response = client.get("/api/scraper/extraccion", headers=auth_headers)
+    assert response.status_code == 200
+    assert set(response.json()) == {"selectores", "niveles"}
+
+
+def test_crear_producto_reutiliza_precio_de_test_url(monkeypatch, client, auth_headers):
+    resultados = ScrapeResultCache(ttl=60)
+    fake_scraper = FakeScraper(price=75.0, results=resultados)
+    monkeypatch.setattr(productos_auth, "scraper", fake_scraper)
+    monkeypatch.setattr(productos_auth, "result_cache", resultados)
+
+    prueba = client.post(
+        "/api/productos/test-url",
+        json={"url": "https://www.amazon.com/dp/B0TEST?utm_source=newsletter"},
+        headers=auth_headers,
+    )
+    assert prueba.status_code == 200
+    assert prueba.json()["tier"] == "selector"
+
+    payload = {"nombre": "Audífonos", "url": "https://amazon.com/dp/B0TEST"}
+    response = client.post("/api/productos/", json=payload, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json()["precio_actual"] == pytest.approx(75.0)
+    assert fake_scraper.llamadas == 1
+
+
+def test_actualizar_todos_registra_precio_para_todos_los_duenos(monkeypatch, client, auth_headers, db_session):
+    otro = User(email="otro@example.com", username="otro", hashed_password=get_password_hash("secret123"), is_active=True)
+    db_session.add(otro)
+    db_session.commit()
+    url_otro = "https://m.ebay.com/itm/Reloj-Vintage/123456789012?_trksid=p2047675"
+    db_session.add(ProductoModel(
+        user_id=otro.id, nombre="Mismo listado", tienda="ebay", url=url_otro,
+        listing_id=obtener_o_crear_listing(db_session, url_otro).id,
+    ))
+    db_session.commit()
+
+    fake_scraper = FakeScraper(price=55.0)
+    monkeypatch.setattr(productos_auth, "scraper", fake_scraper)
+    client.post("/api/productos/", json={"nombre": "Reloj", "url": "https://www.ebay.com/itm/123456789012"}, headers=auth_headers)
+
+    response = client.post("/api/productos/actualizar-todos", headers=auth_headers)
+    assert response.status_code == 200
+    assert fake_scraper.llamadas == 2
+
+    db_session.expire_all()
+    producto_otro = db_session.query(ProductoModel).filter(ProductoModel.user_id == otro.id).one()
+    assert producto_otro.precio_actual == pytest.approx(55.0)
+    # El historial se guarda una vez por listado, no por producto de cada usuario
+    assert db_session.query(Listing).count() == 1
+    assert db_session.query(HistorialPrecio).filter(HistorialPrecio.listing_id == producto_otro.listing_id).count() == 1
+    historial_otro = client.get(f"/api/historial/{producto_otro.id}", headers=_headers(otro))
+    assert [h["precio"] for h in historial_otro.json()] == [pytest.approx(55.0)]
+
+
+def test_test_url_sin_turno_de_render_responde_503(monkeypatch, client, auth_headers):
+    class ScraperSaturado(FakeScraper):
+        async def test_url(self, url: str, race: bool = False) -> Dict[str, Any]:
+            raise RenderRejected("Cola de render llena, intenta más tarde", retry_after=7)
+
+    monkeypatch.setattr(productos_auth, "scraper", ScraperSaturado(price=None))
+
+    response = client.post("/api/productos/test-url", json={"url": "https://www.mercadolibre.com.mx/p/MLM1"}, headers=auth_headers)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+
+
+def _historial_previo(db_session, precios_por_usuario):
+    """Productos creados antes de los listados, con historial propio, y la migración."""
+    productos = {}
+    hace_un_dia = datetime.utcnow() - timedelta(days=1)
+    for user, precios in precios_por_usuario:
+        producto = ProductoModel(user_id=user.id, nombre="Consola", tienda="amazon", url="https://www.amazon.com/dp/B0LEGACY")
+        db_session.add(producto)
+        db_session.flush()
+        for i, precio in enumerate(precios):
+            db_session.add(HistorialPrecio(producto_id=producto.id, precio=precio, fecha=hace_un_dia + timedelta(hours=i)))
+        productos[user.id] = producto
+    db_session.commit()
+    asignar_listings_pendientes(db_session)
+    listing = db_session.query(Listing).one()
+    registrar_precio(db_session, listing, 70.0)
+    db_session.commit()
+    return productos
+
+
+def test_historial_previo_a_los_listados_es_privado_de_cada_usuario(client, auth_headers, db_session):
+    yo = db_session.query(User).filter(User.username == "testuser").one()
+    otro = User(email="otro@example.com", username="otro", hashed_password=get_password_hash("secret123"), is_active=True)
+    db_session.add(otro)
+    db_session.commit()
+    productos = _historial_previo(db_session, [(yo, [100.0, 90.0]), (otro, [80.0])])
+
+    mio = client.get(f"/api/historial/{productos[yo.id].id}", headers=auth_headers)
+    suyo = client.get(f"/api/historial/{productos[otro.id].id}", headers=_headers(otro))
+    assert [h["precio"] for h in mio.json()] == [pytest.approx(100.0), pytest.approx(90.0), pytest.approx(70.0)]
+    assert [h["precio"] for h in suyo.json()] == [pytest.approx(80.0), pytest.approx(70.0)]
+
+    resumen = client.get("/api/productos/estadisticas/resumen", headers=auth_headers)
+    assert resumen.json()["total_registros"] == 3
+
+
+def test_eliminar_producto_conserva_el_listado_y_borra_su_historial_previo(client, auth_headers, db_session):
+    yo = db_session.query(User).filter(User.username == "testuser").one()
+    otro = User(email="otro@example.com", username="otro", hashed_password=get_password_hash("secret123"), is_active=True)
+    db_session.add(otro)
+    db_session.commit()
+    productos = _historial_previo(db_session, [(yo, [100.0, 90.0]), (otro, [80.0])])
+    listing_id = productos[yo.id].listing_id
+
+    response = client.delete(f"/api/productos/{productos[yo.id].id}", headers=auth_headers)
+    assert response.status_code == 204
+
+    db_session.expire_all()
+    assert db_session.query(Listing).filter(Listing.id == listing_id).count() == 1
+    restantes = db_session.query(HistorialPrecio).order_by(HistorialPrecio.fecha.asc()).all()
+    # Solo queda el registro previo del otro usuario y el historial compartido del listado
+    assert [(h.producto_id, h.precio) for h in restantes] == [(productos[otro.id].id, 80.0), (None, 70.0)]
+    suyo = client.get(f"/api/historial/{productos[otro.id].id}", headers=_headers(otro))
+    assert [h["precio"] for h in suyo.json()] == [pytest.approx(80.0), pytest.approx(70.0)]
@@ -0,0 +1,1103 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import pytest
+
+from src.browser_pool import BrowserPool
+from src.browser_sessions import BrowserSessionStore
+from src.circuit_breaker import CircuitBreakers, CircuitOpenError
+from src.extraction_executor import ExtractionExecutor
+from src.extraction_stats import ExtractionStats
+from src.fetch_ladder import FetchLadder
+from src.http_cache import HttpCache
+from src.html_parser import BACKENDS, backend_disponible, get_parser_backend
+from src.http_client import AsyncHttpEngine
+from src.rate_limiter import DomainScheduler, domain_key
+from src.render_admission import RenderAdmission, RenderRejected
+from src.result_cache import ScrapeResultCache
+from src.retry_policy import RetryPolicy, parse_retry_after
+from src.selector_engine import CompiledSelectors
+from src.structured_data import extract_structured_price, to_price
+from src.urls import canonical_url
+from src.scraper import PriceScraper
+
+
+def make_scraper(handler, cache=None, stats=None, results=None, ladder=None) -> PriceScraper:
+    scraper = PriceScraper()
+    scraper.http = AsyncHttpEngine(transport=httpx.MockTransport(handler))
+    scraper.cache = cache
+    scraper.stats = stats
+    scraper.results = results
+    scraper.ladder = ladder
+    scraper.render_enabled = False
+    scraper.sessions = BrowserSessionStore(path=os.path.join(tempfile.mkdtemp(), "sessions.json"))
+    return scraper
+
+
+def test_get_price_usa_motor_async():
+    html = '<html><body><span class="x-price-primary">US $299.99</span></body></html>'
+    requests_seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests_seen.append(str(request.url))
+        return httpx.Response(200, text=html)
+
+    scraper = make_scraper(handler)
+    precio = asyncio.run(scraper.get_price("https://www.ebay.com/itm/123"))
+
+    assert precio == pytest.approx(299.99)
+    assert requests_seen == ["https://www.ebay.com/itm/123"]
+
+
+def test_scheduler_paraleliza_dominios_y_espacia_cada_uno():
+    scheduler = DomainScheduler(min_interval=0.1, max_concurrency=1, limits={})
+    urls = [
+        f"https://www.{tienda}.com/p/{i}"
+        for i in range(3)
+        for tienda in ("amazon", "mercadolibre", "ebay")
+    ]
+
+    async def fake_scrape(url):
+        return url
+
+    inicio = time.perf_counter()
+    resultados = asyncio.run(scheduler.map(urls, key=domain_key, func=fake_scrape))
+    transcurrido = time.perf_counter() - inicio
+
+    assert resultados == urls
+    # 3 productos por tienda: dos intervalos de espera, no ocho
+    assert 0.2 <= transcurrido < 0.5
+
+
+def test_cache_condicional_reutiliza_precio_en_304(tmp_path):
+    html = '<html><body><span class="x-price-primary">US $45.50</span></body></html>'
+    condicionales = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.headers.get("If-None-Match") == '"v1"':
+            condicionales.append(request.headers["If-None-Match"])
+            return httpx.Response(304)
+        return httpx.Response(200, text=html, headers={"ETag": '"v1"'})
+
+    cache = HttpCache(db_path=str(tmp_path / "cache.db"), max_entries=10)
+    scraper = make_scraper(handler, cache=cache)
+    url = "https://www.ebay.com/itm/456"
+
+    assert asyncio.run(scraper.get_price(url)) == pytest.approx(45.50)
+    assert asyncio.run(scraper.get_price(url)) == pytest.approx(45.50)
+
+    assert condicionales == ['"v1"']
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+    # El número de filas se lleva en memoria y el desalojo lo mantiene en el límite
+    for i in range(12):
+        cache.store(f"https://www.ebay.com/itm/{i}", '"e"', None, 1.0)
+    cache.store("https://www.ebay.com/itm/11", '"e2"', None, 2.0)
+    assert cache.stats()["entries"] == 10
+    assert HttpCache(db_path=str(tmp_path / "cache.db"), max_entries=10).stats()["entries"] == 10
+
+
+@pytest.mark.parametrize("backend_name", [n for n in BACKENDS if backend_disponible(n)])
+def test_backends_de_parseo_encuentran_los_mismos_selectores(backend_name):
+    html = (
+        '<html><body><div class="x"><span class="otro a-price-whole extra">1.234</span></div>'
+        '<b id="prcIsum">US $9.99</b><p data-testid="price-part">15</p></body></html>'
+    )
+    doc = get_parser_backend(backend_name).parse(html.encode())
+
+    def texto(selector):
+        encontrado = CompiledSelectors([selector]).find_first(doc, lambda t: t)
+        return encontrado[0] if encontrado else None
+
+    assert texto({'class': 'a-price-whole'}) == '1.234'
+    assert texto({'id': 'prcIsum'}) == 'US $9.99'
+    assert texto({'attrs': {'data-testid': 'price-part'}}) == '15'
+    assert texto({'class': 'no-existe'}) is None
+    assert 'US $9.99' in doc.get_text()
+
+
+@pytest.mark.parametrize("backend_name", [n for n in BACKENDS if backend_disponible(n)])
+def test_selectores_compilados_respetan_prioridad(backend_name):
+    compiled = CompiledSelectors([
+        {'class': 'principal'},
+        {'id': 'respaldo'},
+        {'attrs': {'data-testid': 'price-part'}},
+    ])
+    html = (
+        '<html><body><p data-testid="price-part">10</p><b id="respaldo">20</b>'
+        '<span class="x principal">sin precio</span><span class="principal">30</span></body></html>'
+    )
+    doc = get_parser_backend(backend_name).parse(html)
+    convert = PriceScraper()._clean_price
+
+    # La primera coincidencia de 'principal' no es un precio: decide el siguiente selector
+    assert compiled.find_first(doc, convert) == (20.0, {'id': 'respaldo'})
+    assert CompiledSelectors([{'class': 'nada'}]).find_first(doc, convert) is None
+
+
+def test_streaming_corta_la_descarga_al_encontrar_precio():
+    enviados = []
+
+    async def cuerpo():
+        yield b'<html><body><div class="x-price-primary">US $12.50</div>'
+        for i in range(50):
+            enviados.append(i)
+            yield b'<p>relleno</p>' * 2000
+        yield b'</body></html>'
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=cuerpo(), headers={"Content-Type": "text/html; charset=utf-8"})
+
+    scraper = make_scraper(handler)
+    scraper.streaming = True
+
+    assert asyncio.run(scraper.get_price("https://www.ebay.com/itm/789")) == pytest.approx(12.50)
+    assert len(enviados) < 5
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_streaming_respeta_la_prioridad_de_selectores(streaming):
+    html = (
+        '<html><body><span class="a-offscreen">$10.00</span>'
+        '<span class="a-price-whole">$20.00</span><p>relleno</p></body></html>'
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text=html, headers={"Content-Type": "text/html; charset=utf-8"})
+
+    stats = ExtractionStats(path=os.path.join(tempfile.mkdtemp(), "stats.json"))
+    scraper = make_scraper(handler, stats=stats)
+    scraper.streaming = streaming
+
+    # .a-price-whole tiene más prioridad aunque aparezca después en el documento
+    resultado = asyncio.run(scraper.get_price_info("https://www.amazon.com.mx/dp/B0PRIORIDAD"))
+    assert resultado == {'precio': 20.0, 'tier': 'selector', 'detalle': '.a-price-whole'}
+    assert stats.stats()['selectores']['amazon']['.a-price-whole']['exitos'] == 1
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_datos_estructurados_tienen_prioridad(streaming):
+    html = (
+        '<html><head><script type="application/ld+json">'
+        '{"@context": "https://schema.org", "@type": "Product", "name": "Laptop",'
+        ' "offers": {"@type": "Offer", "price": "1299.00", "priceCurrency": "MXN"}}'
+        '</script></head><body><div class="x-price-primary">US $12.50</div></body></html>'
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text=html, headers={"Content-Type": "text/html; charset=utf-8"})
+
+    scraper = make_scraper(handler)
+    scraper.streaming = streaming
+
+    resultado = asyncio.run(scraper.get_price_info("https://www.ebay.com/itm/321"))
+    assert resultado == {'precio': 1299.0, 'tier': 'structured', 'detalle': 'json-ld'}
+
+
+def test_estado_embebido_toma_el_precio_del_producto_y_decimales_con_coma():
+    html = (
+        '<script id="__NEXT_DATA__" type="application/json">'
+        '{"shipping": {"amount": 99}, "product": {"price": 1500}}</script>'
+    )
+    assert extract_structured_price(html) == (1500.0, 'embedded-state')
+    assert extract_structured_price(
+        '<script id="__NEXT_DATA__" type="application/json">{"cart": {"amount": 99}}</script>'
+    ) is None
+
+    assert to_price("1.299,00") == 1299.0
+    assert to_price("1,299.00") == 1299.0
+    assert to_price("1299,50") == 1299.5
+    assert to_price("12,34,56") is None
+
+
+def test_mercadolibre_en_lote_una_peticion_por_grupo(monkeypatch):
+    peticiones = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        peticiones.append(request.url)
+        if request.url.path == "/items":
+            ids = request.url.params["ids"].split(",")
+            cuerpo = [
+                {"code": 200, "body": {"id": item_id, "price": 100 + i}} if item_id != "MLM7" else {"code": 404, "body": {}}
+                for i, item_id in enumerate(ids)
+            ]
+            # Entradas malformadas se ignoran
+            return httpx.Response(200, json=cuerpo + [None, "error"])
+        return httpx.Response(200, text='<div class="x-price-primary">US $5.00</div>')
+
+    monkeypatch.setattr("src.scraper.PLAYWRIGHT_AVAILABLE", False)
+    scraper = make_scraper(handler)
+    scraper.ml_batch_size = 3
+    urls = [f"https://articulo.mercadolibre.com.mx/MLM-{n}-producto" for n in range(1, 8)]
+    urls.append("https://www.ebay.com/itm/55")
+
+    precios = asyncio.run(scraper.get_prices(urls, scheduler=DomainScheduler(min_interval=0.01, limits={})))
+
+    assert precios[:6] == [100.0, 101.0, 102.0, 100.0, 101.0, 102.0]
+    # MLM7 no vino en el lote: se extrae del HTML sin volver a consultar la API por artículo
+    assert precios[6:] == [5.0, 5.0]
+    assert [u.path for u in peticiones].count("/items") == 3
+    assert not any(u.path.startswith("/items/") for u in peticiones)
+
+
+def test_orden_adaptativo_prueba_primero_el_ultimo_selector_exitoso(tmp_path):
+    path = str(tmp_path / "stats.json")
+    html = '<html><body><span class="a-price-whole">sin precio</span><span id="priceblock_ourprice">$80.00</span></body></html>'
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text=html)
+
+    scraper = make_scraper(handler, stats=ExtractionStats(path=path, save_interval=0))
+    scraper.streaming = False
+    assert scraper._compiled_for('amazon').selectors[0] == {'class': 'a-price-whole'}
+
+    resultado = asyncio.run(scraper.get_price_info("https://www.amazon.com/dp/X1"))
+    assert resultado == {'precio': 80.0, 'tier': 'selector', 'detalle': '#priceblock_ourprice'}
+
+    # Las estadísticas sobreviven a un reinicio y cambian el orden de los intentos
+    recargadas = ExtractionStats(path=path)
+    scraper.stats = recargadas
+    assert scraper._compiled_for('amazon').selectors[0] == {'id': 'priceblock_ourprice'}
+    selectores = recargadas.stats()['selectores']['amazon']
+    assert selectores['.a-price-whole']['fallos'] == 1
+    assert selectores['#priceblock_ourprice']['exitos'] == 1
+    assert recargadas.stats()['niveles']['amazon.com']['selector']['exitos'] == 1
+
+
+def test_paginas_grandes_se_extraen_en_el_pool_de_procesos(tmp_path):
+    relleno = '<p>texto</p>' * 2000
+    html = f'<html><body>{relleno}<span class="a-price-whole">sin precio</span><span id="priceblock_ourprice">$80.00</span></body></html>'
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text=html)
+
+    stats = ExtractionStats(path=str(tmp_path / "stats.json"), save_interval=0)
+    scraper = make_scraper(handler, stats=stats)
+    scraper.streaming = False
+    scraper.extractor = ExtractionExecutor(max_workers=1, inline_bytes=len(html) // 2)
+    try:
+        resultado = asyncio.run(scraper.get_price_info("https://www.amazon.com/dp/X1"))
+        pequena = asyncio.run(scraper.extract_html_async(b'<span id="priceblock_ourprice">$5.00</span>', 'amazon'))
+    finally:
+        scraper.extractor.shutdown()
+
+    assert resultado == {'precio': 80.0, 'tier': 'selector', 'detalle': '#priceblock_ourprice'}
+    # Los selectores probados en el proceso hijo se registran en el proceso principal
+    assert stats.stats()['selectores']['amazon']['.a-price-whole']['fallos'] == 1
+    assert pequena[0]['precio'] == 5.0
+    assert scraper.extractor.stats()['offloaded'] == 1
+    assert scraper.extractor.stats()['inline'] == 1
+
+
+def test_streaming_envia_el_respaldo_generico_de_paginas_grandes_al_pool(tmp_path):
+    relleno = '<p>texto</p>' * 2000
+    html = f'<html><body>{relleno}<div class="oferta">Precio: $45.50</div></body></html>'
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text=html)
+
+    scraper = make_scraper(handler)
+    scraper.streaming = True
+    scraper.extractor = ExtractionExecutor(max_workers=1, inline_bytes=len(html) // 2)
+    try:
+        resultado = asyncio.run(scraper.get_price_info("https://www.amazon.com/dp/X2"))
+    finally:
+        scraper.extractor.shutdown()
+
+    # Sin selector ni datos estructurados: los patrones genéricos corren en el proceso hijo
+    assert resultado == {'precio': 45.5, 'tier': 'generic', 'detalle': None}
+    assert scraper.extractor.stats()['offloaded'] == 1
+    assert scraper.extractor.stats()['inline'] == 0
+
+
+def test_escalera_sube_a_cookies_y_sondea_para_bajar(tmp_path):
+    peticiones = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        peticiones.append(request.url.path)
+        if request.url.path == "/":
+            return httpx.Response(200, text="portada", headers={"Set-Cookie": "consent=1; Path=/"})
+        if "consent=1" not in request.headers.get("Cookie", ""):
+            return httpx.Response(200, text="<html><body>Acepta las cookies</body></html>")
+        return httpx.Response(200, text='<html><body><div class="x-price-primary">US $19.99</div></body></html>')
+
+    path = str(tmp_path / "ladder.json")
+    ladder = FetchLadder(path=path, save_interval=0, probe_interval=3600, escalate_after=1)
+    scraper = make_scraper(handler, ladder=ladder)
+    url = "https://www.ebay.com/itm/123"
+
+    assert asyncio.run(scraper.get_price_info(url))['precio'] == 19.99
+    assert peticiones == ["/itm/123", "/", "/itm/123"]
+    assert ladder.base("ebay.com") == "cookies"
+
+    # La estrategia aprendida sobrevive al reinicio y evita la descarga simple que falla
+    ladder = FetchLadder(path=path, save_interval=0, probe_interval=3600, escalate_after=1)
+    assert ladder.plan("ebay.com", ["static", "cookies", "render"]) == ["cookies", "render"]
+
+    # Vencido el intervalo se sondea la estrategia simple; con la cookie ya funciona y se baja
+    ladder.probe_interval = 0
+    scraper.ladder = ladder
+    peticiones.clear()
+    asyncio.run(scraper.get_price_info(url))
+    assert peticiones == ["/itm/123"]
+    assert ladder.base("ebay.com") == "static"
+
+
+def test_sesion_cosechada_con_playwright_se_reutiliza_por_http(monkeypatch):
+    renders = []
+
+    class FakePlaywright:
+        def __init__(self):
+            self.ultima_sesion = None
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return None
+
+        async def get_price(self, url, selectores=None, capturar_sesion=False, clean_pattern=None, regex_fallback=True):
+            renders.append(url)
+            if capturar_sesion:
+                # Como el scraper real: la sesión queda en el almacén compartido
+                self.ultima_sesion = [{
+                    'name': 'cf_clearance', 'value': 'ok', 'domain': '.ebay.com', 'path': '/',
+                    'expires': time.time() + 600, 'httpOnly': True, 'secure': False,
+                }]
+                scraper.sessions.put(domain_key(url), self.ultima_sesion)
+            return 10.0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if "cf_clearance=ok" not in request.headers.get("Cookie", ""):
+            return httpx.Response(403, text="<html><body>Checking your browser</body></html>")
+        return httpx.Response(200, text='<html><body><div class="x-price-primary">US $12.50</div></body></html>')
+
+    monkeypatch.setattr("src.scraper.PLAYWRIGHT_AVAILABLE", True)
+    monkeypatch.setattr("src.scraper_playwright.PlaywrightScraper", FakePlaywright)
+    scraper = make_scraper(handler)
+    scraper.render_enabled = True
+
+    # Primer scrape: se renderiza una vez y se guardan las cookies del host
+    primero = asyncio.run(scraper.get_price_info("https://www.ebay.com/itm/1"))
+    assert (primero['precio'], primero['tier']) == (10.0, 'playwright')
+    assert scraper.sessions.stats()['sessions']['ebay.com']['cookies'] == 1
+
+    # Los siguientes productos del host bajan por HTTP con esas cookies, sin render
+    segundo = asyncio.run(scraper.get_price_info("https://www.ebay.com/itm/2"))
+    assert segundo['precio'] == 12.5
+    assert renders == ["https://www.ebay.com/itm/1"]
+
+
+@pytest.mark.parametrize("race", [False, True])
+def test_cosecha_fallida_no_renderiza_dos_veces(monkeypatch, race):
+    renders = []
+
+    class FakePlaywright:
+        ultima_sesion = None
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return None
+
+        async def get_price(self, url, selectores=None, capturar_sesion=False, clean_pattern=None, regex_fallback=True):
+            renders.append(capturar_sesion)
+            return None
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(403, text="<html><body>Checking your browser</body></html>")
+
+    monkeypatch.setattr("src.scraper.PLAYWRIGHT_AVAILABLE", True)
+    monkeypatch.setattr("src.scraper_playwright.PlaywrightScraper", FakePlaywright)
+    scraper = make_scraper(handler)
+    scraper.render_enabled = True
+    scraper.race_expensive_delay = 0
+
+    resultado = asyncio.run(scraper.get_price_info("https://www.ebay.com/itm/3", race=race))
+
+    # 'cookies' renderizó para cosechar la sesión: el nivel 'render' no repite la página
+    assert resultado['precio'] is None
+    assert renders == [True]
+
+
+def test_render_usa_limpieza_de_la_tienda_y_regex_solo_en_mercadolibre():
+    from src.scraper_playwright import PlaywrightScraper
+
+    pw = PlaywrightScraper()
+    doc = pw.parser.parse('<html><body><p>Envío gratis desde $ 299</p><b class="precio">EUR 1.299</b></body></html>')
+    ninguno = CompiledSelectors([{'class': 'no-existe'}])
+
+    # Sin selector que coincida, los importes en $ del texto solo se aceptan en MercadoLibre
+    assert pw._extract_price(doc, ninguno) == 299.0
+    assert pw._extract_price(doc, ninguno, regex_fallback=False) is None
+    # El texto del selector se limpia con el patrón de la tienda
+    precio = CompiledSelectors([{'class': 'precio'}])
+    assert pw._extract_price(doc, precio, r'[^\d]', regex_fallback=False) == 1299.0
+
+
+def test_reintentos_respetan_retry_after_y_el_circuito_falla_rapido():
+    respuestas = [
+        httpx.Response(503, headers={"Retry-After": "0"}),
+        httpx.Response(200, text='<div class="x-price-primary">US $8.00</div>'),
+    ]
+    peticiones = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        peticiones.append(request.url.host)
+        if request.url.host == "caida.mx":
+            raise httpx.ConnectError("connection refused", request=request)
+        return respuestas.pop(0)
+
+    breakers = CircuitBreakers(threshold=2, cooldown=60)
+    scraper = make_scraper(handler)
+    scraper.http = AsyncHttpEngine(
+        transport=httpx.MockTransport(handler),
+        retry=RetryPolicy(attempts=3, base_delay=0.01),
+        breakers=breakers,
+    )
+
+    # Un 503 transitorio se reintenta y el usuario recibe el precio
+    assert asyncio.run(scraper.get_price("https://www.ebay.com/itm/7")) == 8.0
+    assert peticiones == ["www.ebay.com", "www.ebay.com"]
+    assert scraper.http.retries == 1
+
+    # Una tienda caída abre su circuito y deja de recibir peticiones
+    peticiones.clear()
+    for _ in range(2):
+        asyncio.run(scraper.get_price("https://caida.mx/p/1"))
+    enviadas = len(peticiones)
+    assert breakers.stats()["circuits"]["caida.mx"]["state"] == "open"
+    resultado = asyncio.run(scraper.get_price_info("https://caida.mx/p/2"))
+    assert resultado["detalle"] == "circuit-open"
+    assert len(peticiones) == enviadas
+    with pytest.raises(CircuitOpenError):
+        breakers.before_request("caida.mx")
+
+    # Pasado el enfriamiento, una sola petición de prueba; si responde, el circuito se cierra
+    breakers._circuitos["caida.mx"]["opened_at"] -= 61
+    breakers.before_request("caida.mx")
+    with pytest.raises(CircuitOpenError):
+        breakers.before_request("caida.mx")
+    breakers.record_success("caida.mx")
+    assert breakers.stats()["circuits"]["caida.mx"]["state"] == "closed"
+
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("no-es-fecha") is None
+    assert not RetryPolicy(attempts=3, max_delay=10).should_retry(1, retry_after=300)
+
+
+def test_aimd_sube_el_ritmo_con_respuestas_sanas_y_lo_recorta_ante_429(tmp_path):
+    path = str(tmp_path / "limites.json")
+    scheduler = DomainScheduler(min_interval=1.0, max_concurrency=1, limits={}, adaptive=True, path=path)
+    scheduler.hold = 0
+    bloqueada = {"activa": False}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if bloqueada["activa"]:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        if request.url.path == "/captcha":
+            return httpx.Response(200, text="<html><body>Enter the characters: captcha</body></html>")
+        return httpx.Response(200, text='<div class="x-price-primary">US $5.00</div>')
+
+    scraper = make_scraper(handler)
+    scraper.http = AsyncHttpEngine(
+        transport=httpx.MockTransport(handler),
+        retry=RetryPolicy(attempts=1),
+        breakers=CircuitBreakers(threshold=0),
+        scheduler=scheduler,
+    )
+
+    # Respuestas sanas: aumento aditivo del ritmo y, más despacio, de la concurrencia
+    for i in range(20):
+        asyncio.run(scraper.get_price(f"https://www.ebay.com/itm/{i}"))
+    sano = scheduler.limits_for("ebay.com")
+    assert sano["min_interval"] == pytest.approx(1 / (1 + 20 * 0.05))
+    assert sano["max_concurrency"] == 2
+
+    # 429: un solo recorte multiplicativo aunque lleguen varias señales seguidas
+    scheduler.hold = 60
+    bloqueada["activa"] = True
+    asyncio.run(scraper.get_price("https://www.ebay.com/itm/x"))
+    assert scheduler.limits_for("ebay.com")["min_interval"] == pytest.approx(sano["min_interval"] * 2)
+    assert scheduler.limits_for("ebay.com")["max_concurrency"] == 1
+
+    # Una página de captcha también es señal de bajar el ritmo
+    scheduler.hold = 0
+    bloqueada["activa"] = False
+    asyncio.run(scraper.get_price("https://www.ebay.com/captcha"))
+    assert scheduler.limits_for("ebay.com")["min_interval"] > sano["min_interval"] * 2
+
+    # Los límites aprendidos se conservan entre ejecuciones
+    scheduler.save()
+    reiniciado = DomainScheduler(min_interval=1.0, max_concurrency=1, limits={}, adaptive=True, path=path)
+    assert reiniciado.limits_for("ebay.com") == scheduler.limits_for("ebay.com")
+
+    # Los límites configurados por tienda son cotas que AIMD nunca supera
+    limitado = DomainScheduler(
+        min_interval=1.0, limits={"amazon": {"min_interval": 3.0, "max_concurrency": 2}},
+        adaptive=True, path=str(tmp_path / "limitado.json"),
+    )
+    for _ in range(200):
+        limitado.record_success("amazon.com.mx")
+    assert limitado.limits_for("amazon.com.mx") == {"min_interval": 3.0, "max_concurrency": 2}
+    amazon = limitado.stats()["domains"]["amazon.com.mx"]
+    assert (amazon["max_concurrency"], amazon["floor_interval"], amazon["ceiling_concurrency"]) == (2, 3.0, 2)
+
+
+def test_aimd_con_intervalo_cero_no_divide_entre_cero(monkeypatch, tmp_path):
+    monkeypatch.setenv("SCRAPER_AIMD_MIN_INTERVAL", "0")
+    scheduler = DomainScheduler(
+        min_interval=0, limits={"ebay": {"min_interval": 0, "max_concurrency": 1}},
+        adaptive=True, path=str(tmp_path / "limites.json"),
+    )
+    scheduler.hold = 0
+
+    scheduler.record_success("ebay.com")
+    scheduler.record_throttle("ebay.com")
+    scheduler.record_success("ebay.com")
+
+    limites = scheduler.limits_for("ebay.com")
+    assert limites["min_interval"] > 0
+    assert scheduler.stats()["domains"]["ebay.com"]["requests_per_s"] > 0
+
+
+def test_carrera_toma_el_primer_precio_cancela_el_resto_y_difiere_el_render(monkeypatch):
+    renders = []
+    canceladas = []
+    demora = {"/itm/rapido": 0.05, "/itm/lento": 1.0}
+
+    class FakePlaywright:
+        def __init__(self):
+            self.ultima_sesion = None
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return None
+
+        async def get_price(self, url, selectores=None, capturar_sesion=False, clean_pattern=None, regex_fallback=True):
+            renders.append(url)
+            await asyncio.sleep(0.05)
+            return 7.0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        try:
+            await asyncio.sleep(demora[request.url.path])
+        except asyncio.CancelledError:
+            canceladas.append(request.url.path)
+            raise
+        return httpx.Response(200, text='<div class="x-price-primary">US $3.00</div>')
+
+    monkeypatch.setattr("src.scraper.PLAYWRIGHT_AVAILABLE", True)
+    monkeypatch.setattr("src.scraper_playwright.PlaywrightScraper", FakePlaywright)
+    scraper = make_scraper(handler)
+    scraper.render_enabled = True
+    scraper.race_expensive_delay = 0.3
+
+    # La descarga simple responde antes del retraso: el render ni arranca
+    rapido = asyncio.run(scraper.get_price_info("https://www.ebay.com/itm/rapido", race=True))
+    assert (rapido['precio'], rapido['tier']) == (3.0, 'selector')
+    assert renders == []
+
+    # La descarga simple se cuelga: tras el retraso arranca el render, gana y la descarga se cancela
+    inicio = time.perf_counter()
+    lento = asyncio.run(scraper.get_price_info("https://www.ebay.com/itm/lento", race=True))
+    transcurrido = time.perf_counter() - inicio
+    assert (lento['precio'], lento['tier']) == (7.0, 'playwright')
+    assert renders == ["https://www.ebay.com/itm/lento"]
+    assert canceladas == ["/itm/lento"]
+    assert 0.3 <= transcurrido < 0.9
+
+
+def test_carrera_un_render_rechazado_no_tumba_a_las_estrategias_baratas(monkeypatch):
+    class FakePlaywright:
+        ultima_sesion = None
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return None
+
+        async def get_price(self, url, selectores=None, capturar_sesion=False, clean_pattern=None, regex_fallback=True):
+            raise RenderRejected("Cola de renders llena", retry_after=5)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.1)
+        if request.url.path == "/itm/sin-precio":
+            return httpx.Response(200, text='<html><body>sin precio</body></html>')
+        return httpx.Response(200, text='<div class="x-price-primary">US $3.00</div>')
+
+    monkeypatch.setattr("src.scraper.PLAYWRIGHT_AVAILABLE", True)
+    monkeypatch.setattr("src.scraper_playwright.PlaywrightScraper", FakePlaywright)
+    scraper = make_scraper(handler)
+    scraper.render_enabled = True
+    scraper.race_expensive_delay = 0
+
+    # El render se rechaza al instante, pero la descarga simple sigue y gana
+    resultado = asyncio.run(scraper.get_price_info("https://www.ebay.com/itm/barato", race=True))
+    assert (resultado['precio'], resultado['tier']) == (3.0, 'selector')
+
+    # Sin precio de ninguna estrategia, el rechazo llega al llamador (503 en la API)
+    with pytest.raises(RenderRejected):
+        asyncio.run(scraper.get_price_info("https://www.ebay.com/itm/sin-precio", race=True))
+
+
+def test_admision_de_renders_rota_turnos_y_rechaza_al_agotar_la_espera():
+    admision = RenderAdmission(max_concurrent=1, max_queue=3, queue_timeout=0.2)
+    orden = []
+
+    async def render(usuario, espera=0.02):
+        async with admision.slot(usuario):
+            orden.append(usuario)
+            await asyncio.sleep(espera)
+
+    async def escenario():
+        # 'masivo' encola tres renders antes que 'interactivo', que no espera a todos
+        tareas = [asyncio.create_task(render("masivo")) for _ in range(3)]
+        await asyncio.sleep(0)
+        tareas.append(asyncio.create_task(render("interactivo")))
+        await asyncio.sleep(0)
+        with pytest.raises(RenderRejected):
+            await render("otro")  # cola llena: rechazo inmediato
+        await asyncio.gather(*tareas)
+
+        # Un render que ocupa la plaza más que queue_timeout deja al siguiente sin turno
+        lento = asyncio.create_task(render("masivo", espera=0.5))
+        await asyncio.sleep(0)
+        with pytest.raises(RenderRejected) as rechazo:
+            await render("interactivo")
+        await lento
+        return rechazo.value
+
+    rechazo = asyncio.run(escenario())
+
+    assert orden[:4] == ["masivo", "masivo", "interactivo", "masivo"]
+    assert rechazo.retry_after >= 1
+    assert admision.stats()["timeouts"] == 1
+    assert admision.stats()["active"] == 0
+
+
+class _FakePage:
+    def __init__(self):
+        self.closed = False
+
+    async def goto(self, url):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+    def is_closed(self):
+        return self.closed
+
+
+class _FakeContext:
+    def __init__(self, storage_state=None):
+        self.closed = False
+        self.storage_state_inicial = storage_state
+
+    async def new_page(self):
+        return _FakePage()
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeBrowser:
+    def __init__(self):
+        self.closed = False
+
+    async def new_context(self, storage_state=None, **opciones):
+        return _FakeContext(storage_state)
+
+    def is_connected(self):
+        return not self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeChromium:
+    def __init__(self):
+        self.lanzados = []
+
+    async def launch(self, **opciones):
+        self.lanzados.append(_FakeBrowser())
+        return self.lanzados[-1]
+
+
+class _FakeRequest:
+    def __init__(self, resource_type, url):
+        self.resource_type = resource_type
+        self.url = url
+
+
+class _FakeRoute:
+    def __init__(self, resource_type, url, decisiones):
+        self.request = _FakeRequest(resource_type, url)
+        self.decisiones = decisiones
+
+    async def abort(self):
+        self.decisiones[self.request.resource_type, self.request.url] = 'abort'
+
+    async def continue_(self):
+        self.decisiones[self.request.resource_type, self.request.url] = 'continue'
+
+
+class _FakeRenderPage:
+    """Página que dispara las peticiones de la carga a través de page.route."""
+
+    def __init__(self, peticiones, html):
+        self.peticiones = peticiones
+        self.html = html
+        self.decisiones = {}
+        self.llamadas = []
+        self.filtro = None
+
+    async def route(self, patron, filtro):
+        self.filtro = filtro
+
+    async def unroute(self, patron):
+        self.filtro = None
+
+    async def goto(self, url, wait_until, timeout):
+        self.llamadas.append(('goto', wait_until))
+        for resource_type, url_recurso in self.peticiones:
+            await self.filtro(_FakeRoute(resource_type, url_recurso, self.decisiones))
+
+    async def title(self):
+        return "Producto"
+
+    async def content(self):
+        return self.html
+
+    async def wait_for_selector(self, css, timeout):
+        self.llamadas.append(('wait_for_selector', css))
+
+    async def wait_for_load_state(self, estado, timeout):
+        self.llamadas.append(('wait_for_load_state', estado))
+
+    @property
+    def context(self):
+        raise RuntimeError("sin CDP en la prueba")
+
+
+def test_modo_ligero_bloquea_recursos_y_termina_al_resolver_el_selector(monkeypatch):
+    from contextlib import asynccontextmanager
+    from src.scraper_playwright import MERCADOLIBRE_SELECTORS, PlaywrightScraper
+
+    peticiones = [
+        ('document', 'https://articulo.mercadolibre.com.mx/MLM-1'),
+        ('script', 'https://http2.mlstatic.com/app.js'),
+        ('xhr', 'https://api.mercadolibre.com/items/MLM1'),
+        ('image', 'https://http2.mlstatic.com/foto.webp'),
+        ('font', 'https://http2.mlstatic.com/fuente.woff2'),
+        ('stylesheet', 'https://http2.mlstatic.com/estilos.css'),
+        ('media', 'https://http2.mlstatic.com/video.mp4'),
+        ('script', 'https://www.googletagmanager.com/gtm.js'),
+    ]
+    page = _FakeRenderPage(
+        peticiones, '<html><body><span class="andes-money-amount__fraction">1,299</span></body></html>'
+    )
+
+    class FakePool:
+        sessions = BrowserSessionStore(path=os.path.join(tempfile.mkdtemp(), "sessions.json"))
+        renders = []
+
+        @asynccontextmanager
+        async def page(self, clave):
+            yield page
+
+        def record_render(self, ms, bloqueadas, bytes_cargados):
+            self.renders.append(bloqueadas)
+
+    monkeypatch.setattr(FakePool.sessions, "needs_refresh", lambda clave: False)
+    monkeypatch.setenv("PLAYWRIGHT_LEAN_MODE", "True")
+    scraper = PlaywrightScraper(pool=FakePool(), admission=RenderAdmission(max_concurrent=1))
+
+    precio = asyncio.run(scraper.get_price("https://articulo.mercadolibre.com.mx/MLM-1", MERCADOLIBRE_SELECTORS))
+
+    assert precio == 1299.0
+    bloqueados = {tipo for (tipo, url), decision in page.decisiones.items() if decision == 'abort'}
+    assert bloqueados == {'image', 'font', 'stylesheet', 'media', 'script'}
+    assert page.decisiones['script', 'https://http2.mlstatic.com/app.js'] == 'continue'
+    assert page.decisiones['xhr', 'https://api.mercadolibre.com/items/MLM1'] == 'continue'
+    assert scraper.ultima_carga['bloqueadas'] == 5
+    # Solo hasta DOMContentLoaded y el primer selector: sin esperar la carga completa
+    assert page.llamadas == [('goto', 'domcontentloaded'), ('wait_for_selector', MERCADOLIBRE_SELECTORS.css)]
+    assert page.filtro is None
+
+
+def test_pool_recicla_contexto_y_navegador_sin_cortar_renders_en_curso(monkeypatch):
+    monkeypatch.setenv("BROWSER_CONTEXT_MAX_PAGES", "2")
+    monkeypatch.setenv("BROWSER_MAX_PAGES_PER_BROWSER", "3")
+    monkeypatch.setenv("BROWSER_WATCHDOG_INTERVAL", "0")
+    pool = BrowserPool(max_pages=4, sessions=BrowserSessionStore(path=os.path.join(tempfile.mkdtemp(), "s.json")))
+    chromium = _FakeChromium()
+
+    async def escenario():
+        pool._bind_loop()
+        pool._playwright = type("FakePlaywright", (), {"chromium": chromium})()
+
+        async with pool.page("tienda") as en_curso:
+            primero = pool._contexts["tienda"]
+            for _ in range(2):
+                async with pool.page("tienda"):
+                    pass
+            # El contexto llegó a su límite con un render en curso: se retira pero no se cierra
+            assert primero.retiring and not primero.context.closed
+
+            async with pool.page("tienda"):
+                assert pool._contexts["tienda"] is not primero
+            # Tercera página del navegador: se lanza otro para lo nuevo y el viejo espera
+            async with pool.page("tienda"):
+                pass
+            assert len(chromium.lanzados) == 2
+            assert not chromium.lanzados[0].closed and not en_curso.closed
+
+        # Terminado el último render del navegador viejo, se cierra con su contexto
+        assert primero.context.closed and chromium.lanzados[0].closed
+        assert not chromium.lanzados[1].closed
+
+    asyncio.run(escenario())
+    stats = pool.stats()
+    assert stats["context_recycles"] == 1
+    assert stats["browser_recycles"] == 1
+    assert stats["draining_contexts"] == 0 and stats["draining_browsers"] == 0
+
+
+def test_pool_no_supera_max_contexts_y_espera_uno_libre(monkeypatch):
+    monkeypatch.setenv("BROWSER_WATCHDOG_INTERVAL", "0")
+    pool = BrowserPool(
+        max_contexts=1, max_pages=4,
+        sessions=BrowserSessionStore(path=os.path.join(tempfile.mkdtemp(), "s.json")),
+    )
+    chromium = _FakeChromium()
+    abiertos = []
+
+    async def render(tienda, espera):
+        async with pool.page(tienda):
+            abiertos.append(len(pool._contexts))
+            await asyncio.sleep(espera)
+
+    async def escenario():
+        pool._bind_loop()
+        pool._playwright = type("FakePlaywright", (), {"chromium": chromium})()
+        primero = asyncio.ensure_future(render("tienda-a", 0.05))
+        await asyncio.sleep(0.01)
+        # El único contexto está ocupado: la otra tienda espera en lugar de abrir otro
+        await render("tienda-b", 0)
+        assert primero.done()
+
+    asyncio.run(escenario())
+    assert abiertos == [1, 1]
+    assert list(pool._contexts) == ["tienda-b"]
+
+
+class _FakePlaywrightDriver:
+    def __init__(self):
+        self.chromium = _FakeChromium()
+        self.stopped = False
+
+    async def stop(self):
+        self.stopped = True
+
+
+def test_pool_cierra_el_navegador_al_cambiar_de_loop_y_al_terminar_cada_ejecucion(monkeypatch):
+    import src.browser_pool as browser_pool
+    from src.tracker import ejecutar
+
+    monkeypatch.setenv("BROWSER_WATCHDOG_INTERVAL", "0")
+    sesiones = BrowserSessionStore(path=os.path.join(tempfile.mkdtemp(), "s.json"))
+    pool = BrowserPool(sessions=sesiones)
+    drivers = []
+
+    async def usar_pool(pool):
+        pool._bind_loop()
+        if pool._playwright is None:
+            drivers.append(_FakePlaywrightDriver())
+            pool._playwright = drivers[-1]
+        async with pool.page("tienda.mx"):
+            pass
+        return pool._browser
+
+    # Un loop que terminó sin cerrarse (p. ej. run_until_complete manual)
+    loop = asyncio.new_event_loop()
+    primero = loop.run_until_complete(usar_pool(pool))
+    # El siguiente asyncio.run reutiliza el pool y cierra el navegador del loop anterior
+    segundo = asyncio.run(usar_pool(pool))
+    loop.close()
+    assert primero.closed and drivers[0].stopped
+    assert segundo is not primero and not segundo.closed
+
+    # ejecutar() (scheduler, Streamlit) cierra el pool compartido al terminar
+    monkeypatch.setattr(browser_pool, "_pool", BrowserPool(sessions=sesiones))
+    navegador = ejecutar(usar_pool(browser_pool._pool))
+    assert navegador.closed and drivers[-1].stopped
+    assert browser_pool._pool is None
+
+
+def test_storage_state_persistido_se_carga_en_contextos_nuevos(tmp_path):
+    path = str(tmp_path / "sessions.json")
+    sesiones = BrowserSessionStore(path=path, save_interval=0)
+    consentimiento = {'name': 'consent', 'value': 'yes', 'domain': '.tienda.mx', 'path': '/',
+                      'expires': time.time() + 3600, 'httpOnly': False, 'secure': True, 'sameSite': 'Lax'}
+    caducada = dict(consentimiento, name='viejo', expires=time.time() - 10)
+    origins = [{'origin': 'https://www.tienda.mx', 'localStorage': [{'name': 'geo', 'value': 'MX'}]}]
+    sesiones.put("tienda.mx", [consentimiento, caducada], origins=origins)
+    assert oct(os.stat(path).st_mode & 0o777) == '0o600'
+
+    # Tras reiniciar, el contexto nuevo de la tienda arranca con cookies vigentes y localStorage
+    pool = BrowserPool(sessions=BrowserSessionStore(path=path))
+
+    async def escenario():
+        pool._bind_loop()
+        pool._playwright = type("FakePlaywright", (), {"chromium": _FakeChromium()})()
+        async with pool.page("tienda.mx"):
+            pass
+        async with pool.page("otra.com"):
+            pass
+        return pool._contexts["tienda.mx"].context, pool._contexts["otra.com"].context
+
+    tienda, otra = asyncio.run(escenario())
+    assert tienda.storage_state_inicial == {'cookies': [consentimiento], 'origins': origins}
+    assert otra.storage_state_inicial is None
+    assert pool.stats()['contexts_restored'] == 1
+
+    # Vencida la vigencia, el contexto vuelve a empezar de cero
+    caduco = BrowserSessionStore(path=path, storage_ttl=0.01)
+    time.sleep(0.02)
+    assert caduco.storage_state("tienda.mx") is None
+
+
+def test_test_url_descarga_una_sola_vez_y_desglosa_tiempos():
+    peticiones = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        peticiones.append(request.url)
+        return httpx.Response(200, text='<html><body><div class="x-price-primary">US $19.99</div></body></html>')
+
+    scraper = make_scraper(handler)
+    diagnostico = asyncio.run(scraper.test_url("https://www.ebay.com/itm/999"))
+
+    assert len(peticiones) == 1
+    assert diagnostico['precio'] == pytest.approx(19.99)
+    assert diagnostico['tier'] == 'selector'
+    assert diagnostico['status_code'] == 200
+    assert diagnostico['bytes'] > 0
+    assert {'static_ms', 'ttfb_ms', 'download_ms', 'parse_ms', 'extract_ms', 'total_ms'} <= set(diagnostico['tiempos'])
+
+
+def test_test_url_respeta_el_circuito_y_el_render_desactivado(monkeypatch):
+    peticiones = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        peticiones.append(request.url)
+        if request.url.host == "api.mercadolibre.com":
+            return httpx.Response(404, json={})
+        return httpx.Response(200, text='<html><body>sin precio</body></html>')
+
+    async def render_prohibido(*args, **kwargs):
+        raise AssertionError("test_url no debe renderizar con SCRAPER_RENDER_TIER desactivado")
+
+    monkeypatch.setattr("src.scraper.PLAYWRIGHT_AVAILABLE", True)
+    scraper = make_scraper(handler)
+    monkeypatch.setattr(scraper, "_render_price", render_prohibido)
+
+    diagnostico = asyncio.run(scraper.test_url("https://articulo.mercadolibre.com.mx/MLM-123-producto"))
+    assert diagnostico['precio'] is None
+    assert 'render_ms' not in diagnostico['tiempos']
+
+    scraper.http.breakers = CircuitBreakers(threshold=1, cooldown=60)
+    scraper.http.breakers.record_failure("ebay.com")
+    peticiones.clear()
+    diagnostico = asyncio.run(scraper.test_url("https://www.ebay.com/itm/999"))
+    assert peticiones == []
+    assert diagnostico['error'] == 'circuit-open'
+
+
+def test_cache_compartida_agrupa_peticiones_por_url_canonica():
+    descargas = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        descargas.append(request.url)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, text='<div class="x-price-primary">US $30.00</div>')
+
+    scraper = make_scraper(handler, results=ScrapeResultCache(ttl=60))
+    urls = [
+        "https://www.ebay.com/itm/42",
+        "https://ebay.com/itm/42?utm_source=mail",
+        "https://www.ebay.com/itm/42#fotos",
+    ]
+
+    async def escenario():
+        # Tres usuarios a la vez y una actualización masiva poco después
+        concurrentes = await asyncio.gather(*(scraper.get_price(url) for url in urls))
+        masivo = await scraper.get_prices(urls, scheduler=DomainScheduler(min_interval=0.01, limits={}))
+        return concurrentes, masivo
+
+    concurrentes, masivo = asyncio.run(escenario())
+    assert concurrentes == [30.0, 30.0, 30.0]
+    assert masivo == [30.0, 30.0, 30.0]
+    assert len(descargas) == 1
+    assert scraper.results.stats()['coalesced'] == 2
+
+
+def test_url_canonica_de_mercadolibre_y_mercadolivre():
+    assert canonical_url("https://articulo.mercadolibre.com.mx/MLM-123456789-laptop-_JM?utm_source=x") == (
+        "https://articulo.mercadolibre.com.mx/MLM-123456789"
+    )
+    assert canonical_url("https://produto.mercadolivre.com.br/MLB-1234567890-tenis-_JM#fotos") == (
+        "https://produto.mercadolivre.com.br/MLB-1234567890"
+    )
+    assert canonical_url("https://www.mercadolivre.com.br/tenis/p/mlb123456") == (
+        "https://mercadolivre.com.br/p/MLB123456"
+    )
+
+
+def test_cache_compartida_si_cancelan_al_lider_otra_espera_reintenta():
+    cache = ScrapeResultCache(ttl=60)
+    llamadas = []
+
+    async def fetch():
+        llamadas.append(1)
+        await asyncio.sleep(0.05)
+        return {'precio': 30.0, 'tier': 'selector', 'detalle': None}
+
+    async def escenario():
+        lider = asyncio.ensure_future(cache.get_or_fetch("https://www.ebay.com/itm/7", fetch))
+        await asyncio.sleep(0)
+        seguidor = asyncio.ensure_future(cache.get_or_fetch("https://www.ebay.com/itm/7", fetch))
+        await asyncio.sleep(0.01)
+        lider.cancel()
+        return await asyncio.gather(lider, seguidor, return_exceptions=True)
+
+    lider, seguidor = asyncio.run(escenario())
+    assert isinstance(lider, asyncio.CancelledError)
+    assert seguidor['precio'] == 30.0
+    assert len(llamadas) == 2
+    assert cache.stats()['inflight'] == 0
+
+
+def test_importar_scraper_no_carga_dependencias_pesadas():
+    raiz = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    codigo = (
+        "import sys; from src.scraper import PriceScraper; PriceScraper(); "
+        "print(sorted(m for m in ('playwright', 'bs4', 'lxml.html', 'selectolax') if m in sys.modules))"
+    )
+    proceso = subprocess.run([sys.executable, '-c', codigo], cwd=raiz, capture_output=True, text=True)
+
+    assert proceso.returncode == 0, proceso.stderr
+    # Sin banners al importar: la única salida es la lista de módulos cargados
+    assert proceso.stdout.strip() == '[]'
@@ -0,0 +1,95 @@
+"""
+Benchmark del pool de extracción para el Price Tracker.
+Simula una actualización masiva (muchas páginas grandes extraídas a la vez)
+mientras otra tarea mide cuánto se retrasa el event loop, que es lo que
+sufren las peticiones de la API. Compara la extracción en el proceso de la
+API con la del pool de procesos.
+
+Uso:
+    python benchmarks/extraction_benchmark.py [--pages 40] [--workers 2]
+
+Author: HellSpawn
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.extraction_executor import ExtractionExecutor
+from src.scraper import PriceScraper
+
+# Ficha grande sin datos estructurados: obliga a parsear el árbol completo
+_BLOQUE = '<div class="a-section"><span>Producto relacionado {i}</span><ul><li>A</li><li>B</li></ul></div>\n'
+PAGINA = (
+    '<html><body>' + ''.join(_BLOQUE.format(i=i) for i in range(6000))
+    + '<span id="priceblock_ourprice">$1499.00</span></body></html>'
+).encode()
+
+
+async def medir_retraso(parar: asyncio.Event, muestras: list, intervalo: float = 0.005):
+    """Registra cuánto tarda el loop en despertar respecto a lo pedido (ms)."""
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(intervalo)
+        muestras.append((time.perf_counter() - inicio - intervalo) * 1000)
+
+
+async def ejecutar(scraper: PriceScraper, paginas: int) -> dict:
+    """Extrae las páginas en paralelo mientras se mide el retraso del loop."""
+    parar = asyncio.Event()
+    muestras = []
+    sonda = asyncio.create_task(medir_retraso(parar, muestras))
+    inicio = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        resultados = await asyncio.gather(*(
+            scraper.extract_html_async(PAGINA, 'amazon') for _ in range(paginas)
+        ))
+    total = time.perf_counter() - inicio
+    parar.set()
+    await sonda
+    assert all(resultado['precio'] == 1499.0 for resultado, _ in resultados)
+    muestras.sort()
+    return {
+        'total_s': total,
+        'p50_ms': statistics.median(muestras),
+        'p99_ms': muestras[int(len(muestras) * 0.99) - 1] if len(muestras) > 1 else muestras[0],
+        'max_ms': muestras[-1],
+    }
+
+
+async def main():
+    """Ejecuta el benchmark en ambos modos e imprime la comparación."""
+    parser = argparse.ArgumentParser(description="Retraso del event loop: extracción en proceso vs pool")
+    parser.add_argument('--pages', type=int, default=40, help='Páginas por actualización simulada')
+    parser.add_argument('--workers', type=int, default=2, help='Procesos del pool')
+    args = parser.parse_args()
+
+    scraper = PriceScraper()
+    scraper.stats = None
+    print(f"Página de prueba: {len(PAGINA) / 1024:.0f} KB, {args.pages} páginas")
+    print(f"{'modo':<12} {'total s':>8} {'p50 ms':>8} {'p99 ms':>8} {'máx ms':>8}")
+
+    for modo, executor in (
+        ('en proceso', ExtractionExecutor(max_workers=0)),
+        ('pool', ExtractionExecutor(max_workers=args.workers, inline_bytes=0)),
+    ):
+        scraper.extractor = executor
+        try:
+            if executor.max_workers:
+                # Calentamiento: arranque de los procesos fuera de la medición
+                with redirect_stdout(StringIO()):
+                    await asyncio.gather(*(scraper.extract_html_async(PAGINA, 'amazon') for _ in range(args.workers)))
+            r = await ejecutar(scraper, args.pages)
+        finally:
+            executor.shutdown()
+        print(f"{modo:<12} {r['total_s']:>8.2f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""
+Benchmark de backends de parseo HTML para el Price Tracker.
+Mide el tiempo de parseo + extracción de precio por página para cada
+backend disponible sobre los mismos fixtures.
+
+Uso:
+    python benchmarks/parser_benchmark.py                  # fixtures sintéticos
+    python benchmarks/parser_benchmark.py --fixtures DIR   # páginas guardadas (*.html)
+
+Los archivos de --fixtures deben llamarse <dominio>_<nombre>.html
+(por ejemplo amazon_laptop.html) para aplicar los selectores de la tienda.
+
+Author: HellSpawn
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.html_parser import BACKENDS, backend_disponible, get_parser_backend
+from src.scraper import PriceScraper
+
+# Marcado de relleno parecido al de una ficha de producto real
+_BLOQUE_RELLENO = (
+    '<div class="a-section s-item"><a href="/dp/B0{i:06d}"><img src="/img/{i}.jpg" alt="Producto {i}"></a>'
+    '<span class="a-size-base">Producto relacionado número {i} con descripción larga</span>'
+    '<ul><li>Característica A</li><li>Característica B</li><li>Característica C</li></ul></div>\n'
+)
+
+_PRECIOS = {
+    'amazon': '<span id="priceblock_ourprice">$1499.00</span>',
+    'mercadolibre': '<span class="andes-money-amount__fraction">8999</span>',
+    'ebay': '<div class="x-price-primary"><span>US $249.99</span></div>',
+}
+
+
+def generar_fixture(domain: str, tamano_kb: int, posicion: float) -> bytes:
+    """
+    Genera una página sintética con el precio en una posición relativa.
+
+    Args:
+        domain: Tienda cuyos selectores se usarán
+        tamano_kb: Tamaño aproximado de la página
+        posicion: Posición del precio (0.0 = inicio, 1.0 = final)
+
+    Returns:
+        HTML en bytes
+    """
+    bloques = max(1, (tamano_kb * 1024) // len(_BLOQUE_RELLENO.format(i=0)))
+    indice_precio = int(bloques * posicion)
+    partes = ['<!DOCTYPE html><html><head><title>Producto</title></head><body>']
+    for i in range(bloques):
+        if i == indice_precio:
+            partes.append(_PRECIOS[domain])
+        partes.append(_BLOQUE_RELLENO.format(i=i))
+    partes.append('</body></html>')
+    return ''.join(partes).encode('utf-8')
+
+
+def cargar_fixtures(directorio: str = None) -> List[Tuple[str, str, bytes]]:
+    """Devuelve una lista de (nombre, dominio, html)."""
+    if directorio:
+        fixtures = []
+        for nombre in sorted(os.listdir(directorio)):
+            if nombre.endswith('.html'):
+                with open(os.path.join(directorio, nombre), 'rb') as f:
+                    fixtures.append((nombre, nombre.split('_')[0], f.read()))
+        return fixtures
+    return [
+        (f'{domain}_{tamano}kb_{int(posicion * 100)}pct', domain, generar_fixture(domain, tamano, posicion))
+        for domain in _PRECIOS
+        for tamano in (200, 1500)
+        for posicion in (0.1, 0.9)
+    ]
+
+
+def medir(scraper: PriceScraper, backend_name: str, domain: str, html: bytes, repeticiones: int) -> Dict:
+    """Mide parseo + extracción con un backend; devuelve la mediana en ms."""
+    scraper.parser = get_parser_backend(backend_name)
+    tiempos = []
+    precio = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        # Los scrapers imprimen trazas; se silencian para no medir la consola
+        with redirect_stdout(StringIO()):
+            doc = scraper.parser.parse(html)
+            precio = scraper._extract_price_by_domain(doc, domain)
+            if precio is None:
+                precio = scraper._extract_price_generic(doc)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {'ms': statistics.median(tiempos), 'precio': precio}
+
+
+def main():
+    """Ejecuta el benchmark e imprime una tabla por fixture y backend."""
+    parser = argparse.ArgumentParser(description="Benchmark de backends de parseo HTML")
+    parser.add_argument('--fixtures', type=str, default=None, help='Directorio con páginas *.html')
+    parser.add_argument('--repeticiones', type=int, default=5, help='Repeticiones por medición (default: 5)')
+    args = parser.parse_args()
+
+    with redirect_stdout(StringIO()):
+        scraper = PriceScraper()
+        scraper.cache = None
+        scraper.stats = None
+    backends = [nombre for nombre in BACKENDS if backend_disponible(nombre)]
+    fixtures = cargar_fixtures(args.fixtures)
+
+    print(f"{'fixture':<32} {'KB':>6}  " + ''.join(f"{b:>14}" for b in backends))
+    totales = {b: 0.0 for b in backends}
+    for nombre, domain, html in fixtures:
+        fila = f"{nombre:<32} {len(html) // 1024:>6}  "
+        for backend_name in backends:
+            resultado = medir(scraper, backend_name, domain, html, args.repeticiones)
+            totales[backend_name] += resultado['ms']
+            fila += f"{resultado['ms']:>11.1f} ms"
+        print(fila)
+    print(f"{'TOTAL':<32} {'':>6}  " + ''.join(f"{totales[b]:>11.1f} ms" for b in backends))
+
+
+if __name__ == "__main__":
+    main()
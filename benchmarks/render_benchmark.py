@@ -0,0 +1,58 @@
+"""
+Benchmark del render con Playwright para el Price Tracker.
+Renderiza las mismas URLs en modo completo (networkidle + espera fija) y en
+modo ligero (recursos bloqueados + espera por selector) y reporta, por
+página, el tiempo y los bytes ahorrados.
+
+Uso:
+    python benchmarks/render_benchmark.py URL [URL ...]
+
+Author: HellSpawn
+"""
+import argparse
+import asyncio
+import os
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.browser_pool import close_browser_pool
+from src.scraper_playwright import PlaywrightScraper
+
+
+async def medir(url: str, lean: bool) -> dict:
+    """Renderiza una URL en el modo indicado y devuelve precio y métricas."""
+    async with PlaywrightScraper() as scraper:
+        scraper.lean = lean
+        # El scraper imprime trazas; se silencian para no medir la consola
+        with redirect_stdout(StringIO()):
+            precio = await scraper.get_price(url)
+        return {'precio': precio, **(scraper.ultima_carga or {'ms': 0.0, 'bytes_cargados': 0, 'bloqueadas': 0})}
+
+
+async def main():
+    """Ejecuta el benchmark e imprime una tabla por URL."""
+    parser = argparse.ArgumentParser(description="Benchmark de render completo vs ligero")
+    parser.add_argument('urls', nargs='+', help='URLs de producto a renderizar')
+    args = parser.parse_args()
+
+    print(f"{'url':<48} {'completo':>10} {'ligero':>10} {'ahorro ms':>10} {'ahorro KB':>10} {'bloq.':>6}")
+    try:
+        for url in args.urls:
+            completo = await medir(url, lean=False)
+            ligero = await medir(url, lean=True)
+            ahorro_kb = (completo['bytes_cargados'] - ligero['bytes_cargados']) / 1024
+            print(
+                f"{url[:48]:<48} {completo['ms']:>7.0f} ms {ligero['ms']:>7.0f} ms "
+                f"{completo['ms'] - ligero['ms']:>10.0f} {ahorro_kb:>10.0f} {ligero['bloqueadas']:>6}"
+            )
+            if completo['precio'] != ligero['precio']:
+                print(f"   ⚠️  Precio distinto: completo={completo['precio']} ligero={ligero['precio']}")
+    finally:
+        await close_browser_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
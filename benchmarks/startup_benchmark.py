@@ -0,0 +1,122 @@
+"""
+Benchmark de arranque en frío para el Price Tracker.
+Importa cada módulo de entrada en un intérprete nuevo con
+`python -X importtime`, toma la mediana del tiempo acumulado y comprueba
+que las dependencias pesadas (Playwright, BeautifulSoup, lxml, selectolax)
+no se carguen al importar, sino en el primer uso.
+
+Los resultados se comparan con benchmarks/startup_baseline.json, que se
+versiona junto al código para seguir la métrica en el tiempo.
+
+Uso:
+    python benchmarks/startup_benchmark.py            # medir y comparar
+    python benchmarks/startup_benchmark.py --update   # regrabar la línea base
+    python benchmarks/startup_benchmark.py --check    # salir con error si empeora
+
+Author: HellSpawn
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(RAIZ, 'benchmarks', 'startup_baseline.json')
+
+# Módulos de entrada: workers de uvicorn, scheduler y el scraper que ambos importan
+OBJETIVOS = ['src.scraper', 'src.scheduler', 'backend.app.main']
+
+# Dependencias que solo deben importarse cuando se usan
+PESADOS = ['playwright', 'bs4', 'lxml.html', 'selectolax']
+
+
+def medir(modulo: str) -> Dict:
+    """
+    Importa un módulo en un intérprete nuevo y extrae su tiempo acumulado.
+
+    Args:
+        modulo: Nombre del módulo a importar
+
+    Returns:
+        Diccionario con 'us' (microsegundos), 'pesados' cargados y 'salida'
+        (líneas impresas durante la importación)
+    """
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=RAIZ, capture_output=True, text=True,
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{proceso.stderr[-2000:]}")
+
+    cargados = {}
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:'):
+            continue
+        partes = linea.split('|')
+        if len(partes) != 3 or not partes[1].strip().isdigit():
+            continue
+        cargados[partes[2].strip()] = int(partes[1])
+    return {
+        'us': cargados.get(modulo, 0),
+        'pesados': [nombre for nombre in PESADOS if nombre in cargados],
+        'salida': len(proceso.stdout.splitlines()),
+    }
+
+
+def ejecutar(repeticiones: int) -> Dict[str, Dict]:
+    """Mide cada objetivo varias veces y resume con la mediana."""
+    resultados = {}
+    for modulo in OBJETIVOS:
+        muestras: List[Dict] = [medir(modulo) for _ in range(repeticiones)]
+        resultados[modulo] = {
+            'ms': round(statistics.median(m['us'] for m in muestras) / 1000, 1),
+            'pesados': muestras[-1]['pesados'],
+            'lineas_impresas': muestras[-1]['salida'],
+        }
+    return resultados
+
+
+def main():
+    """Mide, imprime la comparación con la línea base y opcionalmente la actualiza."""
+    parser = argparse.ArgumentParser(description="Tiempo de importación de los módulos de entrada")
+    parser.add_argument('--repeat', type=int, default=5, help='Intérpretes por módulo (se usa la mediana)')
+    parser.add_argument('--update', action='store_true', help='Guardar los resultados como nueva línea base')
+    parser.add_argument('--check', action='store_true', help='Fallar si algún módulo empeora')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Empeoramiento tolerado (0.5 = +50%%)')
+    args = parser.parse_args()
+
+    base = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE, encoding='utf-8') as f:
+            base = json.load(f)
+
+    resultados = ejecutar(args.repeat)
+    errores = []
+    print(f"{'módulo':<20} {'ms':>8} {'base ms':>8} {'cambio':>8}  pesados / líneas impresas")
+    for modulo, r in resultados.items():
+        anterior = base.get(modulo, {}).get('ms')
+        cambio = f"{(r['ms'] - anterior) / anterior:+.0%}" if anterior else '-'
+        print(f"{modulo:<20} {r['ms']:>8.1f} {anterior or '-':>8} {cambio:>8}  "
+              f"{', '.join(r['pesados']) or 'ninguno'} / {r['lineas_impresas']}")
+        if anterior and r['ms'] > anterior * (1 + args.tolerance):
+            errores.append(f"{modulo}: {r['ms']} ms (base {anterior} ms)")
+        if r['pesados']:
+            errores.append(f"{modulo}: importa {', '.join(r['pesados'])} al cargar")
+
+    if args.update:
+        with open(BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"✓ Línea base actualizada: {BASELINE}")
+
+    if errores:
+        print("⚠️  " + "\n⚠️  ".join(errores))
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
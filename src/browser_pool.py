@@ -0,0 +1,468 @@
+"""
+Pool persistente de navegadores Playwright para el Price Tracker.
+Lanza Chromium una sola vez por proceso y presta páginas a los scrapers,
+en lugar de arrancar Playwright y un navegador nuevo en cada scrape.
+Como Chromium acumula memoria con el uso, los contextos y el navegador se
+reciclan tras un número de páginas servidas o cuando el RSS de los
+renderers supera el presupuesto (requiere psutil), sin cortar los renders
+en curso: lo retirado deja de recibir páginas y se cierra al quedar libre.
+Cada contexto nuevo arranca con el storage state guardado de su tienda
+(ver browser_sessions), así no repite el flujo de primera visita.
+
+Author: HellSpawn
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from playwright.async_api import async_playwright
+
+from src.browser_sessions import BrowserSessionStore, get_session_store
+
+BROWSER_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+]
+
+CONTEXT_OPTIONS = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'locale': 'es-MX',
+    'timezone_id': 'America/Mexico_City',
+}
+
+
+class _PooledContext:
+    """Contexto del navegador con sus páginas libres y en uso."""
+
+    def __init__(self, context, browser):
+        self.context = context
+        self.browser = browser
+        self.idle_pages: List = []
+        self.in_use = 0
+        self.pages_served = 0
+        # Retirado: no recibe páginas nuevas y se cierra al quedar sin uso
+        self.retiring = False
+
+
+def renderer_rss_mb() -> Optional[float]:
+    """
+    Memoria residente de los procesos de Chromium lanzados por este proceso.
+
+    Returns:
+        MB de RSS sumados, o None si psutil no está instalado
+    """
+    try:
+        import psutil
+    except ImportError:
+        return None
+    total = 0
+    for hijo in psutil.Process().children(recursive=True):
+        try:
+            nombre = hijo.name().lower()
+            if 'chrom' in nombre or 'headless_shell' in nombre:
+                total += hijo.memory_info().rss
+        except psutil.Error:
+            continue
+    return round(total / (1024 * 1024), 1)
+
+
+class BrowserPool:
+    """Pool de contextos y páginas sobre un único Chromium compartido."""
+
+    def __init__(
+        self,
+        max_contexts: Optional[int] = None,
+        max_pages: Optional[int] = None,
+        headless: bool = True,
+        sessions: Optional[BrowserSessionStore] = None,
+    ):
+        """
+        Inicializa el pool (el navegador se lanza en start()).
+
+        Args:
+            max_contexts: Número máximo de contextos abiertos a la vez
+            max_pages: Páginas renderizando en paralelo (concurrencia máxima)
+            headless: Si el navegador corre sin interfaz
+            sessions: Storage state por tienda para los contextos nuevos
+                (por defecto, el almacén compartido del proceso)
+        """
+        self.max_contexts = max_contexts or int(os.getenv("BROWSER_POOL_MAX_CONTEXTS", "4"))
+        self.max_pages = max_pages or int(os.getenv("BROWSER_POOL_MAX_PAGES", "4"))
+        self.headless = headless
+        self.sessions = sessions or get_session_store()
+        # Límites de reciclaje (0 = sin límite)
+        self.context_max_pages = int(os.getenv("BROWSER_CONTEXT_MAX_PAGES", "200"))
+        self.browser_max_pages = int(os.getenv("BROWSER_MAX_PAGES_PER_BROWSER", "2000"))
+        self.max_rss_mb = float(os.getenv("BROWSER_MAX_RSS_MB", "1536"))
+        self.watchdog_interval = float(os.getenv("BROWSER_WATCHDOG_INTERVAL", "30"))
+
+        self._playwright = None
+        self._browser = None
+        self._contexts: "OrderedDict[str, _PooledContext]" = OrderedDict()
+        # Contextos retirados con renders en curso y navegadores viejos por cerrar
+        self._draining: List[_PooledContext] = []
+        self._old_browsers: List = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        # Avisa cuando un contexto queda sin renders (para respetar max_contexts)
+        self._libre: Optional[asyncio.Condition] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._watchdog: Optional[asyncio.Task] = None
+        self.pages_served = 0
+        self.restarts = 0
+        # Reciclaje por memoria
+        self.browser_pages = 0
+        self.context_recycles = 0
+        self.browser_recycles = 0
+        self.rss_mb: Optional[float] = None
+        # Contextos creados con storage state guardado
+        self.contexts_restored = 0
+        # Métricas de render (ver PlaywrightScraper)
+        self.renders = 0
+        self.render_ms = 0.0
+        self.blocked_requests = 0
+        self.bytes_loaded = 0
+
+    @property
+    def started(self) -> bool:
+        """Indica si el navegador está lanzado y conectado."""
+        return self._browser is not None and self._browser.is_connected()
+
+    def _bind_loop(self):
+        """Crea las primitivas de sincronización en el event loop actual."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Los objetos de Playwright de otro loop ya no son utilizables aquí
+            self._cerrar_loop_anterior()
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._libre = asyncio.Condition(self._lock)
+            self._slots = asyncio.Semaphore(self.max_pages)
+            self._playwright = None
+            self._browser = None
+            self._contexts = OrderedDict()
+            self._draining = []
+            self._old_browsers = []
+            self._watchdog = None
+
+    def _cerrar_loop_anterior(self):
+        """
+        Cierra el navegador que quedó abierto en el event loop anterior.
+        Si ese loop sigue abierto (no corre en ningún hilo) se ejecuta stop()
+        en él desde un hilo auxiliar; si ya se cerró, sus objetos no se pueden
+        usar y solo queda avisar (fuera de FastAPI hay que llamar a
+        close_browser_pool() antes de terminar cada asyncio.run).
+        """
+        anterior = self._loop
+        if anterior is None or (self._browser is None and self._playwright is None and not self._old_browsers):
+            return
+        if anterior.is_closed() or anterior.is_running():
+            print("⚠️  [BrowserPool] El event loop anterior terminó sin cerrar el navegador")
+            return
+        hilo = threading.Thread(target=anterior.run_until_complete, args=(self.stop(),), daemon=True)
+        hilo.start()
+        hilo.join(timeout=30)
+        if hilo.is_alive():
+            print("⚠️  [BrowserPool] No se pudo cerrar a tiempo el navegador del loop anterior")
+
+    async def start(self):
+        """Arranca Playwright, lanza Chromium si no está corriendo y el watchdog de memoria."""
+        self._bind_loop()
+        async with self._lock:
+            await self._launch()
+        if self.watchdog_interval > 0 and (self._watchdog is None or self._watchdog.done()):
+            self._watchdog = asyncio.create_task(self._vigilar_memoria())
+
+    async def _launch(self):
+        """Lanza el navegador (debe llamarse con el lock tomado)."""
+        if self.started:
+            return
+        if self._browser is not None:
+            # El navegador murió: descartar contextos y relanzar
+            print("⚠️  [BrowserPool] Navegador desconectado, relanzando...")
+            self.restarts += 1
+            self._contexts = OrderedDict()
+            self._draining = []
+        if self._playwright is None:
+            print("🎬 [BrowserPool] Iniciando playwright...")
+            self._playwright = await async_playwright().start()
+        print("🎬 [BrowserPool] Lanzando navegador Chromium...")
+        try:
+            self._browser = await self._playwright.chromium.launch(
+                headless=self.headless,
+                args=BROWSER_ARGS,
+            )
+        except Exception:
+            # No dejar el driver de Playwright huérfano si Chromium no arranca
+            await self._playwright.stop()
+            self._playwright = None
+            self._browser = None
+            raise
+        self.browser_pages = 0
+        print("✅ [BrowserPool] Navegador listo")
+
+    async def stop(self):
+        """Cierra contextos, navegador y Playwright."""
+        if self._loop is None:
+            return
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+        async with self._lock:
+            for pooled in list(self._contexts.values()) + self._draining:
+                try:
+                    await pooled.context.close()
+                except Exception:
+                    pass
+            self._contexts = OrderedDict()
+            self._draining = []
+            for navegador in self._old_browsers:
+                try:
+                    await navegador.close()
+                except Exception:
+                    pass
+            self._old_browsers = []
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception:
+                    pass
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    async def _get_context(self, key: str) -> _PooledContext:
+        """
+        Obtiene (o crea) el contexto asociado a una clave.
+        Si se alcanzó max_contexts, cierra el contexto inactivo menos usado;
+        si todos están renderizando, espera a que alguno quede libre.
+        Los contextos nuevos cargan el storage state guardado para la clave.
+        """
+        async with self._libre:
+            while True:
+                await self._launch()
+                pooled = self._contexts.get(key)
+                if pooled is not None:
+                    self._contexts.move_to_end(key)
+                    return pooled
+                if len(self._contexts) < self.max_contexts:
+                    break
+                inactivo = next((k for k, c in self._contexts.items() if c.in_use == 0), None)
+                if inactivo is not None:
+                    old = self._contexts.pop(inactivo)
+                    await old.context.close()
+                    break
+                await self._libre.wait()
+
+            estado = self.sessions.storage_state(key)
+            if estado is not None:
+                self.contexts_restored += 1
+                context = await self._browser.new_context(**CONTEXT_OPTIONS, storage_state=estado)
+            else:
+                context = await self._browser.new_context(**CONTEXT_OPTIONS)
+            pooled = _PooledContext(context, self._browser)
+            self._contexts[key] = pooled
+            return pooled
+
+    @asynccontextmanager
+    async def page(self, key: str = 'default'):
+        """
+        Presta una página del pool y la devuelve al terminar.
+
+        Args:
+            key: Clave del contexto (la tienda: separa cookies y storage state)
+
+        Yields:
+            Página de Playwright lista para navegar
+        """
+        self._bind_loop()
+        async with self._slots:
+            pooled = await self._get_context(key)
+            page = pooled.idle_pages.pop() if pooled.idle_pages else await pooled.context.new_page()
+            pooled.in_use += 1
+            reusable = True
+            try:
+                yield page
+            except Exception:
+                reusable = False
+                raise
+            finally:
+                pooled.in_use -= 1
+                pooled.pages_served += 1
+                self.pages_served += 1
+                if pooled.browser is self._browser:
+                    self.browser_pages += 1
+                await self._release_page(pooled, page, reusable)
+                await self._revisar_limites(pooled)
+
+    async def _release_page(self, pooled: _PooledContext, page, reusable: bool):
+        """Limpia la página y la deja disponible, o la cierra si falló."""
+        if reusable and not pooled.retiring and not page.is_closed():
+            try:
+                await page.goto('about:blank')
+                pooled.idle_pages.append(page)
+                return
+            except Exception:
+                pass
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+    async def _revisar_limites(self, pooled: _PooledContext):
+        """Tras devolver una página, recicla lo que superó sus límites y despierta a quien espera contexto."""
+        async with self._libre:
+            self._libre.notify_all()
+            if self.context_max_pages and not pooled.retiring and pooled.pages_served >= self.context_max_pages:
+                print(f"♻️  [BrowserPool] Contexto con {pooled.pages_served} páginas servidas, reciclando")
+                self.context_recycles += 1
+                self._retirar_contexto(pooled)
+            if self.browser_max_pages and self.browser_pages >= self.browser_max_pages:
+                self._retirar_navegador(f"{self.browser_pages} páginas servidas")
+            await self._cerrar_retirados()
+
+    def _retirar_contexto(self, pooled: _PooledContext):
+        """Saca un contexto del pool; se cierra cuando termina su último render (con el lock tomado)."""
+        pooled.retiring = True
+        for key, actual in list(self._contexts.items()):
+            if actual is pooled:
+                del self._contexts[key]
+        self._draining.append(pooled)
+
+    def _retirar_navegador(self, motivo: str):
+        """
+        Retira el navegador actual: los renders nuevos irán a uno recién lanzado
+        y el viejo se cierra al terminar sus renders (con el lock tomado).
+        """
+        if self._browser is None:
+            return
+        print(f"♻️  [BrowserPool] Reciclando navegador ({motivo})")
+        self.browser_recycles += 1
+        for pooled in list(self._contexts.values()):
+            self._retirar_contexto(pooled)
+        # Sin navegador actual, el próximo _get_context lanza uno nuevo
+        self._old_browsers.append(self._browser)
+        self._browser = None
+        self.browser_pages = 0
+
+    async def _cerrar_retirados(self):
+        """Cierra contextos retirados sin uso y navegadores viejos sin contextos (con el lock tomado)."""
+        pendientes = []
+        for pooled in self._draining:
+            if pooled.in_use > 0:
+                pendientes.append(pooled)
+                continue
+            try:
+                await pooled.context.close()
+            except Exception:
+                pass
+        self._draining = pendientes
+
+        vivos = []
+        for navegador in self._old_browsers:
+            if any(p.browser is navegador for p in self._draining):
+                vivos.append(navegador)
+                continue
+            try:
+                await navegador.close()
+            except Exception:
+                pass
+        self._old_browsers = vivos
+
+    async def _vigilar_memoria(self):
+        """Watchdog: mide el RSS de Chromium y recicla el navegador si supera el presupuesto."""
+        while True:
+            await asyncio.sleep(self.watchdog_interval)
+            try:
+                self.rss_mb = renderer_rss_mb()
+                if self.rss_mb is None:
+                    continue
+                async with self._lock:
+                    # Mientras un navegador viejo termina sus renders su memoria sigue contando
+                    if self.max_rss_mb and self.rss_mb > self.max_rss_mb and not self._old_browsers:
+                        self._retirar_navegador(f"RSS {self.rss_mb} MB > {self.max_rss_mb:.0f} MB")
+                        self._libre.notify_all()
+                    await self._cerrar_retirados()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  [BrowserPool] Error en el watchdog de memoria: {e}")
+
+    async def health_check(self) -> Dict:
+        """
+        Verifica que el navegador siga conectado y lo relanza si murió.
+
+        Returns:
+            Diccionario con el estado del pool
+        """
+        if self._loop is not None and self._browser is not None and not self.started:
+            try:
+                await self.start()
+            except Exception as e:
+                print(f"❌ [BrowserPool] No se pudo relanzar el navegador: {e}")
+        return self.stats()
+
+    def record_render(self, ms: float, bloqueadas: int, bytes_cargados: int):
+        """
+        Acumula las métricas de un render.
+
+        Args:
+            ms: Duración del render en milisegundos
+            bloqueadas: Peticiones abortadas por el modo ligero
+            bytes_cargados: Bytes transferidos por la página
+        """
+        self.renders += 1
+        self.render_ms += ms
+        self.blocked_requests += bloqueadas
+        self.bytes_loaded += bytes_cargados
+
+    def stats(self) -> Dict:
+        """Devuelve estadísticas del pool."""
+        return {
+            'started': self.started,
+            'contexts': len(self._contexts),
+            'pages_in_use': sum(p.in_use for p in self._contexts.values()),
+            'idle_pages': sum(len(p.idle_pages) for p in self._contexts.values()),
+            'max_contexts': self.max_contexts,
+            'max_pages': self.max_pages,
+            'pages_served': self.pages_served,
+            'restarts': self.restarts,
+            'renders': self.renders,
+            'avg_render_ms': round(self.render_ms / self.renders, 1) if self.renders else 0.0,
+            'blocked_requests': self.blocked_requests,
+            'bytes_loaded': self.bytes_loaded,
+            'context_pages': {key: p.pages_served for key, p in self._contexts.items()},
+            'draining_contexts': len(self._draining),
+            'draining_browsers': len(self._old_browsers),
+            'browser_pages': self.browser_pages,
+            'context_recycles': self.context_recycles,
+            'browser_recycles': self.browser_recycles,
+            'renderer_rss_mb': self.rss_mb,
+            'max_rss_mb': self.max_rss_mb,
+            'contexts_restored': self.contexts_restored,
+        }
+
+
+_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Obtiene el pool de navegadores compartido por todo el proceso."""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool()
+    return _pool
+
+
+async def close_browser_pool():
+    """Cierra el pool compartido (para el shutdown de la aplicación)."""
+    global _pool
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
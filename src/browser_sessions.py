@@ -0,0 +1,233 @@
+"""
+Sesiones de navegador por tienda para el Price Tracker.
+Algunas tiendas bloquean las peticiones HTTP simples hasta que un reto de
+JavaScript o el banner de consentimiento deja una cookie. En lugar de
+renderizar cada página, se renderiza una por host, se guardan sus cookies
+y las descargas HTTP siguientes las reutilizan hasta que caducan.
+
+El storage state completo (cookies y localStorage) se guarda en JSON
+dentro de SCRAPER_CACHE_DIR y se carga en cada contexto nuevo de Chromium,
+así los renders siguientes del host se saltan el consentimiento, los
+avisos de ubicación y las redirecciones de primera visita, incluso tras
+reiniciar el proceso o reciclar el navegador.
+
+Author: HellSpawn
+"""
+import os
+import time
+from typing import Dict, List, Optional
+
+from src.http_cache import cache_dir
+from src.json_store import JsonStore
+
+
+def _cookies_vigentes(cookies: List[Dict], ahora: float) -> List[Dict]:
+    """Descarta las cookies caducadas (expires -1 es cookie de sesión)."""
+    return [c for c in cookies if not (c.get('expires', -1) > 0 and c['expires'] <= ahora)]
+
+
+class BrowserSessionStore(JsonStore):
+    """Cookies y localStorage cosechados con Playwright por host, con caducidad."""
+
+    store_label = 'las sesiones de navegador'
+    # Contiene cookies de sesión: solo legible por el usuario
+    file_mode = 0o600
+    json_indent = None
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        storage_ttl: Optional[float] = None,
+        path: Optional[str] = None,
+        save_interval: Optional[float] = None,
+    ):
+        """
+        Inicializa el almacén cargando las sesiones guardadas en disco.
+
+        Args:
+            ttl: Segundos que se reutilizan las cookies por HTTP (SCRAPER_SESSION_TTL)
+            storage_ttl: Segundos que el storage state se carga en contextos
+                nuevos de Chromium (BROWSER_STORAGE_TTL)
+            path: Archivo JSON (por defecto browser_sessions.json en SCRAPER_CACHE_DIR)
+            save_interval: Segundos mínimos entre escrituras a disco
+        """
+        self.ttl = ttl if ttl is not None else float(os.getenv("SCRAPER_SESSION_TTL", "1800"))
+        self.storage_ttl = storage_ttl if storage_ttl is not None else float(
+            os.getenv("BROWSER_STORAGE_TTL", "86400")
+        )
+        self._init_store(path or os.path.join(cache_dir(), "browser_sessions.json"), save_interval)
+        self.harvests = 0
+        self.reuses = 0
+        self.invalidations = 0
+        self.context_loads = 0
+        self._sesiones: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        """Carga las sesiones guardadas en disco."""
+        data = self._read_json()
+        if isinstance(data, dict):
+            self._sesiones = data
+
+    def _snapshot(self) -> Dict:
+        return self._sesiones
+
+    def put(
+        self,
+        clave: str,
+        cookies: List[Dict],
+        user_agent: Optional[str] = None,
+        origins: Optional[List[Dict]] = None,
+    ):
+        """
+        Guarda las cookies (y el localStorage) de un render.
+
+        Args:
+            clave: Host de la URL renderizada
+            cookies: Cookies en el formato de Playwright (context.cookies())
+            user_agent: User-Agent con el que se obtuvieron
+            origins: localStorage por origen, como en context.storage_state()
+        """
+        if not cookies and not origins:
+            return
+        with self._lock:
+            anterior = self._sesiones.get(clave, {})
+            self._sesiones[clave] = {
+                'cookies': cookies,
+                'origins': origins if origins is not None else anterior.get('origins', []),
+                'user_agent': user_agent,
+                'creada': time.time(),
+            }
+            self.harvests += 1
+            self._dirty = True
+        self._maybe_save()
+
+    def get(self, clave: str) -> Optional[Dict]:
+        """
+        Devuelve la sesión de un host si sus cookies siguen valiendo para HTTP.
+
+        Args:
+            clave: Host de la URL
+
+        Returns:
+            Diccionario con 'cookies', 'user_agent' y 'expira', o None
+        """
+        ahora = time.time()
+        with self._lock:
+            sesion = self._sesiones.get(clave)
+            if sesion is None or self.ttl <= 0 or sesion['creada'] + self.ttl <= ahora:
+                return None
+            cookies = _cookies_vigentes(sesion['cookies'], ahora)
+            if not cookies:
+                return None
+            self.reuses += 1
+            return {
+                'cookies': cookies,
+                'user_agent': sesion.get('user_agent'),
+                'expira': sesion['creada'] + self.ttl,
+            }
+
+    def has_session(self, clave: str) -> bool:
+        """
+        Indica si un host tiene cookies vigentes para HTTP (sin contar un uso).
+
+        Args:
+            clave: Host de la URL
+
+        Returns:
+            True si get(clave) devolvería una sesión
+        """
+        ahora = time.time()
+        with self._lock:
+            sesion = self._sesiones.get(clave)
+            return bool(
+                sesion is not None and self.ttl > 0 and sesion['creada'] + self.ttl > ahora
+                and _cookies_vigentes(sesion['cookies'], ahora)
+            )
+
+    def storage_state(self, clave: str) -> Optional[Dict]:
+        """
+        Storage state de un host para crear un contexto de Chromium.
+
+        Args:
+            clave: Host de la URL
+
+        Returns:
+            Diccionario {'cookies', 'origins'} para new_context(storage_state=...),
+            o None si no hay sesión o ya caducó
+        """
+        ahora = time.time()
+        with self._lock:
+            sesion = self._sesiones.get(clave)
+            if sesion is None or self.storage_ttl <= 0:
+                return None
+            if sesion['creada'] + self.storage_ttl <= ahora:
+                del self._sesiones[clave]
+                self._dirty = True
+                return None
+            self.context_loads += 1
+            return {
+                'cookies': _cookies_vigentes(sesion['cookies'], ahora),
+                'origins': sesion.get('origins', []),
+            }
+
+    def needs_refresh(self, clave: str) -> bool:
+        """
+        Indica si conviene volver a capturar el storage state de un host.
+
+        Args:
+            clave: Host de la URL
+
+        Returns:
+            True si no hay sesión o ya pasó la mitad de su vigencia para HTTP
+        """
+        with self._lock:
+            sesion = self._sesiones.get(clave)
+            return sesion is None or time.time() - sesion['creada'] >= self.ttl / 2
+
+    def invalidate(self, clave: str):
+        """Descarta la sesión de un host (la tienda dejó de aceptarla)."""
+        with self._lock:
+            if self._sesiones.pop(clave, None) is not None:
+                self.invalidations += 1
+                self._dirty = True
+        self._maybe_save()
+
+    def stats(self) -> Dict:
+        """Devuelve las sesiones guardadas y los contadores de uso."""
+        ahora = time.time()
+        with self._lock:
+            sesiones = {
+                clave: {
+                    'cookies': len(_cookies_vigentes(s['cookies'], ahora)),
+                    'origins': len(s.get('origins', [])),
+                    'http_expira_en_s': max(0, round(s['creada'] + self.ttl - ahora)),
+                    'storage_expira_en_s': max(0, round(s['creada'] + self.storage_ttl - ahora)),
+                }
+                for clave, s in self._sesiones.items()
+            }
+        return {
+            'ttl': self.ttl,
+            'storage_ttl': self.storage_ttl,
+            'sessions': sesiones,
+            'harvests': self.harvests,
+            'reuses': self.reuses,
+            'context_loads': self.context_loads,
+            'invalidations': self.invalidations,
+        }
+
+
+_store: Optional[BrowserSessionStore] = None
+
+
+def get_session_store() -> BrowserSessionStore:
+    """
+    Obtiene el almacén de sesiones compartido por todo el proceso.
+
+    Returns:
+        Instancia única de BrowserSessionStore
+    """
+    global _store
+    if _store is None:
+        _store = BrowserSessionStore()
+    return _store
@@ -0,0 +1,173 @@
+"""
+Circuit breaker por tienda para el Price Tracker.
+Cuando una tienda encadena fallos (caída, timeouts, 5xx, 429) el circuito
+se abre y las peticiones siguientes fallan al instante en lugar de esperar
+el timeout completo por cada producto. Pasado el enfriamiento se deja pasar
+una única petición de prueba: si funciona el circuito se cierra, si falla
+vuelve a abrirse.
+
+Author: HellSpawn
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """La tienda está marcada como caída: la petición no se envía."""
+
+    def __init__(self, clave: str, retry_in: float):
+        super().__init__(f"Circuito abierto para {clave}, reintenta en {retry_in:.0f} s")
+        self.clave = clave
+        self.retry_in = retry_in
+
+
+def _estado() -> Dict:
+    """Estado inicial de una tienda."""
+    return {
+        'state': CLOSED,
+        'failures': 0,
+        'opened_at': None,
+        'cooldown': 0.0,
+        'probe_at': None,
+        'trips': 0,
+        'rejected': 0,
+    }
+
+
+class CircuitBreakers:
+    """Circuit breakers independientes por tienda."""
+
+    def __init__(self, threshold: Optional[int] = None, cooldown: Optional[float] = None):
+        """
+        Inicializa los circuitos.
+
+        Args:
+            threshold: Fallos seguidos que abren el circuito (SCRAPER_BREAKER_THRESHOLD, 0 = desactivado)
+            cooldown: Segundos abierto antes de la petición de prueba (SCRAPER_BREAKER_COOLDOWN)
+        """
+        self.threshold = threshold if threshold is not None else int(os.getenv("SCRAPER_BREAKER_THRESHOLD", "5"))
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv("SCRAPER_BREAKER_COOLDOWN", "60"))
+        self._lock = threading.Lock()
+        self._circuitos: Dict[str, Dict] = {}
+
+    def _restante(self, estado: Dict, ahora: float) -> float:
+        """Segundos que le quedan abierto a un circuito."""
+        return max(0.0, estado['opened_at'] + estado['cooldown'] - ahora)
+
+    def is_open(self, clave: str) -> bool:
+        """
+        Indica si una tienda está en enfriamiento (sin consumir la petición de prueba).
+
+        Args:
+            clave: Tienda de la URL
+
+        Returns:
+            True si el circuito está abierto y aún no toca probar
+        """
+        with self._lock:
+            estado = self._circuitos.get(clave)
+            return bool(estado and estado['state'] == OPEN and self._restante(estado, time.time()) > 0)
+
+    def before_request(self, clave: str):
+        """
+        Autoriza una petición a la tienda.
+
+        Args:
+            clave: Tienda de la URL
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto o ya hay una prueba en curso
+        """
+        if self.threshold <= 0:
+            return
+        ahora = time.time()
+        with self._lock:
+            estado = self._circuitos.get(clave)
+            if estado is None or estado['state'] == CLOSED:
+                return
+            if estado['state'] == OPEN:
+                restante = self._restante(estado, ahora)
+                if restante > 0:
+                    estado['rejected'] += 1
+                    raise CircuitOpenError(clave, restante)
+                estado['state'] = HALF_OPEN
+                estado['probe_at'] = ahora
+                print(f"🔌 {clave}: enfriamiento terminado, petición de prueba")
+                return
+            # Semiabierto: una sola prueba a la vez (si se perdió, otra tras el enfriamiento)
+            if ahora - estado['probe_at'] < self.cooldown:
+                estado['rejected'] += 1
+                raise CircuitOpenError(clave, self.cooldown - (ahora - estado['probe_at']))
+            estado['probe_at'] = ahora
+
+    def record_success(self, clave: str):
+        """Registra una respuesta sana: cierra el circuito y reinicia los fallos."""
+        with self._lock:
+            estado = self._circuitos.get(clave)
+            if estado is None:
+                return
+            if estado['state'] != CLOSED:
+                print(f"🔌 {clave}: la tienda responde de nuevo, circuito cerrado")
+            estado.update(state=CLOSED, failures=0, opened_at=None, probe_at=None)
+
+    def record_failure(self, clave: str, retry_after: Optional[float] = None):
+        """
+        Registra un fallo transitorio y abre el circuito si se supera el umbral.
+
+        Args:
+            clave: Tienda de la URL
+            retry_after: Espera pedida por la tienda; alarga el enfriamiento
+        """
+        if self.threshold <= 0:
+            return
+        ahora = time.time()
+        with self._lock:
+            estado = self._circuitos.setdefault(clave, _estado())
+            estado['failures'] += 1
+            if estado['state'] == HALF_OPEN or estado['failures'] >= self.threshold:
+                if estado['state'] != OPEN:
+                    estado['trips'] += 1
+                    print(f"🔌 {clave}: {estado['failures']} fallos seguidos, circuito abierto")
+                estado['state'] = OPEN
+                estado['opened_at'] = ahora
+                estado['cooldown'] = max(self.cooldown, retry_after or 0.0)
+                estado['probe_at'] = None
+
+    def stats(self) -> Dict:
+        """Devuelve el estado de cada circuito."""
+        ahora = time.time()
+        with self._lock:
+            circuitos = {}
+            for clave, estado in self._circuitos.items():
+                circuitos[clave] = {
+                    'state': estado['state'],
+                    'failures': estado['failures'],
+                    'retry_in_s': round(self._restante(estado, ahora), 1) if estado['state'] == OPEN else 0.0,
+                    'trips': estado['trips'],
+                    'rejected': estado['rejected'],
+                }
+        return {'threshold': self.threshold, 'cooldown': self.cooldown, 'circuits': circuitos}
+
+
+_breakers: Optional[CircuitBreakers] = None
+
+
+def get_circuit_breakers() -> CircuitBreakers:
+    """
+    Obtiene los circuit breakers compartidos por todo el proceso.
+
+    Returns:
+        Instancia única de CircuitBreakers
+    """
+    global _breakers
+    if _breakers is None:
+        _breakers = CircuitBreakers()
+    return _breakers
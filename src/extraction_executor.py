@@ -0,0 +1,186 @@
+"""
+Ejecutor de extracción en procesos para el Price Tracker.
+Parsear y extraer el precio de una página grande es trabajo de CPU que,
+dentro del event loop, retrasa todas las peticiones de la API mientras dura
+una actualización masiva. Este módulo lo envía a un ProcessPoolExecutor:
+al proceso hijo viajan los bytes crudos y de vuelta solo un resultado
+pequeño (precio, nivel y selectores probados), nunca el árbol parseado.
+Las páginas pequeñas se siguen procesando en el propio proceso, donde el
+coste de enviarlas supera al de parsearlas.
+
+Author: HellSpawn
+"""
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+
+# Scraper del proceso hijo (uno por worker, creado en el primer uso)
+_worker_scraper = None
+
+
+def _inicializar_worker():
+    """Configura el proceso hijo: solo extrae, sin cachés ni estadísticas propias."""
+    os.environ["SCRAPER_HTTP_CACHE"] = "False"
+    os.environ["SCRAPER_ADAPTIVE_ORDER"] = "False"
+    os.environ["SCRAPE_RESULT_CACHE"] = "False"
+    os.environ["SCRAPER_EXTRACT_WORKERS"] = "0"
+
+
+def extraer_en_proceso(
+    html: bytes,
+    domain: str,
+    orden_selectores: Optional[Tuple[str, ...]],
+    niveles: List[str],
+) -> Dict:
+    """
+    Parsea el HTML y extrae el precio dentro de un proceso del pool.
+
+    Args:
+        html: HTML crudo de la página
+        domain: Dominio detectado
+        orden_selectores: Claves de los selectores de la tienda en el orden a probar
+        niveles: Orden de los niveles ('structured', 'selector')
+
+    Returns:
+        Diccionario con 'resultado', 'fallidos', 'ganador' y 'parse_ms'
+    """
+    global _worker_scraper
+    if _worker_scraper is None:
+        from src.scraper import PriceScraper
+        _worker_scraper = PriceScraper()
+
+    tiempos = {}
+    compiled = _worker_scraper._compiled_en_orden(domain, orden_selectores)
+    resultado, _, registro = _worker_scraper._extraer_html(html, domain, niveles, compiled, tiempos)
+    return {
+        'resultado': resultado,
+        'fallidos': registro[0] if registro else None,
+        'ganador': registro[1] if registro else None,
+        'parse_ms': tiempos.get('parse_ms'),
+    }
+
+
+class ExtractionExecutor:
+    """Pool de procesos para parseo y extracción de páginas grandes."""
+
+    def __init__(self, max_workers: Optional[int] = None, inline_bytes: Optional[int] = None):
+        """
+        Inicializa el ejecutor (el pool se crea en el primer envío).
+
+        Args:
+            max_workers: Procesos del pool (SCRAPER_EXTRACT_WORKERS, 0 = todo en proceso)
+            inline_bytes: Páginas de menos bytes se extraen en el propio proceso
+        """
+        self.max_workers = max_workers if max_workers is not None else int(
+            os.getenv("SCRAPER_EXTRACT_WORKERS", str(min(2, os.cpu_count() or 1)))
+        )
+        self.inline_bytes = inline_bytes if inline_bytes is not None else int(
+            os.getenv("SCRAPER_EXTRACT_INLINE_BYTES", "65536")
+        )
+        self.start_method = os.getenv("SCRAPER_EXTRACT_START_METHOD", "spawn")
+        self._pool = None
+        self.offloaded = 0
+        self.inline = 0
+        self.failures = 0
+
+    def should_offload(self, size: int) -> bool:
+        """
+        Indica si una página de este tamaño debe extraerse en el pool.
+
+        Args:
+            size: Bytes del HTML
+
+        Returns:
+            True si el pool está habilitado y la página supera el umbral
+        """
+        return self.max_workers > 0 and size >= self.inline_bytes
+
+    def _get_pool(self):
+        """Crea el pool de procesos la primera vez que se necesita."""
+        if self._pool is None:
+            # multiprocessing solo se importa si de verdad se usa el pool
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_inicializar_worker,
+            )
+            print(f"✓ Pool de extracción iniciado ({self.max_workers} procesos, {self.start_method})")
+        return self._pool
+
+    async def extract(
+        self,
+        html: bytes,
+        domain: str,
+        orden_selectores: Optional[Tuple[str, ...]],
+        niveles: List[str],
+    ) -> Optional[Dict]:
+        """
+        Ejecuta extraer_en_proceso en el pool sin bloquear el event loop.
+
+        Args:
+            html: HTML crudo de la página
+            domain: Dominio detectado
+            orden_selectores: Claves de los selectores en el orden a probar
+            niveles: Orden de los niveles de extracción
+
+        Returns:
+            Resultado de extraer_en_proceso o None si el pool falló (el llamador
+            debe extraer en el propio proceso)
+        """
+        from concurrent.futures.process import BrokenProcessPool
+        loop = asyncio.get_running_loop()
+        try:
+            salida = await loop.run_in_executor(
+                self._get_pool(), extraer_en_proceso, html, domain, orden_selectores, niveles
+            )
+        except BrokenProcessPool as e:
+            # Un worker murió (memoria, señal): se recrea el pool en el siguiente envío
+            print(f"⚠️  Pool de extracción caído, extrayendo en proceso: {e}")
+            self.failures += 1
+            self.shutdown(wait=False)
+            return None
+        self.offloaded += 1
+        return salida
+
+    def shutdown(self, wait: bool = True):
+        """Detiene los procesos del pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict:
+        """Devuelve la configuración y los contadores del ejecutor."""
+        return {
+            'workers': self.max_workers,
+            'inline_bytes': self.inline_bytes,
+            'running': self._pool is not None,
+            'offloaded': self.offloaded,
+            'inline': self.inline,
+            'failures': self.failures,
+        }
+
+
+_executor: Optional[ExtractionExecutor] = None
+
+
+def get_extraction_executor() -> ExtractionExecutor:
+    """
+    Obtiene el ejecutor de extracción compartido por todo el proceso.
+
+    Returns:
+        Instancia única de ExtractionExecutor
+    """
+    global _executor
+    if _executor is None:
+        _executor = ExtractionExecutor()
+    return _executor
+
+
+def close_extraction_executor():
+    """Detiene el pool de extracción (al apagar la aplicación)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
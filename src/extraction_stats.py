@@ -0,0 +1,158 @@
+"""
+Estadísticas de extracción para el Price Tracker.
+Registra por tienda qué selector y qué nivel de extracción produjo cada
+precio, para probar primero el que funcionó más recientemente y detectar
+selectores que dejaron de funcionar tras un cambio de diseño.
+Las estadísticas se guardan en JSON dentro de SCRAPER_CACHE_DIR.
+
+Author: HellSpawn
+"""
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from src.http_cache import cache_dir
+from src.json_store import JsonStore
+
+
+def _contador() -> Dict:
+    """Contador vacío de un selector o nivel."""
+    return {'exitos': 0, 'fallos': 0, 'fallos_seguidos': 0, 'ultimo_exito': None}
+
+
+class ExtractionStats(JsonStore):
+    """Historial de éxitos por selector y por nivel de extracción."""
+
+    store_label = 'las estadísticas de extracción'
+
+    def __init__(self, path: Optional[str] = None, save_interval: Optional[float] = None):
+        """
+        Inicializa las estadísticas cargando las guardadas en disco.
+
+        Args:
+            path: Archivo JSON (por defecto extraction_stats.json en SCRAPER_CACHE_DIR)
+            save_interval: Segundos mínimos entre escrituras a disco
+        """
+        self._init_store(path or os.path.join(cache_dir(), "extraction_stats.json"), save_interval)
+        # Fallos seguidos a partir de los cuales un selector se marca como caído
+        self.dead_after = int(os.getenv("SCRAPER_SELECTOR_DEAD_AFTER", "5"))
+        self._data: Dict[str, Dict] = {'selectores': {}, 'niveles': {}}
+        self._load()
+
+    def _load(self):
+        """Carga las secciones guardadas en disco."""
+        data = self._read_json()
+        if not isinstance(data, dict):
+            return
+        for seccion in self._data:
+            if isinstance(data.get(seccion), dict):
+                self._data[seccion] = data[seccion]
+
+    def _snapshot(self) -> Dict:
+        return self._data
+
+    def _registrar(self, seccion: str, clave: str, nombre: str, exito: bool):
+        """Actualiza el contador de un selector o nivel (con el lock tomado)."""
+        contador = self._data[seccion].setdefault(clave, {}).setdefault(nombre, _contador())
+        if exito:
+            contador['exitos'] += 1
+            contador['fallos_seguidos'] = 0
+            contador['ultimo_exito'] = datetime.now().isoformat()
+        else:
+            contador['fallos'] += 1
+            contador['fallos_seguidos'] += 1
+        self._dirty = True
+
+    def record_selectors(self, domain: str, fallidos: Iterable[str], ganador: Optional[str]):
+        """
+        Registra el resultado de los selectores de una tienda en una extracción.
+
+        Args:
+            domain: Tienda ('amazon', 'mercadolibre', ...)
+            fallidos: Selectores probados que no produjeron precio
+            ganador: Selector que produjo el precio (None si ninguno)
+        """
+        with self._lock:
+            for nombre in fallidos:
+                self._registrar('selectores', domain, nombre, False)
+            if ganador:
+                self._registrar('selectores', domain, ganador, True)
+        self._maybe_save()
+
+    def record_tier(self, clave: str, tier: Optional[str], probados: Iterable[str] = ()):
+        """
+        Registra qué nivel de extracción produjo el precio.
+
+        Args:
+            clave: Tienda o host de la URL
+            tier: Nivel ganador ('api', 'structured', 'selector', ...) o None
+            probados: Niveles que se intentaron sin éxito antes del ganador
+        """
+        with self._lock:
+            for nombre in probados:
+                if nombre != tier:
+                    self._registrar('niveles', clave, nombre, False)
+            if tier:
+                self._registrar('niveles', clave, tier, True)
+        self._maybe_save()
+
+    def _ordenar(self, seccion: str, clave: str, nombres: List[str]) -> List[str]:
+        """Ordena por éxito más reciente; los que nunca funcionaron conservan su orden."""
+        with self._lock:
+            contadores = dict(self._data[seccion].get(clave, {}))
+        exitosos = [n for n in nombres if contadores.get(n, {}).get('ultimo_exito')]
+        # ISO 8601 ordena cronológicamente como texto
+        exitosos.sort(key=lambda n: contadores[n]['ultimo_exito'], reverse=True)
+        return exitosos + [n for n in nombres if n not in exitosos]
+
+    def order_selectors(self, domain: str, nombres: List[str]) -> List[str]:
+        """
+        Devuelve los selectores de una tienda con el último exitoso primero.
+
+        Args:
+            domain: Tienda
+            nombres: Claves de los selectores en su orden configurado
+
+        Returns:
+            Claves reordenadas
+        """
+        return self._ordenar('selectores', domain, nombres)
+
+    def order_tiers(self, clave: str, tiers: List[str]) -> List[str]:
+        """
+        Devuelve los niveles de extracción con el último exitoso primero.
+
+        Args:
+            clave: Tienda o host
+            tiers: Niveles en su orden por defecto
+
+        Returns:
+            Niveles reordenados
+        """
+        return self._ordenar('niveles', clave, tiers)
+
+    def stats(self) -> Dict:
+        """Devuelve una copia de las estadísticas marcando los selectores caídos."""
+        with self._lock:
+            data = json.loads(json.dumps(self._data))
+        for contadores in data['selectores'].values():
+            for contador in contadores.values():
+                contador['caido'] = contador['fallos_seguidos'] >= self.dead_after
+        return data
+
+
+_stats: Optional[ExtractionStats] = None
+
+
+def get_extraction_stats() -> ExtractionStats:
+    """
+    Obtiene las estadísticas de extracción compartidas por todo el proceso.
+
+    Returns:
+        Instancia única de ExtractionStats
+    """
+    global _stats
+    if _stats is None:
+        _stats = ExtractionStats()
+    return _stats
@@ -0,0 +1,183 @@
+"""
+Escalera de estrategias de descarga para el Price Tracker.
+Cada host empieza en la estrategia más barata que le funcionó recientemente
+(API oficial, HTTP simple, HTTP con cookies de primera visita, render con
+Playwright). Solo se sube un peldaño cuando el actual falla de forma
+repetida y, cada cierto tiempo, se vuelve a probar el peldaño inferior
+para bajar en cuanto la tienda deja de exigir el caro.
+El estado se guarda en JSON dentro de SCRAPER_CACHE_DIR.
+
+Author: HellSpawn
+"""
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from src.http_cache import cache_dir
+from src.json_store import JsonStore
+
+# Estrategias de menor a mayor coste
+LADDER = ('api', 'static', 'cookies', 'render')
+
+
+def _estado() -> Dict:
+    """Estado vacío de un host."""
+    return {'base': None, 'fallos_seguidos': 0, 'ultimo_sondeo': None, 'niveles': {}}
+
+
+class FetchLadder(JsonStore):
+    """Estrategia base por host con escalado por fallos y sondeo periódico."""
+
+    store_label = 'la escalera de estrategias'
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        save_interval: Optional[float] = None,
+        probe_interval: Optional[float] = None,
+        escalate_after: Optional[int] = None,
+    ):
+        """
+        Inicializa la escalera cargando el estado guardado en disco.
+
+        Args:
+            path: Archivo JSON (por defecto fetch_ladder.json en SCRAPER_CACHE_DIR)
+            save_interval: Segundos mínimos entre escrituras a disco
+            probe_interval: Segundos entre sondeos del peldaño inferior
+            escalate_after: Fallos seguidos de la estrategia base antes de subir
+        """
+        self._init_store(path or os.path.join(cache_dir(), "fetch_ladder.json"), save_interval)
+        self.probe_interval = probe_interval if probe_interval is not None else float(
+            os.getenv("SCRAPER_LADDER_PROBE_INTERVAL", "3600")
+        )
+        self.escalate_after = escalate_after or int(os.getenv("SCRAPER_LADDER_ESCALATE_AFTER", "2"))
+        self._hosts: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        """Carga el estado por host guardado en disco."""
+        data = self._read_json()
+        if isinstance(data, dict):
+            self._hosts = data
+
+    def _snapshot(self) -> Dict:
+        return self._hosts
+
+    def plan(self, clave: str, disponibles: List[str]) -> List[str]:
+        """
+        Devuelve el orden en que se prueban las estrategias para un host.
+
+        Args:
+            clave: Host de la URL
+            disponibles: Estrategias aplicables, de menor a mayor coste
+
+        Returns:
+            Estrategias desde la base hacia arriba; si toca sondeo, la
+            inmediatamente más barata va primero
+        """
+        if not disponibles:
+            return []
+        with self._lock:
+            estado = self._hosts.get(clave)
+            base = estado['base'] if estado else None
+            if base not in disponibles:
+                return list(disponibles)
+
+            inicio = disponibles.index(base)
+            orden = list(disponibles[inicio:])
+            ahora = time.time()
+            if inicio > 0 and (estado['ultimo_sondeo'] is None
+                               or ahora - estado['ultimo_sondeo'] >= self.probe_interval):
+                # Se marca al planificar para que las peticiones concurrentes no sondeen todas
+                estado['ultimo_sondeo'] = ahora
+                self._dirty = True
+                orden.insert(0, disponibles[inicio - 1])
+            return orden
+
+    def record(
+        self,
+        clave: str,
+        disponibles: List[str],
+        ganador: Optional[str],
+        probados: Iterable[str] = (),
+    ):
+        """
+        Registra el resultado de un scrape y ajusta la estrategia base.
+
+        Args:
+            clave: Host de la URL
+            disponibles: Estrategias aplicables en este scrape
+            ganador: Estrategia que obtuvo el precio (None si ninguna)
+            probados: Estrategias intentadas, en orden
+        """
+        with self._lock:
+            estado = self._hosts.setdefault(clave, _estado())
+            for nombre in probados:
+                contador = estado['niveles'].setdefault(nombre, {'exitos': 0, 'fallos': 0, 'ultimo_exito': None})
+                if nombre == ganador:
+                    contador['exitos'] += 1
+                    contador['ultimo_exito'] = datetime.now().isoformat()
+                else:
+                    contador['fallos'] += 1
+            self._dirty = True
+            self._ajustar_base(clave, estado, disponibles, ganador)
+        self._maybe_save()
+
+    def _ajustar_base(self, clave: str, estado: Dict, disponibles: List[str], ganador: Optional[str]):
+        """Sube, baja o mantiene la estrategia base de un host (con el lock tomado)."""
+        if ganador is None:
+            estado['fallos_seguidos'] += 1
+            return
+        base = estado['base']
+        if base is None:
+            estado['base'] = ganador
+            estado['fallos_seguidos'] = 0
+            estado['ultimo_sondeo'] = time.time()
+            return
+        if base not in disponibles or ganador not in disponibles:
+            # Scrape con estrategias restringidas (p. ej. la API ya se probó en lote)
+            return
+
+        if disponibles.index(ganador) < disponibles.index(base):
+            print(f"⬇️  {clave}: '{ganador}' vuelve a funcionar, se deja '{base}'")
+            estado['base'] = ganador
+            estado['fallos_seguidos'] = 0
+        elif ganador == base:
+            estado['fallos_seguidos'] = 0
+        else:
+            estado['fallos_seguidos'] += 1
+            if estado['fallos_seguidos'] >= self.escalate_after:
+                print(f"⬆️  {clave}: '{base}' falló {estado['fallos_seguidos']} veces seguidas, se sube a '{ganador}'")
+                estado['base'] = ganador
+                estado['fallos_seguidos'] = 0
+                # El primer sondeo hacia abajo espera un intervalo completo
+                estado['ultimo_sondeo'] = time.time()
+
+    def base(self, clave: str) -> Optional[str]:
+        """Estrategia base actual de un host (None si nunca se scrapeó)."""
+        with self._lock:
+            estado = self._hosts.get(clave)
+            return estado['base'] if estado else None
+
+    def stats(self) -> Dict:
+        """Devuelve una copia del estado por host."""
+        with self._lock:
+            return json.loads(json.dumps(self._hosts))
+
+
+_ladder: Optional[FetchLadder] = None
+
+
+def get_fetch_ladder() -> FetchLadder:
+    """
+    Obtiene la escalera de estrategias compartida por todo el proceso.
+
+    Returns:
+        Instancia única de FetchLadder
+    """
+    global _ladder
+    if _ladder is None:
+        _ladder = FetchLadder()
+    return _ladder
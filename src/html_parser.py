@@ -0,0 +1,202 @@
+"""
+Backends de parseo HTML para el Price Tracker.
+Abstrae el parser usado por los scrapers para poder elegir entre
+BeautifulSoup (html.parser), lxml o selectolax (motor de selectores en C)
+mediante la variable de entorno SCRAPER_HTML_PARSER.
+
+Author: HellSpawn
+"""
+import importlib.util
+import os
+from typing import Optional, Union
+
+HtmlInput = Union[bytes, str]
+
+
+class ParsedDocument:
+    """Documento HTML parseado con una interfaz común entre backends."""
+
+    def get_text(self) -> str:
+        """Devuelve todo el texto del documento."""
+        raise NotImplementedError
+
+    def iter_matches(self, compiled):
+        """
+        Recorre una sola vez el documento y produce los elementos que cumplen
+        alguno de los selectores compilados, en orden de documento. Es un
+        generador: si el consumidor corta, el recorrido se detiene ahí.
+
+        Args:
+            compiled: CompiledSelectors (ver src.selector_engine)
+
+        Yields:
+            Tuplas (indices, text): selectores que cumple el elemento y función que devuelve su texto
+        """
+        raise NotImplementedError
+
+
+class ParserBackend:
+    """Fábrica de documentos parseados."""
+
+    name = 'base'
+
+    def parse(self, html: HtmlInput) -> ParsedDocument:
+        """
+        Parsea el HTML.
+
+        Args:
+            html: Contenido HTML en bytes o texto
+
+        Returns:
+            Documento parseado
+        """
+        raise NotImplementedError
+
+
+# ---------- BeautifulSoup (html.parser) ----------
+
+class SoupDocument(ParsedDocument):
+    """Documento respaldado por BeautifulSoup."""
+
+    def __init__(self, soup):
+        self.soup = soup
+
+    def get_text(self) -> str:
+        return self.soup.get_text()
+
+    def iter_matches(self, compiled):
+        from bs4 import Tag
+        for element in self.soup.descendants:
+            if isinstance(element, Tag):
+                indices = compiled.indices(_soup_getter(element))
+                if indices:
+                    yield indices, element.get_text
+
+
+def _soup_getter(element):
+    """Acceso a atributos de un Tag (BeautifulSoup guarda class como lista)."""
+    def get(nombre):
+        valor = element.get(nombre)
+        return ' '.join(valor) if isinstance(valor, list) else valor
+    return get
+
+
+class SoupBackend(ParserBackend):
+    """BeautifulSoup con el parser puro Python (el más lento, sin dependencias)."""
+
+    name = 'html.parser'
+
+    def parse(self, html: HtmlInput) -> ParsedDocument:
+        from bs4 import BeautifulSoup
+        return SoupDocument(BeautifulSoup(html, 'html.parser'))
+
+
+# ---------- lxml ----------
+
+class LxmlDocument(ParsedDocument):
+    """Documento respaldado por lxml.html (libxml2)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def get_text(self) -> str:
+        return self.root.text_content()
+
+    def iter_matches(self, compiled):
+        from lxml import etree
+        # Recorrido perezoso en orden de documento (omite comentarios);
+        # más rápido que un XPath con muchas condiciones y permite cortar al encontrar
+        class_names, ids, attr_names = compiled.class_names, compiled.ids, compiled.attr_names
+        for element in self.root.iter(etree.Element):
+            get = element.get
+            clases = get('class')
+            if ((clases and not class_names.isdisjoint(clases.split()))
+                    or (ids and get('id') in ids)
+                    or any(get(nombre) is not None for nombre in attr_names)):
+                indices = compiled.indices(get)
+                if indices:
+                    yield indices, element.text_content
+
+
+class LxmlBackend(ParserBackend):
+    """Parser C de libxml2 vía lxml.html."""
+
+    name = 'lxml'
+
+    def parse(self, html: HtmlInput) -> ParsedDocument:
+        import lxml.html
+        if not html:
+            html = '<html></html>'
+        return LxmlDocument(lxml.html.document_fromstring(html))
+
+
+# ---------- selectolax ----------
+
+class SelectolaxDocument(ParsedDocument):
+    """Documento respaldado por selectolax (motor lexbor en C)."""
+
+    def __init__(self, tree):
+        self.tree = tree
+
+    def get_text(self) -> str:
+        return self.tree.root.text() if self.tree.root is not None else ''
+
+    def iter_matches(self, compiled):
+        # lexbor evalúa la consulta combinada en C en un solo recorrido
+        for node in self.tree.css(compiled.css):
+            yield compiled.indices(node.attributes.get), node.text
+
+
+class SelectolaxBackend(ParserBackend):
+    """Parser y selectores CSS en C (selectolax/lexbor); dependencia opcional."""
+
+    name = 'selectolax'
+
+    def parse(self, html: HtmlInput) -> ParsedDocument:
+        from selectolax.lexbor import LexborHTMLParser
+        return SelectolaxDocument(LexborHTMLParser(html))
+
+
+BACKENDS = {
+    'html.parser': SoupBackend,
+    'lxml': LxmlBackend,
+    'selectolax': SelectolaxBackend,
+}
+
+_MODULOS_REQUERIDOS = {
+    'html.parser': 'bs4',
+    'lxml': 'lxml.html',
+    'selectolax': 'selectolax.lexbor',
+}
+
+
+def backend_disponible(name: str) -> bool:
+    """
+    Indica si las dependencias de un backend están instaladas.
+    Solo localiza el módulo: la importación real se hace en el primer parse.
+    """
+    try:
+        return importlib.util.find_spec(_MODULOS_REQUERIDOS[name]) is not None
+    except (ImportError, KeyError):
+        return False
+
+
+def get_parser_backend(name: Optional[str] = None) -> ParserBackend:
+    """
+    Obtiene el backend de parseo configurado.
+
+    Args:
+        name: Nombre del backend ('lxml', 'selectolax', 'html.parser').
+              Por defecto se lee SCRAPER_HTML_PARSER.
+
+    Returns:
+        Backend solicitado, o html.parser si sus dependencias no están instaladas
+    """
+    name = (name or os.getenv("SCRAPER_HTML_PARSER", "lxml")).lower()
+    if name not in BACKENDS:
+        print(f"⚠️  Parser '{name}' desconocido, usando html.parser")
+        name = 'html.parser'
+    if not backend_disponible(name):
+        print(f"⚠️  Parser '{name}' no instalado, usando html.parser")
+        name = 'html.parser'
+    return BACKENDS[name]()
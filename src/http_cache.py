@@ -0,0 +1,185 @@
+"""
+Caché HTTP condicional para el Price Tracker.
+Guarda en disco los validadores (ETag / Last-Modified) de cada página y el
+último precio extraído, para revalidar con If-None-Match / If-Modified-Since
+y reutilizar el precio cuando la tienda responde 304 Not Modified.
+Las escrituras en SQLite (commit con fsync) se hacen en un hilo del
+executor por defecto para no bloquear el event loop de las descargas.
+
+Author: HellSpawn
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+
+def cache_dir() -> str:
+    """Directorio donde el scraper guarda sus datos persistentes."""
+    path = os.getenv("SCRAPER_CACHE_DIR", ".scraper_cache")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class HttpCache:
+    """Caché LRU en SQLite de validadores HTTP y precios extraídos."""
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: Optional[int] = None):
+        """
+        Inicializa la caché.
+
+        Args:
+            db_path: Ruta al archivo SQLite (por defecto dentro de SCRAPER_CACHE_DIR)
+            max_entries: Número máximo de URLs guardadas antes de desalojar las menos usadas
+        """
+        self.db_path = db_path or os.path.join(cache_dir(), "http_cache.db")
+        self.max_entries = max_entries or int(os.getenv("SCRAPER_HTTP_CACHE_MAX_ENTRIES", "5000"))
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                precio REAL NOT NULL,
+                size INTEGER DEFAULT 0,
+                last_access TEXT NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_http_cache_access ON http_cache(last_access)')
+        self._conn.commit()
+        # Filas guardadas, llevadas en memoria para no contar la tabla en cada store()
+        self._entries = self._conn.execute('SELECT COUNT(*) FROM http_cache').fetchone()[0]
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """
+        Construye los headers de revalidación para una URL.
+
+        Args:
+            url: URL a solicitar
+
+        Returns:
+            Headers If-None-Match / If-Modified-Since (vacío si no hay entrada)
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etag, last_modified FROM http_cache WHERE url = ?', (url,)
+            ).fetchone()
+        if not row:
+            return {}
+        etag, last_modified = row
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def hit(self, url: str) -> Optional[float]:
+        """
+        Registra una revalidación exitosa (304) y devuelve el precio guardado.
+
+        Args:
+            url: URL revalidada
+
+        Returns:
+            Último precio extraído o None si la entrada ya no existe
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT precio, size FROM http_cache WHERE url = ?', (url,)
+            ).fetchone()
+            if not row:
+                return None
+            self._conn.execute(
+                'UPDATE http_cache SET last_access = ? WHERE url = ?',
+                (datetime.utcnow().isoformat(), url)
+            )
+            self._conn.commit()
+            self.hits += 1
+            self.bytes_saved += row[1] or 0
+        return row[0]
+
+    async def conditional_headers_async(self, url: str) -> Dict[str, str]:
+        """Igual que conditional_headers, en un hilo para no bloquear el event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.conditional_headers, url)
+
+    async def hit_async(self, url: str) -> Optional[float]:
+        """Igual que hit, en un hilo para no bloquear el event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.hit, url)
+
+    def record_miss(self):
+        """Registra una descarga completa (sin caché o contenido modificado)."""
+        self.misses += 1
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str], precio: float, size: int = 0):
+        """
+        Guarda los validadores y el precio extraído de una respuesta 200.
+        Las respuestas sin ETag ni Last-Modified no se guardan.
+
+        Args:
+            url: URL solicitada
+            etag: Header ETag de la respuesta
+            last_modified: Header Last-Modified de la respuesta
+            precio: Precio extraído del contenido
+            size: Tamaño en bytes del contenido descargado
+        """
+        if not etag and not last_modified:
+            return
+        with self._lock:
+            existe = self._conn.execute('SELECT 1 FROM http_cache WHERE url = ?', (url,)).fetchone()
+            self._conn.execute('''
+                INSERT OR REPLACE INTO http_cache (url, etag, last_modified, precio, size, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (url, etag, last_modified, precio, size, datetime.utcnow().isoformat()))
+            if not existe:
+                self._entries += 1
+            self._evict()
+            self._conn.commit()
+
+    async def store_async(
+        self, url: str, etag: Optional[str], last_modified: Optional[str], precio: float, size: int = 0
+    ):
+        """Igual que store, en un hilo para no bloquear el event loop."""
+        if not etag and not last_modified:
+            return
+        await asyncio.get_running_loop().run_in_executor(None, self.store, url, etag, last_modified, precio, size)
+
+    def _evict(self):
+        """Elimina las entradas menos usadas recientemente si se supera el límite (con el lock tomado)."""
+        exceso = self._entries - self.max_entries
+        if exceso > 0:
+            borradas = self._conn.execute('''
+                DELETE FROM http_cache WHERE url IN (
+                    SELECT url FROM http_cache ORDER BY last_access ASC LIMIT ?
+                )
+            ''', (exceso,)).rowcount
+            self._entries -= borradas
+
+    def stats(self) -> Dict:
+        """Devuelve contadores de aciertos/fallos y tamaño de la caché."""
+        total = self.hits + self.misses
+        return {
+            'entries': self._entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+            'bytes_saved': self.bytes_saved,
+        }
+
+
+_cache: Optional[HttpCache] = None
+
+
+def get_http_cache() -> HttpCache:
+    """Obtiene la caché HTTP compartida por todo el proceso."""
+    global _cache
+    if _cache is None:
+        _cache = HttpCache()
+    return _cache
@@ -0,0 +1,320 @@
+"""
+Motor HTTP asíncrono para el Price Tracker.
+Mantiene un pool de conexiones compartido con keep-alive por host,
+de forma que los scrapes no bloqueen el event loop de FastAPI.
+Los errores transitorios se reintentan con backoff (ver retry_policy) y
+cada tienda pasa por su circuit breaker (ver circuit_breaker).
+
+Author: HellSpawn
+"""
+import asyncio
+import os
+from http.cookiejar import Cookie
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from src.circuit_breaker import CircuitBreakers, get_circuit_breakers
+from src.rate_limiter import DomainScheduler, domain_key, get_domain_scheduler
+from src.retry_policy import RETRY_STATUS, RetryPolicy, parse_retry_after
+
+
+class AsyncHttpEngine:
+    """Cliente HTTP asíncrono compartido con límites por host."""
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive: Optional[int] = None,
+        max_per_host: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        retry: Optional[RetryPolicy] = None,
+        breakers: Optional[CircuitBreakers] = None,
+        scheduler: Optional[DomainScheduler] = None,
+    ):
+        """
+        Inicializa el motor. Los valores no indicados se leen de variables de entorno.
+
+        Args:
+            headers: Headers por defecto para todas las peticiones
+            max_connections: Conexiones simultáneas máximas en el pool
+            max_keepalive: Conexiones inactivas que se mantienen abiertas
+            max_per_host: Peticiones simultáneas máximas hacia un mismo host
+            keepalive_expiry: Segundos que se conserva una conexión inactiva
+            timeout: Timeout total de lectura/escritura en segundos
+            connect_timeout: Timeout de conexión en segundos
+            transport: Transporte httpx alternativo (útil para pruebas)
+            retry: Política de reintentos (por defecto, la de las variables de entorno)
+            breakers: Circuit breakers por tienda (por defecto, los compartidos del proceso)
+            scheduler: Programador que recibe las señales de congestión (429/503)
+                para ajustar los límites por tienda (por defecto, el compartido)
+        """
+        self.headers = dict(headers or {})
+        self.max_connections = max_connections or int(os.getenv("SCRAPER_MAX_CONNECTIONS", "200"))
+        self.max_keepalive = max_keepalive or int(os.getenv("SCRAPER_MAX_KEEPALIVE", "50"))
+        self.max_per_host = max_per_host or int(os.getenv("SCRAPER_MAX_PER_HOST", "10"))
+        self.keepalive_expiry = keepalive_expiry or float(os.getenv("SCRAPER_KEEPALIVE_EXPIRY", "30"))
+        self.timeout = timeout or float(os.getenv("SCRAPER_HTTP_TIMEOUT", "15"))
+        self.connect_timeout = connect_timeout or float(os.getenv("SCRAPER_CONNECT_TIMEOUT", "5"))
+        self.transport = transport
+        self.retry = retry or RetryPolicy()
+        self.breakers = breakers or get_circuit_breakers()
+        self.scheduler = scheduler or get_domain_scheduler()
+        self.retries = 0
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Devuelve el cliente compartido, creándolo en el event loop actual.
+
+        Un AsyncClient queda ligado al loop donde abrió sus conexiones; si el
+        loop cambia (por ejemplo, varios asyncio.run desde la CLI) se recrea
+        conservando sus cookies.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            # Las cookies recibidas (consentimiento, sesión) sobreviven a la recreación
+            cookies = self._client.cookies if self._client is not None else None
+            self._client = httpx.AsyncClient(
+                cookies=cookies,
+                headers=self.headers,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                follow_redirects=True,
+                transport=self.transport,
+            )
+            self._loop = loop
+            self._host_limits = {}
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        """Obtiene el semáforo que limita la concurrencia hacia un host."""
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_limits[host]
+
+    def _request_kwargs(
+        self,
+        headers: Optional[Dict[str, str]],
+        timeout: Optional[float],
+        extensions: Optional[Dict] = None,
+    ) -> Dict:
+        """Argumentos opcionales comunes a get() y stream()."""
+        kwargs = {}
+        if headers:
+            kwargs['headers'] = headers
+        if timeout is not None:
+            kwargs['timeout'] = httpx.Timeout(timeout, connect=min(timeout, self.connect_timeout))
+        if extensions:
+            kwargs['extensions'] = extensions
+        return kwargs
+
+    async def _enviar(self, url: str, kwargs: Dict, stream: bool) -> Tuple[httpx.Response, asyncio.Semaphore]:
+        """
+        Envía un GET pasando por el circuit breaker de la tienda y reintentando
+        los errores transitorios. Devuelve con el semáforo del host tomado:
+        el llamador debe liberarlo (y cerrar la respuesta si es streaming).
+        Al circuit breaker solo llega el resultado final de la petición.
+
+        Args:
+            url: URL a solicitar
+            kwargs: Argumentos de _request_kwargs
+            stream: Si el cuerpo se deja sin leer
+
+        Returns:
+            Respuesta final (la última, aunque sea un 5xx, si se agotan los
+            intentos) y el semáforo del host
+
+        Raises:
+            CircuitOpenError: Si la tienda está en enfriamiento
+            httpx.TransportError: Si el último intento falló sin respuesta
+        """
+        client = self.client
+        clave = domain_key(url)
+        limite = self._host_limit(url)
+        intento = 0
+        while True:
+            intento += 1
+            self.breakers.before_request(clave)
+            await limite.acquire()
+            try:
+                response = await client.send(client.build_request('GET', url, **kwargs), stream=stream)
+            except httpx.TransportError as e:
+                limite.release()
+                if not self.retry.should_retry(intento):
+                    self.breakers.record_failure(clave)
+                    raise
+                espera = self.retry.delay(intento)
+                print(f"🔁 {type(e).__name__} en {clave}, reintento {intento + 1}/{self.retry.attempts} en {espera:.1f} s")
+            except BaseException:
+                limite.release()
+                raise
+            else:
+                self._reportar_congestion(clave, response.status_code)
+                if response.status_code not in RETRY_STATUS:
+                    self.breakers.record_success(clave)
+                    return response, limite
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if not self.retry.should_retry(intento, retry_after):
+                    self.breakers.record_failure(clave, retry_after)
+                    return response, limite
+                await response.aclose()
+                limite.release()
+                espera = self.retry.delay(intento, retry_after)
+                print(f"🔁 HTTP {response.status_code} en {clave}, reintento {intento + 1}/{self.retry.attempts} en {espera:.1f} s")
+            self.retries += 1
+            await asyncio.sleep(espera)
+
+    def _reportar_congestion(self, clave: str, status_code: int):
+        """Informa al programador: 429/503 recortan el ritmo de la tienda, 2xx/3xx lo suben."""
+        if status_code in (429, 503):
+            self.scheduler.record_throttle(clave, f"HTTP {status_code}")
+        elif status_code < 400:
+            self.scheduler.record_success(clave)
+
+    async def get(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """
+        Realiza un GET sin bloquear el event loop.
+
+        Args:
+            url: URL a solicitar
+            headers: Headers adicionales para esta petición
+            timeout: Timeout específico para esta petición
+
+        Returns:
+            Respuesta httpx con el cuerpo ya descargado
+        """
+        response, limite = await self._enviar(url, self._request_kwargs(headers, timeout), stream=False)
+        limite.release()
+        return response
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        extensions: Optional[Dict] = None,
+    ):
+        """
+        Realiza un GET en streaming: el cuerpo se lee por fragmentos y, si se
+        sale del bloque antes de terminar, la descarga se interrumpe.
+
+        Args:
+            url: URL a solicitar
+            headers: Headers adicionales para esta petición
+            timeout: Timeout específico para esta petición
+            extensions: Extensiones de httpx (por ejemplo 'trace' para medir tiempos)
+
+        Yields:
+            Respuesta httpx con el cuerpo sin leer
+        """
+        response, limite = await self._enviar(url, self._request_kwargs(headers, timeout, extensions), stream=True)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+            limite.release()
+
+    async def get_json(self, url: str, timeout: Optional[float] = None) -> Dict:
+        """
+        Realiza un GET y decodifica la respuesta como JSON.
+
+        Args:
+            url: URL a solicitar
+            timeout: Timeout específico para esta petición
+
+        Returns:
+            Contenido JSON de la respuesta
+
+        Raises:
+            httpx.HTTPStatusError: Si la respuesta no es 2xx
+        """
+        response = await self.get(url, headers={'Accept': 'application/json'}, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def add_cookies(self, cookies: List[Dict]):
+        """
+        Agrega al cliente compartido cookies obtenidas con Playwright; el
+        cookiejar deja de enviarlas cuando caducan.
+
+        Args:
+            cookies: Cookies en el formato de context.cookies() de Playwright
+        """
+        jar = self.client.cookies.jar
+        for cookie in cookies:
+            dominio = cookie.get('domain', '')
+            expira = cookie.get('expires', -1)
+            jar.set_cookie(Cookie(
+                version=0,
+                name=cookie['name'],
+                value=cookie['value'],
+                port=None,
+                port_specified=False,
+                domain=dominio,
+                domain_specified=dominio.startswith('.'),
+                domain_initial_dot=dominio.startswith('.'),
+                path=cookie.get('path', '/'),
+                path_specified=True,
+                secure=bool(cookie.get('secure')),
+                expires=int(expira) if expira and expira > 0 else None,
+                discard=not (expira and expira > 0),
+                comment=None,
+                comment_url=None,
+                rest={'HttpOnly': None} if cookie.get('httpOnly') else {},
+            ))
+
+    async def aclose(self):
+        """Cierra el pool de conexiones."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+
+_engine: Optional[AsyncHttpEngine] = None
+
+
+def get_http_engine(headers: Optional[Dict[str, str]] = None) -> AsyncHttpEngine:
+    """
+    Obtiene el motor HTTP compartido por todo el proceso.
+
+    Args:
+        headers: Headers por defecto (solo se usan al crear el motor)
+
+    Returns:
+        Instancia única de AsyncHttpEngine
+    """
+    global _engine
+    if _engine is None:
+        _engine = AsyncHttpEngine(headers=headers)
+    return _engine
+
+
+async def close_http_engine():
+    """Cierra el motor HTTP compartido (para el shutdown de la aplicación)."""
+    global _engine
+    if _engine is not None:
+        await _engine.aclose()
+        _engine = None
@@ -0,0 +1,79 @@
+"""
+Persistencia en JSON para el estado aprendido del Price Tracker.
+Estadísticas de extracción, escalera de estrategias, sesiones de navegador
+y límites por dominio guardan su estado igual: se carga al arrancar, se
+marca como sucio al cambiar, se escribe como mucho cada save_interval
+segundos y la escritura es atómica (archivo temporal + os.replace).
+
+Author: HellSpawn
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+
+
+class JsonStore:
+    """Mixin con la carga, el guardado diferido y la escritura atómica en JSON."""
+
+    # Qué se guarda, para el aviso si la escritura falla
+    store_label = 'el estado'
+    # Permisos del archivo (None = los del umask del proceso)
+    file_mode: Optional[int] = None
+    json_indent: Optional[int] = 2
+
+    def _init_store(self, path: str, save_interval: Optional[float] = None):
+        """
+        Inicializa el lock y el estado de guardado.
+
+        Args:
+            path: Archivo JSON
+            save_interval: Segundos mínimos entre escrituras a disco
+                (por defecto SCRAPER_STATS_SAVE_INTERVAL)
+        """
+        self.path = path
+        self.save_interval = save_interval if save_interval is not None else float(
+            os.getenv("SCRAPER_STATS_SAVE_INTERVAL", "30")
+        )
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def _read_json(self) -> Optional[Any]:
+        """Lee el archivo JSON si existe (un archivo corrupto se ignora)."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _snapshot(self) -> Any:
+        """Estado a guardar (se llama con el lock tomado)."""
+        raise NotImplementedError
+
+    def _maybe_save(self):
+        """Guarda en disco si hay cambios y pasó el intervalo mínimo."""
+        if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """Escribe el estado en disco de forma atómica."""
+        with self._lock:
+            if not self._dirty:
+                return
+            contenido = json.dumps(self._snapshot(), ensure_ascii=False, indent=self.json_indent)
+            self._dirty = False
+            self._last_save = time.monotonic()
+        temporal = f"{self.path}.tmp"
+        try:
+            if self.file_mode is None:
+                with open(temporal, 'w', encoding='utf-8') as f:
+                    f.write(contenido)
+            else:
+                fd = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, self.file_mode)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(contenido)
+            os.replace(temporal, self.path)
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar {self.store_label}: {e}")
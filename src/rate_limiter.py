@@ -0,0 +1,335 @@
+"""
+Programador de scrapes con cortesía por dominio para el Price Tracker.
+Cada tienda tiene su propio intervalo mínimo entre peticiones y su propia
+concurrencia máxima; tiendas distintas se procesan en paralelo.
+
+Con SCRAPER_AIMD los límites de cada tienda se ajustan solos (AIMD, como
+el control de congestión de TCP): mientras las respuestas son sanas el
+ritmo y la concurrencia suben de forma aditiva, y ante un 429, un 503 o
+una página de captcha bajan a la mitad. Los límites configurados son el
+punto de partida y los aprendidos se guardan en JSON dentro de
+SCRAPER_CACHE_DIR.
+
+Author: HellSpawn
+"""
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from src.http_cache import cache_dir
+from src.json_store import JsonStore
+
+
+def domain_key(url: str) -> str:
+    """
+    Obtiene la clave de cortesía de una URL (el host sin 'www.').
+
+    Args:
+        url: URL del producto
+
+    Returns:
+        Host en minúsculas, por ejemplo 'amazon.com.mx'
+    """
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def _parse_limits(raw: str) -> Dict[str, Dict[str, float]]:
+    """
+    Lee límites por tienda con formato 'amazon=3:1,mercadolibre=1:2'
+    (intervalo mínimo en segundos : concurrencia máxima).
+    """
+    limits = {}
+    for item in raw.split(','):
+        if '=' not in item:
+            continue
+        nombre, valores = item.split('=', 1)
+        intervalo, _, concurrencia = valores.partition(':')
+        limits[nombre.strip().lower()] = {
+            'min_interval': float(intervalo),
+            'max_concurrency': int(concurrencia or 1),
+        }
+    return limits
+
+
+class DomainScheduler(JsonStore):
+    """Limitador de ritmo por dominio con ejecución paralela entre dominios."""
+
+    store_label = 'los límites por dominio'
+
+    def __init__(
+        self,
+        min_interval: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        limits: Optional[Dict[str, Dict[str, float]]] = None,
+        adaptive: Optional[bool] = None,
+        path: Optional[str] = None,
+    ):
+        """
+        Inicializa el programador.
+
+        Args:
+            min_interval: Segundos mínimos entre inicios de peticiones al mismo dominio
+            max_concurrency: Peticiones simultáneas máximas por dominio
+            limits: Límites específicos por tienda ({'amazon': {'min_interval': 3, 'max_concurrency': 1}})
+            adaptive: Ajustar los límites con AIMD (SCRAPER_AIMD)
+            path: Archivo JSON de límites aprendidos (por defecto domain_limits.json
+                en SCRAPER_CACHE_DIR)
+        """
+        self.min_interval = min_interval if min_interval is not None else float(os.getenv("SCRAPER_DOMAIN_INTERVAL", "2"))
+        self.max_concurrency = max_concurrency or int(os.getenv("SCRAPER_DOMAIN_CONCURRENCY", "1"))
+        self.limits = limits if limits is not None else _parse_limits(os.getenv("SCRAPER_DOMAIN_LIMITS", ""))
+        self.adaptive = adaptive if adaptive is not None else os.getenv("SCRAPER_AIMD", "True") == "True"
+
+        # Parámetros AIMD: suma de ritmo (peticiones/s) por respuesta sana y factor de recorte
+        self.increase = float(os.getenv("SCRAPER_AIMD_INCREASE", "0.05"))
+        self.decrease = float(os.getenv("SCRAPER_AIMD_DECREASE", "0.5"))
+        self.concurrency_step = float(os.getenv("SCRAPER_AIMD_CONCURRENCY_STEP", "0.1"))
+        # El ritmo es 1 / intervalo: un piso de 0 o negativo se sube al mínimo
+        self.floor_interval = max(0.01, float(os.getenv("SCRAPER_AIMD_MIN_INTERVAL", "0.25")))
+        self.ceiling_interval = float(os.getenv("SCRAPER_AIMD_MAX_INTERVAL", "60"))
+        self.ceiling_concurrency = int(os.getenv("SCRAPER_AIMD_MAX_CONCURRENCY", "8"))
+        # Tras un recorte, las señales siguientes no vuelven a recortar durante este tiempo
+        self.hold = float(os.getenv("SCRAPER_AIMD_HOLD", "5"))
+        self._init_store(path or os.path.join(cache_dir(), "domain_limits.json"))
+        # Dominio -> {'interval', 'concurrency', 'successes', 'throttles', 'last_decrease'}
+        self._learned: Dict[str, Dict[str, float]] = {}
+        if self.adaptive:
+            self._load()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._conditions: Dict[str, asyncio.Condition] = {}
+        self._active: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._next_start: Dict[str, float] = {}
+
+    def _load(self):
+        """Carga los límites aprendidos guardados en disco."""
+        data = self._read_json()
+        if isinstance(data, dict):
+            self._learned = data
+
+    def _snapshot(self) -> Dict:
+        return self._learned
+
+    def _limite_tienda(self, domain: str) -> Optional[Dict[str, float]]:
+        """
+        Límite de SCRAPER_DOMAIN_LIMITS para un dominio, si lo tiene.
+        Se aceptan claves exactas ('amazon.com.mx') o por tienda ('amazon').
+        """
+        if domain in self.limits:
+            return self.limits[domain]
+        for nombre, limite in self.limits.items():
+            if nombre in domain:
+                return limite
+        return None
+
+    def configured_limits(self, domain: str) -> Dict[str, float]:
+        """Devuelve los límites configurados para un dominio (los de la tienda o los globales)."""
+        return self._limite_tienda(domain) or {'min_interval': self.min_interval, 'max_concurrency': self.max_concurrency}
+
+    def _cotas(self, domain: str) -> Tuple[float, float]:
+        """
+        Intervalo mínimo y concurrencia máxima que AIMD no puede superar: los
+        de SCRAPER_DOMAIN_LIMITS para la tienda, o los globales de AIMD.
+        """
+        tienda = self._limite_tienda(domain)
+        if tienda is None:
+            return self.floor_interval, float(self.ceiling_concurrency)
+        return (
+            max(self.floor_interval, float(tienda['min_interval'])),
+            min(float(self.ceiling_concurrency), float(tienda['max_concurrency'])),
+        )
+
+    def limits_for(self, domain: str) -> Dict[str, float]:
+        """
+        Devuelve los límites aplicables a un dominio: los aprendidos con AIMD
+        si existen, si no los configurados.
+        """
+        with self._lock:
+            aprendido = self._learned.get(domain) if self.adaptive else None
+            if aprendido is not None:
+                # Lo aprendido en disco respeta los límites aunque la configuración haya cambiado
+                piso, techo = self._cotas(domain)
+                return {
+                    'min_interval': max(piso, aprendido['interval']),
+                    'max_concurrency': max(1, int(min(techo, aprendido['concurrency']))),
+                }
+        return self.configured_limits(domain)
+
+    def _estado(self, domain: str) -> Dict[str, float]:
+        """Estado AIMD de un dominio, partiendo de los límites configurados (con el lock tomado)."""
+        estado = self._learned.get(domain)
+        if estado is None:
+            base = self.configured_limits(domain)
+            estado = {
+                'interval': float(base['min_interval']),
+                'concurrency': float(base['max_concurrency']),
+                'successes': 0,
+                'throttles': 0,
+                'last_decrease': 0.0,
+            }
+            self._learned[domain] = estado
+        return estado
+
+    def record_success(self, domain: str):
+        """
+        Respuesta sana: aumento aditivo del ritmo y de la concurrencia.
+
+        Args:
+            domain: Clave del dominio (ver domain_key)
+        """
+        if not self.adaptive:
+            return
+        with self._lock:
+            estado = self._estado(domain)
+            estado['successes'] += 1
+            piso, techo = self._cotas(domain)
+            ritmo = 1 / estado['interval'] if estado['interval'] > 0 else 1 / piso
+            estado['interval'] = max(piso, min(self.ceiling_interval, 1 / (ritmo + self.increase)))
+            # Una plaza más tras ~concurrencia/paso respuestas sanas seguidas
+            estado['concurrency'] = min(
+                techo, estado['concurrency'] + self.concurrency_step / estado['concurrency']
+            )
+            self._dirty = True
+        self._maybe_save()
+
+    def record_throttle(self, domain: str, motivo: str = '429'):
+        """
+        La tienda pide bajar el ritmo (429, 503 o captcha): recorte multiplicativo.
+
+        Args:
+            domain: Clave del dominio (ver domain_key)
+            motivo: Señal recibida, para el log
+        """
+        if not self.adaptive:
+            return
+        ahora = time.time()
+        with self._lock:
+            estado = self._estado(domain)
+            estado['throttles'] += 1
+            self._dirty = True
+            # Las peticiones que ya estaban en vuelo devuelven la misma señal: un solo recorte
+            if ahora - estado['last_decrease'] < self.hold:
+                return
+            estado['last_decrease'] = ahora
+            piso, _ = self._cotas(domain)
+            estado['interval'] = max(piso, min(self.ceiling_interval, estado['interval'] / self.decrease))
+            estado['concurrency'] = max(1.0, estado['concurrency'] * self.decrease)
+            print(f"🐢 {domain}: {motivo}, se baja a {1 / estado['interval']:.2f} pet/s "
+                  f"y concurrencia {int(estado['concurrency'])}")
+        self._maybe_save()
+
+    def save(self):
+        """Escribe los límites aprendidos en disco (solo con AIMD activo)."""
+        if self.adaptive:
+            super().save()
+
+    def stats(self) -> Dict:
+        """Devuelve los límites vigentes, sus cotas y las señales recibidas por dominio."""
+        with self._lock:
+            dominios = {}
+            for domain, e in self._learned.items():
+                piso, techo = self._cotas(domain)
+                intervalo = max(piso, e['interval'])
+                dominios[domain] = {
+                    'requests_per_s': round(1 / intervalo, 3),
+                    'min_interval': round(intervalo, 3),
+                    'max_concurrency': max(1, int(min(techo, e['concurrency']))),
+                    'floor_interval': piso,
+                    'ceiling_concurrency': int(techo),
+                    'active': self._active.get(domain, 0),
+                    'successes': e['successes'],
+                    'throttles': e['throttles'],
+                }
+        return {'adaptive': self.adaptive, 'domains': dominios}
+
+    def _bind_loop(self):
+        """Reinicia el estado si cambió el event loop (p. ej. varios asyncio.run)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._conditions = {}
+            self._active = {}
+            self._locks = {}
+            self._next_start = {}
+
+    async def _wait_turn(self, domain: str, min_interval: float):
+        """Reserva el siguiente turno libre del dominio y espera hasta él."""
+        async with self._locks.setdefault(domain, asyncio.Lock()):
+            now = self._loop.time()
+            start = max(now, self._next_start.get(domain, now))
+            self._next_start[domain] = start + min_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _acquire(self, domain: str):
+        """Espera una plaza del dominio; el límite se relee porque AIMD lo cambia."""
+        condicion = self._conditions.setdefault(domain, asyncio.Condition())
+        async with condicion:
+            await condicion.wait_for(
+                lambda: self._active.get(domain, 0) < int(self.limits_for(domain)['max_concurrency'])
+            )
+            self._active[domain] = self._active.get(domain, 0) + 1
+
+    async def _release(self, domain: str):
+        """Libera la plaza y despierta a quienes esperan (el límite pudo subir)."""
+        condicion = self._conditions[domain]
+        async with condicion:
+            self._active[domain] -= 1
+            condicion.notify_all()
+
+    async def run(self, domain: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Ejecuta una corrutina respetando los límites del dominio.
+
+        Args:
+            domain: Clave del dominio (ver domain_key)
+            func: Función asíncrona a ejecutar
+            *args, **kwargs: Argumentos para func
+
+        Returns:
+            Resultado de func
+        """
+        self._bind_loop()
+        await self._acquire(domain)
+        try:
+            await self._wait_turn(domain, self.limits_for(domain)['min_interval'])
+            return await func(*args, **kwargs)
+        finally:
+            await self._release(domain)
+
+    async def map(
+        self,
+        items: Iterable[Any],
+        key: Callable[[Any], str],
+        func: Callable[[Any], Awaitable[Any]],
+    ) -> List[Any]:
+        """
+        Aplica func a cada elemento; dominios distintos corren en paralelo.
+
+        Args:
+            items: Elementos a procesar (por ejemplo, productos)
+            key: Función que devuelve el dominio de un elemento
+            func: Función asíncrona que procesa un elemento
+
+        Returns:
+            Resultados en el mismo orden que items. Las excepciones se
+            devuelven en su posición en lugar de propagarse.
+        """
+        items = list(items)
+        tareas = [self.run(key(item), func, item) for item in items]
+        return await asyncio.gather(*tareas, return_exceptions=True)
+
+
+_scheduler: Optional[DomainScheduler] = None
+
+
+def get_domain_scheduler() -> DomainScheduler:
+    """Obtiene el programador compartido por todo el proceso."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = DomainScheduler()
+    return _scheduler
@@ -0,0 +1,197 @@
+"""
+Control de admisión de renders para el Price Tracker.
+Cada render con Playwright ocupa una página de Chromium y cientos de MB;
+este módulo limita cuántos corren a la vez en el proceso, encola el resto
+en una cola acotada con turnos rotativos por usuario (una actualización
+masiva no deja sin turno a quien prueba una URL) y rechaza enseguida,
+con un Retry-After estimado, cuando la cola está llena o la espera
+supera el límite.
+
+Author: HellSpawn
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Optional
+
+# Usuario al que se atribuyen los renders de la tarea actual (lo fijan los routers)
+render_user: ContextVar[str] = ContextVar('render_user', default='sistema')
+
+
+class RenderRejected(Exception):
+    """El render no se admitió: cola llena o espera agotada."""
+
+    def __init__(self, mensaje: str, retry_after: int):
+        super().__init__(mensaje)
+        self.retry_after = retry_after
+
+
+class RenderAdmission:
+    """Semáforo de renders con cola acotada y turnos rotativos por usuario."""
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+    ):
+        """
+        Inicializa el controlador.
+
+        Args:
+            max_concurrent: Renders simultáneos (RENDER_MAX_CONCURRENT, por
+                defecto BROWSER_POOL_MAX_PAGES)
+            max_queue: Renders en espera antes de rechazar (RENDER_QUEUE_MAX)
+            queue_timeout: Segundos máximos en la cola (RENDER_QUEUE_TIMEOUT)
+        """
+        self.max_concurrent = max_concurrent or int(
+            os.getenv("RENDER_MAX_CONCURRENT", os.getenv("BROWSER_POOL_MAX_PAGES", "4"))
+        )
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("RENDER_QUEUE_MAX", "32"))
+        self.queue_timeout = queue_timeout if queue_timeout is not None else float(
+            os.getenv("RENDER_QUEUE_TIMEOUT", "20")
+        )
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._wait_total = 0.0
+        # Duración media de un render (media móvil), para estimar Retry-After
+        self._avg_render = 5.0
+
+        # Usuario -> renders en espera; el orden del dict es el turno rotativo
+        self._colas: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        """Reinicia el estado si cambia el event loop (los futures no se comparten)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._colas = OrderedDict()
+            self.active = 0
+        return loop
+
+    @property
+    def queued(self) -> int:
+        """Renders esperando turno."""
+        return sum(len(cola) for cola in self._colas.values())
+
+    def _retry_after(self) -> int:
+        """Segundos estimados hasta que haya turno para un render nuevo."""
+        return max(1, math.ceil(self._avg_render * (self.queued + 1) / self.max_concurrent))
+
+    @asynccontextmanager
+    async def slot(self, usuario: Optional[str] = None):
+        """
+        Espera turno para renderizar y lo libera al salir del bloque.
+
+        Args:
+            usuario: Usuario que pide el render (por defecto, render_user)
+
+        Raises:
+            RenderRejected: Si la cola está llena o la espera supera queue_timeout
+        """
+        loop = self._bind_loop()
+        usuario = str(usuario or render_user.get())
+        inicio = time.monotonic()
+
+        if self.active < self.max_concurrent and not self._colas:
+            self.active += 1
+        else:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise RenderRejected("Cola de render llena, intenta más tarde", self._retry_after())
+            turno = loop.create_future()
+            self._colas.setdefault(usuario, deque()).append(turno)
+            try:
+                await asyncio.wait_for(asyncio.shield(turno), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if not turno.done():
+                    self._retirar(usuario, turno)
+                    self.timeouts += 1
+                    self.rejected += 1
+                    raise RenderRejected(
+                        f"Sin turno de render tras {self.queue_timeout:.0f} s", self._retry_after()
+                    )
+                # El turno llegó justo al vencer la espera: se usa
+            except asyncio.CancelledError:
+                if turno.done():
+                    # Ya se nos había cedido el turno: pasa al siguiente
+                    self._liberar()
+                else:
+                    self._retirar(usuario, turno)
+                raise
+
+        self.admitted += 1
+        self._wait_total += time.monotonic() - inicio
+        comienzo = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_render = 0.8 * self._avg_render + 0.2 * (time.monotonic() - comienzo)
+            self._liberar()
+
+    def _retirar(self, usuario: str, turno: asyncio.Future):
+        """Quita un render de la cola (espera agotada o cancelada)."""
+        turno.cancel()
+        cola = self._colas.get(usuario)
+        if cola is None:
+            return
+        try:
+            cola.remove(turno)
+        except ValueError:
+            pass
+        if not cola:
+            del self._colas[usuario]
+
+    def _liberar(self):
+        """Cede el turno al siguiente usuario de la rotación o libera la plaza."""
+        while self._colas:
+            usuario, cola = next(iter(self._colas.items()))
+            turno = cola.popleft()
+            if cola:
+                # El usuario pasa al final de la rotación
+                self._colas.move_to_end(usuario)
+            else:
+                del self._colas[usuario]
+            if not turno.done():
+                turno.set_result(True)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict:
+        """Devuelve ocupación, cola y contadores del controlador."""
+        return {
+            'active': self.active,
+            'max_concurrent': self.max_concurrent,
+            'queued': self.queued,
+            'users_waiting': len(self._colas),
+            'max_queue': self.max_queue,
+            'queue_timeout': self.queue_timeout,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'avg_wait_ms': round(self._wait_total / self.admitted * 1000, 1) if self.admitted else 0.0,
+            'avg_render_s': round(self._avg_render, 2),
+        }
+
+
+_admission: Optional[RenderAdmission] = None
+
+
+def get_render_admission() -> RenderAdmission:
+    """
+    Obtiene el controlador de admisión compartido por todo el proceso.
+
+    Returns:
+        Instancia única de RenderAdmission
+    """
+    global _admission
+    if _admission is None:
+        _admission = RenderAdmission()
+    return _admission
@@ -0,0 +1,177 @@
+"""
+Caché compartida de resultados de scraping para el Price Tracker.
+Un mismo listado puede estar rastreado por cientos de usuarios: esta caché
+guarda el último resultado por URL canónica durante una ventana de frescura
+y agrupa las peticiones concurrentes (single-flight), de forma que solo una
+de ellas llegue a la tienda.
+
+Author: HellSpawn
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from src.urls import canonical_url
+
+
+class ScrapeResultCache:
+    """Caché TTL de resultados con coalescencia de peticiones en vuelo."""
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        """
+        Inicializa la caché.
+
+        Args:
+            ttl: Segundos que un precio se considera fresco (SCRAPE_RESULT_TTL)
+            negative_ttl: Segundos que se recuerda un resultado sin precio
+            max_entries: URLs guardadas antes de desalojar las menos usadas
+        """
+        self.ttl = ttl if ttl is not None else float(os.getenv("SCRAPE_RESULT_TTL", "600"))
+        self.negative_ttl = negative_ttl if negative_ttl is not None else float(
+            os.getenv("SCRAPE_RESULT_NEGATIVE_TTL", "60")
+        )
+        self.max_entries = max_entries or int(os.getenv("SCRAPE_RESULT_MAX_ENTRIES", "20000"))
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Dict, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """
+        Devuelve el resultado fresco de una URL sin contarlo como fallo.
+
+        Args:
+            url: URL del producto (cualquier variante)
+
+        Returns:
+            Resultado guardado o None si no hay uno fresco
+        """
+        clave = canonical_url(url)
+        with self._lock:
+            entrada = self._entries.get(clave)
+            if entrada is None:
+                return None
+            resultado, expira = entrada
+            if expira <= time.monotonic():
+                del self._entries[clave]
+                return None
+            self._entries.move_to_end(clave)
+            self.hits += 1
+            return dict(resultado)
+
+    def store(self, url: str, resultado: Dict):
+        """
+        Guarda el resultado de un scrape.
+
+        Args:
+            url: URL del producto
+            resultado: Diccionario con al menos 'precio'
+        """
+        ttl = self.ttl if resultado.get('precio') is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        clave = canonical_url(url)
+        with self._lock:
+            self._entries[clave] = (dict(resultado), time.monotonic() + ttl)
+            self._entries.move_to_end(clave)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_or_fetch(self, url: str, fetch: Callable[[], Awaitable[Dict]]) -> Dict:
+        """
+        Devuelve el resultado fresco o ejecuta fetch una sola vez por URL
+        canónica, aunque lleguen varias peticiones a la vez.
+
+        Args:
+            url: URL del producto
+            fetch: Corrutina que hace el scrape real
+
+        Returns:
+            Resultado del scrape (compartido entre las peticiones agrupadas)
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Los futures de otro event loop no se pueden esperar
+            self._loop = loop
+            self._inflight = {}
+
+        clave = canonical_url(url)
+        while True:
+            resultado = self.lookup(url)
+            if resultado is not None:
+                return resultado
+            en_vuelo = self._inflight.get(clave)
+            if en_vuelo is None:
+                break
+            self.coalesced += 1
+            try:
+                return dict(await asyncio.shield(en_vuelo))
+            except asyncio.CancelledError:
+                if not en_vuelo.cancelled():
+                    # Cancelaron esta espera, no el scrape compartido
+                    raise
+                # Cancelaron al que hacía el scrape: otra espera toma el relevo
+                self.coalesced -= 1
+
+        self.misses += 1
+        futuro = loop.create_future()
+        self._inflight[clave] = futuro
+        try:
+            resultado = await fetch()
+        except Exception as e:
+            # Los errores no se guardan: cada espera los recibe y el siguiente reintenta
+            futuro.set_exception(e)
+            futuro.exception()
+            raise
+        except BaseException:
+            # Cancelación (o salida del proceso): las esperas reintentan en lugar de recibirla
+            futuro.cancel()
+            raise
+        else:
+            self.store(url, resultado)
+            futuro.set_result(resultado)
+            return dict(resultado)
+        finally:
+            if self._inflight.get(clave) is futuro:
+                del self._inflight[clave]
+
+    def stats(self) -> Dict:
+        """Devuelve contadores de aciertos, fetches reales y peticiones agrupadas."""
+        total = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self._entries),
+            'inflight': len(self._inflight),
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_ratio': round((self.hits + self.coalesced) / total, 3) if total else 0.0,
+        }
+
+
+_cache: Optional[ScrapeResultCache] = None
+
+
+def get_result_cache() -> ScrapeResultCache:
+    """
+    Obtiene la caché de resultados compartida por todo el proceso.
+
+    Returns:
+        Instancia única de ScrapeResultCache
+    """
+    global _cache
+    if _cache is None:
+        _cache = ScrapeResultCache()
+    return _cache
@@ -0,0 +1,100 @@
+"""
+Política de reintentos para el Price Tracker.
+Los errores transitorios (timeouts, conexiones rechazadas, 5xx, 429) se
+reintentan con backoff exponencial y jitter completo, respetando el
+Retry-After que envía la tienda, en lugar de devolver "No se pudo obtener
+el precio" al primer fallo.
+
+Author: HellSpawn
+"""
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# Estados HTTP que indican un problema transitorio del servidor
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(valor: Optional[str]) -> Optional[float]:
+    """
+    Interpreta un header Retry-After.
+
+    Args:
+        valor: Segundos ('120') o fecha HTTP ('Wed, 21 Oct 2026 07:28:00 GMT')
+
+    Returns:
+        Segundos a esperar (nunca negativos) o None si falta o no es válido
+    """
+    if not valor:
+        return None
+    valor = valor.strip()
+    if valor.isdigit():
+        return float(valor)
+    try:
+        fecha = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    if fecha is None:
+        return None
+    return max(0.0, fecha.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """Número de intentos y espera entre ellos."""
+
+    def __init__(
+        self,
+        attempts: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+    ):
+        """
+        Inicializa la política.
+
+        Args:
+            attempts: Intentos totales por petición (SCRAPER_RETRY_ATTEMPTS, 1 = sin reintentos)
+            base_delay: Espera base en segundos del backoff (SCRAPER_RETRY_BASE_DELAY)
+            max_delay: Espera máxima; un Retry-After mayor no se reintenta
+                (SCRAPER_RETRY_MAX_DELAY)
+        """
+        self.attempts = max(1, attempts or int(os.getenv("SCRAPER_RETRY_ATTEMPTS", "3")))
+        self.base_delay = base_delay if base_delay is not None else float(
+            os.getenv("SCRAPER_RETRY_BASE_DELAY", "0.5")
+        )
+        self.max_delay = max_delay if max_delay is not None else float(
+            os.getenv("SCRAPER_RETRY_MAX_DELAY", "10")
+        )
+
+    def should_retry(self, intento: int, retry_after: Optional[float] = None) -> bool:
+        """
+        Indica si se hace otro intento.
+
+        Args:
+            intento: Número del intento que acaba de fallar (desde 1)
+            retry_after: Espera pedida por el servidor, si la hubo
+
+        Returns:
+            False si se agotaron los intentos o el servidor pide esperar
+            más que max_delay (mejor fallar y dejarlo al circuit breaker)
+        """
+        if intento >= self.attempts:
+            return False
+        return retry_after is None or retry_after <= self.max_delay
+
+    def delay(self, intento: int, retry_after: Optional[float] = None) -> float:
+        """
+        Segundos a esperar antes del siguiente intento.
+
+        Args:
+            intento: Número del intento que acaba de fallar (desde 1)
+            retry_after: Espera pedida por el servidor, si la hubo
+
+        Returns:
+            Retry-After más un poco de jitter, o backoff exponencial con
+            jitter completo (evita que los reintentos lleguen todos a la vez)
+        """
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (intento - 1))))
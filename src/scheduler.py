@@ -13,7 +13,7 @@ import os
 # Añade el directorio padre al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.tracker import Tracker
+from src.tracker import Tracker, ejecutar
 
 
 class AutoUpdater:
@@ -37,7 +37,8 @@ class AutoUpdater:
         print(f"Iniciando actualización de precios - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"{'='*60}\n")
         
-        resultados = self.tracker.actualizar_todos_los_precios()
+        # Cada tanda cierra el navegador y el cliente HTTP de su event loop
+        resultados = ejecutar(self.tracker.actualizar_todos_los_precios())
         
         # Muestra resultados
         exitos = 0
@@ -4,22 +4,54 @@ Extrae precios de diferentes sitios web.
 
 Author: HellSpawn
 """
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import httpx
+import importlib.util
 import re
-from typing import Optional, Dict
+from contextvars import ContextVar
+from typing import Optional, Dict, List, Tuple
 import time
 from urllib.parse import urlparse
 import os
 
-# Intentar importar Playwright (opcional)
-try:
-    from src.scraper_playwright import PlaywrightScraper
-    PLAYWRIGHT_AVAILABLE = True
-    print("✓ Playwright disponible para scraping avanzado")
-except ImportError:
-    PLAYWRIGHT_AVAILABLE = False
-    print("⚠️  Playwright no disponible, usando scraping simple")
+from src.http_client import get_http_engine
+from src.http_cache import get_http_cache
+from src.html_parser import ParsedDocument, get_parser_backend
+from src.rate_limiter import DomainScheduler, domain_key, get_domain_scheduler
+from src.selector_engine import CompiledSelectors, selector_key
+from src.extraction_stats import get_extraction_stats
+from src.browser_sessions import get_session_store
+from src.extraction_executor import get_extraction_executor
+from src.fetch_ladder import get_fetch_ladder
+from src.render_admission import RenderRejected
+from src.result_cache import get_result_cache
+from src.urls import canonical_url
+from src.streaming import StreamingExtractor, max_download_bytes
+from src.structured_data import extract_structured_price
+
+# Playwright es opcional y su importación es costosa: solo se comprueba que
+# esté instalado y el módulo se carga en el primer render
+PLAYWRIGHT_AVAILABLE = importlib.util.find_spec("playwright") is not None
+
+# Diagnóstico en curso (test_url): las fases de la escalera anotan aquí el
+# código de estado, los bytes y sus tiempos
+_diagnostico: ContextVar[Optional[Dict]] = ContextVar('diagnostico', default=None)
+
+# Intento en curso de la escalera: marca si alguna estrategia ya renderizó la
+# página (cosechar la sesión renderiza), para no renderizarla dos veces
+_intento: ContextVar[Optional[Dict]] = ContextVar('intento', default=None)
+
+# Frases de las páginas de verificación anti-bots (señal de que hay que bajar el ritmo)
+CAPTCHA_MARKERS = (
+    'captcha',
+    'are you a robot',
+    'not a robot',
+    'verify you are human',
+    'checking your browser',
+    'unusual traffic',
+    'no soy un robot',
+    'tráfico inusual',
+)
 
 
 class PriceScraper:
@@ -43,9 +75,21 @@ class PriceScraper:
             'Cache-Control': 'max-age=0',
         }
         
-        # Crear sesión para mantener cookies
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        # Motor HTTP asíncrono compartido (pool de conexiones con keep-alive)
+        self.http = get_http_engine(self.headers)
+        
+        # Caché de revalidación (ETag / Last-Modified) para no re-descargar páginas sin cambios
+        self.cache = get_http_cache() if os.getenv("SCRAPER_HTTP_CACHE", "True") == "True" else None
+        
+        # Backend de parseo HTML (lxml por defecto, configurable con SCRAPER_HTML_PARSER)
+        self.parser = get_parser_backend()
+        
+        # Extracción en streaming: corta la descarga en cuanto aparece el precio
+        self.streaming = os.getenv("SCRAPER_STREAMING", "True") == "True"
+        self.max_download_bytes = max_download_bytes()
+        
+        # IDs de MercadoLibre por petición multi-get (la API acepta hasta 20)
+        self.ml_batch_size = min(int(os.getenv("SCRAPER_ML_BATCH_SIZE", "20")), 20)
         
         # Configuraciones específicas por dominio
         self.domain_configs = {
@@ -77,97 +121,697 @@ class PriceScraper:
                 'clean_pattern': r'[^\d,.]'
             },
         }
+        
+        # Los selectores de cada tienda se compilan una sola vez en una consulta única
+        self.compiled_selectors = {
+            domain: CompiledSelectors(config['selectors'])
+            for domain, config in self.domain_configs.items()
+        }
+        
+        # Orden adaptativo: el selector / nivel que funcionó más recientemente va primero
+        self.stats = get_extraction_stats() if os.getenv("SCRAPER_ADAPTIVE_ORDER", "True") == "True" else None
+        self._compiled_por_orden: Dict[Tuple[str, ...], CompiledSelectors] = {}
+        
+        # Las páginas grandes se parsean en un pool de procesos para no bloquear el event loop
+        self.extractor = get_extraction_executor()
+        
+        # Escalera de estrategias por host (API, HTTP, cookies, render)
+        self.ladder = get_fetch_ladder() if os.getenv("SCRAPER_FETCH_LADDER", "True") == "True" else None
+        self.render_enabled = os.getenv("SCRAPER_RENDER_TIER", "True") == "True"
+        # Cookies cosechadas con Playwright, reutilizadas por el tier 'cookies'
+        self.sessions = get_session_store()
+        
+        # Modo carrera (llamadas interactivas): estrategias baratas en paralelo
+        # y las caras (render) solo tras este retraso
+        self.race_expensive_delay = float(os.getenv("SCRAPER_RACE_EXPENSIVE_DELAY", "2"))
+        
+        # Resultados compartidos entre usuarios por URL canónica (TTL + single-flight)
+        self.results = get_result_cache() if os.getenv("SCRAPE_RESULT_CACHE", "True") == "True" else None
     
-    async def get_price(self, url: str) -> Optional[float]:
+    async def get_price(self, url: str, race: bool = False) -> Optional[float]:
         """
         Extrae el precio de una URL.
-        Intenta primero con Playwright (si está disponible) para sitios que detectan bots,
-        luego falla al método simple.
         
         Args:
             url: URL de la página del producto
+            race: Correr las estrategias en paralelo (ver _carrera)
         
         Returns:
             Precio como float o None si no se pudo extraer
         """
+        resultado = await self.get_price_info(url, race=race)
+        return resultado['precio']
+    
+    async def get_price_info(self, url: str, use_api: bool = True, race: bool = False) -> Dict:
+        """
+        Extrae el precio de una URL e informa qué nivel lo obtuvo.
+        Pasa por la caché compartida de resultados: dentro de la ventana de
+        frescura, las peticiones por la misma URL canónica (de cualquier
+        usuario) reutilizan un único scrape.
+        
+        Args:
+            url: URL de la página del producto
+            use_api: Si se consulta la API de MercadoLibre
+            race: Correr las estrategias en paralelo y quedarse con la primera
+                que dé precio (llamadas interactivas, ver _carrera)
+        
+        Returns:
+            Diccionario con 'precio', 'tier' y 'detalle' (ver _get_price_info)
+        """
+        if self.results:
+            return await self.results.get_or_fetch(url, lambda: self._fetch_price_info(url, use_api, race))
+        return await self._fetch_price_info(url, use_api, race)
+    
+    async def _fetch_price_info(self, url: str, use_api: bool = True, race: bool = False) -> Dict:
+        """Hace el scrape real y registra el nivel ganador en las estadísticas."""
+        resultado = await self._get_price_info(url, use_api, race)
+        if self.stats and resultado['tier']:
+            self.stats.record_tier(domain_key(url), resultado['tier'])
+        return resultado
+    
+    async def _get_price_info(self, url: str, use_api: bool = True, race: bool = False) -> Dict:
+        """
+        Extrae el precio de una URL e informa qué nivel lo obtuvo.
+        Recorre la escalera de estrategias del host (API oficial, HTTP simple,
+        HTTP con cookies de primera visita y render con Playwright) empezando
+        por la más barata que funcionó recientemente; las descargas HTTP prueban,
+        en orden, datos estructurados, selectores de la tienda y patrones genéricos.
+        
+        Args:
+            url: URL de la página del producto
+            use_api: Si se consulta la API de MercadoLibre (False cuando el
+                lote multi-get ya lo intentó)
+            race: Correr las estrategias en paralelo en lugar de en orden
+        
+        Returns:
+            Diccionario con 'precio', 'tier' ('api', 'playwright', 'cache',
+            'structured', 'selector', 'generic' o None) y 'detalle'
+        """
         print(f"🚀 [get_price] Iniciando extracción para: {url}")
         domain = self._get_domain(url)
         print(f"🌐 [get_price] Dominio detectado: {domain}")
         
-        # Para MercadoLibre, intentar primero la API pública antes del scraping tradicional
-        if domain == 'mercadolibre':
-            print("🔍 Detectado MercadoLibre, intentando API oficial primero...")
+        clave = domain_key(url)
+        if self.http.breakers.is_open(clave):
+            # Tienda caída: ni HTTP ni render, se falla al instante
+            print(f"🔌 [get_price] Circuito abierto para {clave}, se omite el scrape")
+            return self._resultado(None, None, 'circuit-open')
+        
+        disponibles = self._estrategias_disponibles(domain, use_api)
+        orden = self.ladder.plan(clave, disponibles) if self.ladder else disponibles
+        print(f"🪜 [get_price] Estrategias: {' → '.join(orden)}{' (carrera)' if race else ''}")
+        
+        # Estado compartido por las estrategias de este intento (también las de la carrera)
+        token = _intento.set({'renderizado': False})
+        try:
+            if race:
+                resultado, ganador, probados = await self._carrera(orden, url, domain)
+            else:
+                resultado, ganador, probados = await self._en_orden(orden, url, domain)
+        finally:
+            _intento.reset(token)
+        
+        if self.ladder:
+            self.ladder.record(clave, disponibles, ganador, probados)
+        return resultado
+    
+    async def _en_orden(self, orden: List[str], url: str, domain: str) -> Tuple[Dict, Optional[str], List[str]]:
+        """
+        Prueba las estrategias una tras otra hasta que alguna da precio.
+        
+        Args:
+            orden: Estrategias a probar
+            url: URL de la página del producto
+            domain: Dominio detectado
+        
+        Returns:
+            Resultado, estrategia ganadora (None si ninguna) y estrategias probadas
+        """
+        resultado = self._resultado(None, None)
+        probados = []
+        diagnostico = _diagnostico.get()
+        estado = _intento.get() or {}
+        for estrategia in orden:
+            if estrategia == 'render' and estado.get('renderizado'):
+                # 'cookies' ya renderizó la página para cosechar la sesión y no dio precio
+                print("🎭 La página ya se renderizó en este intento, se omite el render")
+                continue
+            probados.append(estrategia)
+            t0 = time.perf_counter()
+            intento = await self._intentar_estrategia(estrategia, url, domain)
+            if diagnostico is not None:
+                diagnostico['tiempos'][f'{estrategia}_ms'] = self._ms(t0)
+            if intento['precio'] is not None:
+                return intento, estrategia, probados
+            # Se conserva el último error para informar si todas fallan
+            if intento['detalle'] is not None:
+                resultado = intento
+        return resultado, None, probados
+    
+    async def _carrera(self, orden: List[str], url: str, domain: str) -> Tuple[Dict, Optional[str], List[str]]:
+        """
+        Corre las estrategias en paralelo y se queda con la primera que da precio.
+        
+        Las baratas (API, HTTP simple, HTTP con una sesión ya cosechada)
+        arrancan a la vez; las caras (render, o cosechar una sesión) arrancan
+        juntas en orden tras race_expensive_delay, o antes si todas las baratas
+        ya fallaron. Al haber ganador se cancelan las que siguen en curso, así
+        la latencia queda acotada por la estrategia más rápida que funciona.
+        
+        Args:
+            orden: Estrategias a probar
+            url: URL de la página del producto
+            domain: Dominio detectado
+        
+        Returns:
+            Resultado, estrategia ganadora (None si ninguna) y estrategias que
+            terminaron (las canceladas no cuentan para la escalera)
+        """
+        renderiza = PLAYWRIGHT_AVAILABLE and self.render_enabled
+        caras = {'render'}
+        if renderiza and not self.sessions.has_session(domain_key(url)):
+            # Sin sesión vigente, 'cookies' renderiza para cosecharla
+            caras.add('cookies')
+        baratas = [e for e in orden if e not in caras]
+        diferidas = [e for e in orden if e in caras]
+        
+        loop = asyncio.get_running_loop()
+        arranque_caras = loop.time() + self.race_expensive_delay
+        # Cada tarea es un grupo de estrategias en orden: las caras van juntas para no renderizar dos veces
+        tareas = {asyncio.ensure_future(self._en_orden([e], url, domain)): [e] for e in baratas}
+        resultado = self._resultado(None, None)
+        probados: List[str] = []
+        error: Optional[BaseException] = None
+        try:
+            while tareas or diferidas:
+                if diferidas and (not tareas or loop.time() >= arranque_caras):
+                    print(f"🏁 [carrera] Arrancan las estrategias caras: {', '.join(diferidas)}")
+                    tareas[asyncio.ensure_future(self._en_orden(diferidas, url, domain))] = diferidas
+                    diferidas = []
+                espera = max(0.0, arranque_caras - loop.time()) if diferidas else None
+                hechas, _ = await asyncio.wait(tareas, timeout=espera, return_when=asyncio.FIRST_COMPLETED)
+                for tarea in hechas:
+                    grupo = tareas.pop(tarea)
+                    if tarea.exception() is not None:
+                        # RenderRejected u otro error: esta entrada pierde, las demás siguen
+                        print(f"🏁 [carrera] '{', '.join(grupo)}' falló: {tarea.exception()!r}")
+                        error = error or tarea.exception()
+                        continue
+                    intento, ganador, terminadas = tarea.result()
+                    probados += terminadas
+                    if ganador is not None:
+                        print(f"🏁 [carrera] Gana '{ganador}'")
+                        return intento, ganador, probados
+                    if intento['detalle'] is not None:
+                        resultado = intento
+            if error is not None:
+                # Ninguna estrategia dio precio: se informa el error (503 si no hubo turno de render)
+                raise error
+            return resultado, None, probados
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+            if tareas:
+                # Esperar la cancelación libera conexiones, páginas y turnos de render
+                await asyncio.gather(*tareas, return_exceptions=True)
+    
+    def _estrategias_disponibles(self, domain: str, use_api: bool) -> List[str]:
+        """
+        Estrategias aplicables a una tienda, de menor a mayor coste.
+        
+        Args:
+            domain: Dominio detectado
+            use_api: Si se puede consultar la API oficial
+        
+        Returns:
+            Subconjunto ordenado de LADDER
+        """
+        disponibles = []
+        if domain == 'mercadolibre' and use_api:
+            disponibles.append('api')
+        disponibles += ['static', 'cookies']
+        if PLAYWRIGHT_AVAILABLE and self.render_enabled:
+            disponibles.append('render')
+        return disponibles
+    
+    async def _intentar_estrategia(self, estrategia: str, url: str, domain: str) -> Dict:
+        """
+        Ejecuta una estrategia de la escalera.
+        
+        Args:
+            estrategia: 'api', 'static', 'cookies' o 'render'
+            url: URL de la página del producto
+            domain: Dominio detectado
+        
+        Returns:
+            Resultado de la extracción (precio None si la estrategia falló)
+        """
+        if estrategia == 'api':
+            print("🔍 Intentando API oficial de MercadoLibre...")
             try:
-                api_price = self._get_mercadolibre_api_price(url)
+                api_price = await self._get_mercadolibre_api_price(url)
                 if api_price is not None:
                     print(f"✅ Precio obtenido desde API oficial de MercadoLibre: ${api_price}")
-                    return api_price
-                print("⚠️ API de MercadoLibre no devolvió precio, intentando scraping")
+                    return self._resultado(api_price, 'api', 'mercadolibre-items')
+                print("⚠️ API de MercadoLibre no devolvió precio")
+                return self._resultado(None, None)
             except Exception as e:
                 print(f"❌ Error al llamar API de MercadoLibre: {type(e).__name__}: {e}")
-                print("⚠️ Continuando con scraping...")
-            if PLAYWRIGHT_AVAILABLE:
-                print("🎭 Usando Playwright para MercadoLibre...")
-                try:
-                    async with PlaywrightScraper() as pw_scraper:
-                        print("✓ PlaywrightScraper inicializado")
-                        precio = await pw_scraper.get_price(url)
-                        print(f"📊 Playwright retornó: {precio}")
-                        if precio:
-                            print(f"✅ Precio extraído exitosamente con Playwright: ${precio}")
-                            return precio
-                        print("⚠️ Playwright retornó None")
-                    print("⚠️  Playwright falló, intentando método simple...")
-                except Exception as e:
-                    print(f"❌ Error en Playwright: {type(e).__name__}: {e}")
-                    import traceback
-                    print(traceback.format_exc())
-                    print("⚠️  Fallando al método simple...")
-            else:
-                print("⚠️ Playwright NO disponible para MercadoLibre")
+                return self._resultado(None, None, str(e))
+        
+        if estrategia == 'render':
+            return await self._render_price(url, domain)
+        
+        if estrategia == 'cookies':
+            return await self._fetch_con_sesion(url, domain)
         
-        # Método simple con requests (fallback o para otros sitios)
-        print("🔄 Usando método simple con requests...")
         try:
-            print(f"🔍 Intentando extraer precio de: {url}")
-            
-            # Realiza la petición HTTP usando la sesión
-            response = self.session.get(url, timeout=15, allow_redirects=True)
-            response.raise_for_status()
-            
-            print(f"✓ Respuesta HTTP {response.status_code}")
-            print(f"📍 URL final (después de redirects): {response.url}")
-            
-            # Parsea el HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Intenta extraer el precio usando configuraciones específicas del dominio
-            domain = self._get_domain(url)
-            print(f"🌐 Dominio detectado: {domain}")
-            
-            precio = self._extract_price_by_domain(soup, domain)
+            print(f"🔄 Descarga HTTP simple: {url}")
+            return await self._fetch_and_extract(url, domain)
+        except httpx.HTTPError as e:
+            print(f"Error al acceder a la URL {url}: {e}")
+            return self._resultado(None, None, str(e))
+        except Exception as e:
+            print(f"Error inesperado al procesar {url}: {e}")
+            return self._resultado(None, None, str(e))
+    
+    async def _fetch_con_sesion(self, url: str, domain: str) -> Dict:
+        """
+        Descarga por HTTP con las cookies de una sesión de navegador.
+        
+        Si el host tiene una sesión cosechada vigente se carga en el cliente
+        compartido y basta una petición ligera; si no la tiene, o la tienda
+        ya no la acepta, se renderiza una vez con Playwright para cosecharla
+        (y de paso extraer el precio). Sin Playwright se recurre a visitar
+        la portada para recibir las cookies de primera visita.
+        
+        Args:
+            url: URL de la página del producto
+            domain: Dominio detectado
+        
+        Returns:
+            Resultado de la extracción (precio None si falló)
+        """
+        clave = domain_key(url)
+        sesion = self.sessions.get(clave)
+        try:
+            if sesion is not None:
+                self.http.add_cookies(sesion['cookies'])
+                print(f"🍪 Reutilizando sesión de navegador de {clave}: {url}")
+                resultado = await self._fetch_and_extract(url, domain, conditional=False)
+                if resultado['precio'] is not None:
+                    return resultado
+                print(f"🍪 La sesión de {clave} ya no sirve, se cosecha otra")
+                self.sessions.invalidate(clave)
             
-            # Si no funcionó, intenta métodos genéricos
-            if precio is None:
-                print("⚠️  Selectores de dominio fallaron, intentando métodos genéricos...")
-                precio = self._extract_price_generic(soup)
+            if PLAYWRIGHT_AVAILABLE and self.render_enabled:
+                return await self._render_price(url, domain, cosechar=True)
             
+            await self._visitar_portada(url)
+            print(f"🍪 Reintentando con cookies de primera visita: {url}")
+            return await self._fetch_and_extract(url, domain, conditional=False)
+        except httpx.HTTPError as e:
+            print(f"Error al acceder a la URL {url}: {e}")
+            return self._resultado(None, None, str(e))
+    
+    async def _visitar_portada(self, url: str):
+        """
+        Visita la portada de la tienda para recibir las cookies de primera
+        visita (consentimiento, sesión); el cliente compartido las guarda y
+        las envía en las siguientes peticiones al mismo host.
+        
+        Args:
+            url: URL del producto
+        """
+        partes = urlparse(url)
+        portada = f"{partes.scheme}://{partes.netloc}/"
+        try:
+            response = await self.http.get(portada)
+            print(f"🍪 Portada visitada ({response.status_code}), {len(response.cookies)} cookies nuevas")
+        except httpx.HTTPError as e:
+            print(f"⚠️  No se pudo visitar la portada {portada}: {e}")
+    
+    async def _render_price(self, url: str, domain: str, cosechar: bool = False) -> Dict:
+        """
+        Renderiza la página con Playwright y extrae el precio.
+        
+        Args:
+            url: URL de la página del producto
+            domain: Dominio detectado
+            cosechar: Guardar las cookies del render para reutilizarlas por HTTP
+        
+        Returns:
+            Resultado con tier 'playwright' (precio None si falló)
+        """
+        print("🎭 Usando Playwright...")
+        estado = _intento.get()
+        if estado is not None:
+            estado['renderizado'] = True
+        try:
+            from src.scraper_playwright import MERCADOLIBRE_SELECTORS, PlaywrightScraper
+            # El HTML renderizado de MercadoLibre usa variantes que la página estática no trae
+            selectores = MERCADOLIBRE_SELECTORS if domain == 'mercadolibre' else self._compiled_for(domain)
+            config = self.domain_configs.get(domain, {})
+            async with PlaywrightScraper() as pw_scraper:
+                precio = await pw_scraper.get_price(
+                    url, selectores, capturar_sesion=cosechar,
+                    clean_pattern=config.get('clean_pattern', r'[^\d,.]'),
+                    # Los importes en $ / pesos del texto solo son fiables en MercadoLibre
+                    regex_fallback=domain == 'mercadolibre',
+                )
+                cookies = pw_scraper.ultima_sesion
+            if cosechar and cookies:
+                # PlaywrightScraper ya guardó la sesión en el almacén compartido
+                self.http.add_cookies(cookies)
+                print(f"🍪 Sesión de {domain_key(url)} cosechada ({len(cookies)} cookies)")
             if precio:
-                print(f"💰 Precio encontrado: ${precio}")
+                print(f"✅ Precio extraído exitosamente con Playwright: ${precio}")
+                return self._resultado(precio, 'playwright')
+            print("⚠️ Playwright retornó None")
+            return self._resultado(None, None)
+        except RenderRejected:
+            raise
+        except Exception as e:
+            print(f"❌ Error en Playwright: {type(e).__name__}: {e}")
+            return self._resultado(None, None, str(e))
+    
+    @staticmethod
+    def _resultado(precio: Optional[float], tier: Optional[str], detalle: Optional[str] = None) -> Dict:
+        """Construye el resultado de una extracción."""
+        return {'precio': precio, 'tier': tier, 'detalle': detalle}
+    
+    async def _fetch_and_extract(self, url: str, domain: str, conditional: bool = True) -> Dict:
+        """
+        Descarga la página (revalidando con la caché) y extrae el precio.
+        
+        Args:
+            url: URL de la página del producto
+            domain: Dominio detectado
+            conditional: Si se envían los validadores de la caché
+        
+        Returns:
+            Resultado de la extracción (ver get_price_info)
+        """
+        cache_headers = await self.cache.conditional_headers_async(url) if (self.cache and conditional) else {}
+        
+        # En un diagnóstico, los eventos de httpcore separan la conexión del resto de la petición
+        diagnostico = _diagnostico.get()
+        marcas = {}
+        
+        async def trace(evento: str, info: Dict):
+            marcas[evento] = time.perf_counter()
+        
+        t0 = time.perf_counter()
+        async with self.http.stream(
+            url,
+            headers=cache_headers or None,
+            extensions={'trace': trace} if diagnostico is not None else None,
+        ) as response:
+            if diagnostico is not None:
+                diagnostico['tiempos']['ttfb_ms'] = self._ms(t0)
+                diagnostico['status_code'] = response.status_code
+            if response.status_code == 304 and cache_headers:
+                precio = await self.cache.hit_async(url)
+                if precio is not None:
+                    print(f"♻️  Página sin cambios (304), reutilizando precio: ${precio}")
+                    return self._resultado(precio, 'cache', 'not-modified')
+                # La entrada desapareció entre la petición y la respuesta: descarga completa
+                revalidar = True
             else:
-                print("❌ No se pudo extraer el precio")
-                # Guardar HTML para debug
-                print(f"📄 Primeros 500 caracteres del HTML:")
-                print(soup.get_text()[:500])
+                revalidar = False
+                response.raise_for_status()
+                if self.cache:
+                    self.cache.record_miss()
+                
+                print(f"✓ Respuesta HTTP {response.status_code}")
+                print(f"📍 URL final (después de redirects): {response.url}")
+                
+                resultado, doc, descargados = await self._read_and_extract(response, domain)
+                if diagnostico is not None:
+                    diagnostico['bytes'] = descargados
+        if diagnostico is not None:
+            diagnostico['tiempos']['connect_ms'] = self._duracion_conexion(marcas)
+        
+        if revalidar:
+            return await self._fetch_and_extract(url, domain, conditional=False)
+        
+        precio = resultado['precio']
+        if precio:
+            print(f"💰 Precio encontrado: ${precio} (nivel: {resultado['tier']})")
+            if self.cache:
+                await self.cache.store_async(
+                    url,
+                    response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'),
+                    precio,
+                    descargados,
+                )
+        else:
+            print("❌ No se pudo extraer el precio")
+            texto = doc.get_text() if doc is not None else ''
+            if self._es_captcha(texto):
+                # Página de verificación: la tienda pide bajar el ritmo
+                self.http.scheduler.record_throttle(domain_key(url), 'captcha')
+            # Guardar HTML para debug
+            print(f"📄 Primeros 500 caracteres del HTML:")
+            print(texto[:500])
+        
+        return resultado
+    
+    @staticmethod
+    def _es_captcha(texto: str) -> bool:
+        """
+        Indica si el texto de una página sin precio es una verificación anti-bots.
+        
+        Args:
+            texto: Texto visible de la página
+        
+        Returns:
+            True si contiene alguna de CAPTCHA_MARKERS
+        """
+        texto = texto[:20000].lower()
+        return any(marca in texto for marca in CAPTCHA_MARKERS)
+    
+    async def _read_and_extract(self, response: httpx.Response, domain: str):
+        """
+        Lee el cuerpo de la respuesta y extrae el precio.
+        En modo streaming corta la descarga en cuanto los datos estructurados o
+        un selector de la tienda producen un precio; si la página termina sin
+        precio y supera SCRAPER_EXTRACT_INLINE_BYTES, la extracción completa
+        (con los patrones genéricos) se hace en el pool de procesos. En ambos
+        modos respeta SCRAPER_MAX_DOWNLOAD_BYTES.
+        
+        Args:
+            response: Respuesta en streaming con el cuerpo sin leer
+            domain: Dominio detectado
+        
+        Returns:
+            Tupla (resultado, documento parseado o None, bytes leídos)
+        """
+        diagnostico = _diagnostico.get()
+        tiempos = diagnostico['tiempos'] if diagnostico is not None else None
+        t0 = time.perf_counter()
+        if self.streaming:
+            config = self.domain_configs.get(domain)
+            compiled = self._compiled_for(domain)
+            extractor = StreamingExtractor(
+                compiled,
+                lambda texto: self._clean_price(texto.strip(), config['clean_pattern']),
+                max_bytes=self.max_download_bytes,
+                encoding=response.charset_encoding,
+            )
+            partes = []
+            parseo = 0.0
+            async for chunk in response.aiter_bytes():
+                partes.append(chunk)
+                t1 = time.perf_counter()
+                extractor.feed(chunk)
+                parseo += time.perf_counter() - t1
+                if extractor.done:
+                    break
+            t1 = time.perf_counter()
+            # Sin corte temprano: elegir el mejor selector con la página completa
+            extractor.finish()
+            parseo += time.perf_counter() - t1
+            if tiempos is not None:
+                # El parseo es incremental: se descuenta de la descarga
+                tiempos['parse_ms'] = round(parseo * 1000, 2)
+                tiempos['download_ms'] = round(self._ms(t0) - tiempos['parse_ms'], 2)
+                tiempos['extract_ms'] = 0.0
             
-            return precio
+            if extractor.result:
+                precio, tier, detalle = extractor.result
+                print(f"✓ Precio encontrado ({tier}: {detalle}): {precio} "
+                      f"(descarga cortada en {extractor.bytes_read} bytes)")
+                if tier == 'selector':
+                    self._record_selectors(domain, extractor.failed_selectors(), detalle)
+                return self._resultado(precio, tier, detalle), extractor.document(), extractor.bytes_read
+            if extractor.truncated:
+                print(f"⚠️  Página truncada en {extractor.bytes_read} bytes")
             
-        except requests.RequestException as e:
-            print(f"Error al acceder a la URL {url}: {e}")
-            return None
-        except Exception as e:
-            print(f"Error inesperado al procesar {url}: {e}")
-            return None
+            t1 = time.perf_counter()
+            if self.extractor.should_offload(extractor.bytes_read):
+                # Página grande sin precio: el parseo completo y los patrones
+                # genéricos van al pool de procesos en lugar de bloquear el event loop
+                html = b''.join(partes)[:self.max_download_bytes]
+                salida = await self.extractor.extract(
+                    html, domain, self._orden_selectores(domain), self._orden_niveles(domain_key(str(response.url)))
+                )
+                if salida is not None:
+                    if salida['fallidos'] is not None:
+                        self._record_selectors(domain, salida['fallidos'], salida['ganador'])
+                    if tiempos is not None:
+                        tiempos['extract_ms'] = self._ms(t1)
+                    return salida['resultado'], None, extractor.bytes_read
+            
+            self.extractor.inline += 1
+            if compiled is not None:
+                self._record_selectors(domain, extractor.failed_selectors(), None)
+            print("⚠️  Selectores de dominio fallaron, intentando métodos genéricos...")
+            doc = extractor.document()
+            resultado = self._extract_generic_result(doc)
+            if tiempos is not None:
+                tiempos['extract_ms'] = self._ms(t1)
+            return resultado, doc, extractor.bytes_read
+        
+        # Modo completo: descargar (con límite) y extraer
+        partes = []
+        descargados = 0
+        async for chunk in response.aiter_bytes():
+            partes.append(chunk)
+            descargados += len(chunk)
+            if descargados >= self.max_download_bytes:
+                print(f"⚠️  Página truncada en {descargados} bytes")
+                break
+        html = b''.join(partes)[:self.max_download_bytes]
+        if tiempos is not None:
+            tiempos['download_ms'] = self._ms(t0)
+        t1 = time.perf_counter()
+        resultado, doc = await self.extract_html_async(html, domain, domain_key(str(response.url)), tiempos)
+        if tiempos is not None:
+            tiempos['extract_ms'] = round(self._ms(t1) - tiempos.get('parse_ms', 0.0), 2)
+        return resultado, doc, descargados
+    
+    def extract_from_html(
+        self,
+        html: bytes,
+        domain: str,
+        clave: Optional[str] = None,
+        tiempos: Optional[Dict] = None,
+    ):
+        """
+        Extrae el precio de un HTML completo. Prueba datos estructurados (sin
+        parsear el árbol) y selectores de la tienda, empezando por el que
+        funcionó más recientemente para esta clave, y al final patrones genéricos.
+        
+        Args:
+            html: HTML crudo de la página
+            domain: Dominio detectado
+            clave: Host usado para el orden adaptativo de niveles
+            tiempos: Si se indica, recibe 'parse_ms' con el tiempo de parseo
+        
+        Returns:
+            Tupla (resultado, documento parseado o None si no hizo falta parsear)
+        """
+        niveles = self._orden_niveles(clave)
+        compiled = self._compiled_for(domain)
+        resultado, doc, registro = self._extraer_html(html, domain, niveles, compiled, tiempos)
+        if registro:
+            self._record_selectors(domain, *registro)
+        return resultado, doc
+    
+    async def extract_html_async(
+        self,
+        html: bytes,
+        domain: str,
+        clave: Optional[str] = None,
+        tiempos: Optional[Dict] = None,
+    ):
+        """
+        Igual que extract_from_html, pero las páginas que superan
+        SCRAPER_EXTRACT_INLINE_BYTES se parsean en el pool de procesos.
+        
+        Args:
+            html: HTML crudo de la página
+            domain: Dominio detectado
+            clave: Host usado para el orden adaptativo de niveles
+            tiempos: Si se indica, recibe 'parse_ms' con el tiempo de parseo
+        
+        Returns:
+            Tupla (resultado, documento parseado o None); el documento es
+            siempre None cuando la extracción se hizo en otro proceso
+        """
+        if self.extractor.should_offload(len(html)):
+            niveles = self._orden_niveles(clave)
+            salida = await self.extractor.extract(html, domain, self._orden_selectores(domain), niveles)
+            if salida is not None:
+                if tiempos is not None and salida['parse_ms'] is not None:
+                    tiempos['parse_ms'] = salida['parse_ms']
+                if salida['fallidos'] is not None:
+                    self._record_selectors(domain, salida['fallidos'], salida['ganador'])
+                return salida['resultado'], None
+        
+        self.extractor.inline += 1
+        return self.extract_from_html(html, domain, clave, tiempos)
+    
+    def _orden_niveles(self, clave: Optional[str]) -> List[str]:
+        """Orden de los niveles de extracción para un host (adaptativo si hay estadísticas)."""
+        niveles = ['structured', 'selector']
+        if self.stats and clave:
+            niveles = self.stats.order_tiers(clave, niveles)
+        return niveles
+    
+    def _extraer_html(
+        self,
+        html: bytes,
+        domain: str,
+        niveles: List[str],
+        compiled: Optional[CompiledSelectors],
+        tiempos: Optional[Dict] = None,
+    ):
+        """
+        Extracción sin efectos secundarios: no toca las estadísticas, de modo
+        que puede ejecutarse en un proceso del pool.
+        
+        Args:
+            html: HTML crudo de la página
+            domain: Dominio detectado
+            niveles: Orden de los niveles ('structured', 'selector')
+            compiled: Selectores de la tienda en el orden a probar
+            tiempos: Si se indica, recibe 'parse_ms' con el tiempo de parseo
+        
+        Returns:
+            Tupla (resultado, documento o None, registro de selectores) donde el
+            registro es (claves fallidas, clave ganadora o None), o None si no
+            se probaron selectores
+        """
+        doc = None
+        registro = None
+        for nivel in niveles:
+            if nivel == 'structured':
+                estructurado = extract_structured_price(html)
+                if estructurado:
+                    precio, fuente = estructurado
+                    print(f"✓ Precio encontrado en datos estructurados ({fuente}): {precio}")
+                    return self._resultado(precio, 'structured', fuente), doc, registro
+            else:
+                # Parsea el HTML con el backend configurado
+                inicio = time.perf_counter()
+                doc = self.parser.parse(html)
+                if tiempos is not None:
+                    tiempos['parse_ms'] = self._ms(inicio)
+                encontrado, registro = self._buscar_selectores(doc, domain, compiled)
+                if encontrado is not None:
+                    return self._resultado(encontrado[0], 'selector', encontrado[1]), doc, registro
+        
+        # Si no funcionó, intenta métodos genéricos
+        print("⚠️  Selectores de dominio fallaron, intentando métodos genéricos...")
+        return self._extract_generic_result(doc), doc, registro
+    
+    def _extract_generic_result(self, doc: ParsedDocument) -> Dict:
+        """Aplica los patrones genéricos y construye el resultado."""
+        precio = self._extract_price_generic(doc)
+        return self._resultado(precio, 'generic' if precio is not None else None)
     
     def _get_domain(self, url: str) -> str:
         """
@@ -189,48 +833,127 @@ class PriceScraper:
         
         return 'generic'
     
-    def _extract_price_by_domain(self, soup: BeautifulSoup, domain: str) -> Optional[float]:
+    def _compiled_for(self, domain: str) -> Optional[CompiledSelectors]:
         """
-        Extrae el precio usando configuraciones específicas del dominio.
+        Devuelve los selectores compilados de una tienda en orden adaptativo
+        (el último que funcionó primero). Cada orden se compila una sola vez.
         
         Args:
-            soup: Objeto BeautifulSoup con el HTML parseado
             domain: Dominio del sitio web
         
         Returns:
-            Precio como float o None
+            Selectores compilados o None si la tienda no tiene configuración
+        """
+        return self._compiled_en_orden(domain, self._orden_selectores(domain))
+    
+    def _orden_selectores(self, domain: str) -> Optional[Tuple[str, ...]]:
+        """Claves de los selectores de la tienda en orden adaptativo (None = orden configurado)."""
+        if domain not in self.domain_configs or not self.stats:
+            return None
+        claves = [selector_key(s) for s in self.domain_configs[domain]['selectors']]
+        return tuple(self.stats.order_selectors(domain, claves))
+    
+    def _compiled_en_orden(self, domain: str, orden: Optional[Tuple[str, ...]]) -> Optional[CompiledSelectors]:
+        """
+        Compila (una sola vez) los selectores de una tienda en el orden indicado.
+        
+        Args:
+            domain: Dominio del sitio web
+            orden: Claves de los selectores, o None para el orden configurado
+        
+        Returns:
+            Selectores compilados o None si la tienda no tiene configuración
         """
         if domain not in self.domain_configs:
             return None
+        if orden is None:
+            return self.compiled_selectors[domain]
+        
+        if orden not in self._compiled_por_orden:
+            por_clave = {selector_key(s): s for s in self.domain_configs[domain]['selectors']}
+            self._compiled_por_orden[orden] = CompiledSelectors([por_clave[clave] for clave in orden])
+        return self._compiled_por_orden[orden]
+    
+    def _record_selectors(self, domain: str, fallidos: List[str], ganador: Optional[str]):
+        """Registra en las estadísticas el resultado de los selectores de una tienda."""
+        if self.stats:
+            self.stats.record_selectors(domain, fallidos, ganador)
+    
+    def _find_by_domain(self, doc: ParsedDocument, domain: str) -> Optional[Tuple[float, str]]:
+        """
+        Busca el precio con los selectores de la tienda y registra el resultado.
+        
+        Args:
+            doc: Documento HTML parseado
+            domain: Dominio del sitio web
+        
+        Returns:
+            Tupla (precio, clave del selector) o None
+        """
+        encontrado, registro = self._buscar_selectores(doc, domain, self._compiled_for(domain))
+        if registro:
+            self._record_selectors(domain, *registro)
+        return encontrado
+    
+    def _buscar_selectores(
+        self,
+        doc: ParsedDocument,
+        domain: str,
+        compiled: Optional[CompiledSelectors],
+    ) -> Tuple[Optional[Tuple[float, str]], Optional[Tuple[List[str], Optional[str]]]]:
+        """
+        Aplica los selectores compilados de la tienda sin registrar nada.
+        
+        Args:
+            doc: Documento HTML parseado
+            domain: Dominio del sitio web
+            compiled: Selectores de la tienda en el orden a probar
+        
+        Returns:
+            Tupla (encontrado, registro): encontrado es (precio, clave del
+            selector) o None; registro es (claves fallidas, clave ganadora o
+            None), o None si la tienda no tiene selectores
+        """
+        if compiled is None:
+            return None, None
         
         config = self.domain_configs[domain]
         
-        # Intenta cada selector configurado
-        for selector in config['selectors']:
-            element = None
-            
-            if 'class' in selector:
-                element = soup.find(class_=selector['class'])
-            elif 'id' in selector:
-                element = soup.find(id=selector['id'])
-            elif 'attrs' in selector:
-                element = soup.find(attrs=selector['attrs'])
-            
-            if element:
-                precio_texto = element.get_text().strip()
-                precio = self._clean_price(precio_texto, config['clean_pattern'])
-                if precio is not None:
-                    print(f"✓ Precio encontrado con selector {selector}: {precio}")
-                    return precio
+        # Un solo recorrido del documento para todos los selectores de la tienda
+        resultado = compiled.find_first(
+            doc,
+            lambda texto: self._clean_price(texto.strip(), config['clean_pattern']),
+        )
+        claves = [selector_key(s) for s in compiled.selectors]
+        if resultado is None:
+            return None, (claves, None)
         
-        return None
+        precio, selector = resultado
+        ganador = selector_key(selector)
+        print(f"✓ Precio encontrado con selector {ganador}: {precio}")
+        # Los selectores con más prioridad que el ganador no produjeron precio
+        return (precio, ganador), (claves[:claves.index(ganador)], ganador)
+    
+    def _extract_price_by_domain(self, doc: ParsedDocument, domain: str) -> Optional[float]:
+        """
+        Extrae el precio usando configuraciones específicas del dominio.
+        
+        Args:
+            doc: Documento HTML parseado
+            domain: Dominio del sitio web
+        
+        Returns:
+            Precio como float o None
+        """
+        encontrado = self._find_by_domain(doc, domain)
+        return encontrado[0] if encontrado else None
     
-    def _extract_price_generic(self, soup: BeautifulSoup) -> Optional[float]:
+    def _extract_price_generic(self, doc: ParsedDocument) -> Optional[float]:
         """
         Intenta extraer el precio usando patrones genéricos.
         
         Args:
-            soup: Objeto BeautifulSoup con el HTML parseado
+            doc: Documento HTML parseado
         
         Returns:
             Precio como float o None
@@ -243,7 +966,7 @@ class PriceScraper:
             r'price[:\s]+\$?\s*(\d+[.,]\d+)',
         ]
         
-        text = soup.get_text()
+        text = doc.get_text()
         
         for pattern in price_patterns:
             matches = re.findall(pattern, text, re.IGNORECASE)
@@ -291,10 +1014,27 @@ class PriceScraper:
 
     def _extract_mercadolibre_item_id(self, url: str) -> Optional[str]:
         """Obtiene el ID del listado de MercadoLibre (MLM/MLA/etc)."""
-        matches = re.findall(r"ML[A-Z]{2}\d+", url.upper())
-        return matches[0] if matches else None
+        # Las URLs de artículo usan el formato MLM-123456; la API espera MLM123456
+        match = re.search(r"(ML[A-Z])-?(\d+)", url.upper())
+        return match.group(1) + match.group(2) if match else None
 
-    def _get_mercadolibre_api_price(self, url: str) -> Optional[float]:
+    @staticmethod
+    def _precio_item_mercadolibre(data: Dict) -> Optional[float]:
+        """Obtiene el precio de la respuesta de /items de MercadoLibre."""
+        price_fields = [
+            data.get('price'),
+            data.get('base_price'),
+            data.get('original_price'),
+        ]
+        # Algunos listados tienen estructura prices.prices[0].amount
+        if not any(price_fields) and isinstance(data.get('prices'), dict):
+            price_entries = data['prices'].get('prices') or []
+            if price_entries:
+                price_fields.append(price_entries[0].get('amount'))
+        price = next((p for p in price_fields if isinstance(p, (int, float)) and p > 0), None)
+        return float(price) if price else None
+    
+    async def _get_mercadolibre_api_price(self, url: str) -> Optional[float]:
         """Consulta la API pública de MercadoLibre para obtener el precio si es posible."""
         item_id = self._extract_mercadolibre_item_id(url)
         if not item_id:
@@ -303,66 +1043,261 @@ class PriceScraper:
         api_url = f"https://api.mercadolibre.com/items/{item_id}"
         print(f"🌐 Consultando API de MercadoLibre: {api_url}")
         try:
-            response = self.session.get(api_url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            price_fields = [
-                data.get('price'),
-                data.get('base_price'),
-                data.get('original_price'),
-            ]
-            # Algunos listados tienen estructura prices.prices[0].amount
-            if not any(price_fields) and isinstance(data.get('prices'), dict):
-                price_entries = data['prices'].get('prices') or []
-                if price_entries:
-                    price_fields.append(price_entries[0].get('amount'))
-            price = next((p for p in price_fields if isinstance(p, (int, float)) and p > 0), None)
+            data = await self.http.get_json(api_url, timeout=10)
+            price = self._precio_item_mercadolibre(data)
             if price is None:
                 print("⚠️ API respondió pero sin precio válido")
-            return float(price) if price else None
-        except requests.RequestException as exc:
+            return price
+        except (httpx.HTTPError, ValueError) as exc:
             print(f"❌ Error al consultar API de MercadoLibre: {exc}")
             return None
     
-    async def test_url(self, url: str) -> Dict:
+    async def _get_mercadolibre_api_batch(self, item_ids: List[str]) -> Dict[str, Optional[float]]:
+        """
+        Consulta varios listados en una sola petición multi-get (/items?ids=...).
+        
+        Args:
+            item_ids: Hasta 20 IDs de MercadoLibre
+        
+        Returns:
+            Diccionario {item_id: precio o None}
+        """
+        api_url = (
+            f"https://api.mercadolibre.com/items?ids={','.join(item_ids)}"
+            "&attributes=id,price,base_price,original_price,prices"
+        )
+        print(f"🌐 Consultando API de MercadoLibre en lote ({len(item_ids)} artículos)")
+        precios: Dict[str, Optional[float]] = dict.fromkeys(item_ids)
+        try:
+            data = await self.http.get_json(api_url, timeout=10)
+        except (httpx.HTTPError, ValueError) as exc:
+            print(f"❌ Error al consultar API de MercadoLibre en lote: {exc}")
+            return precios
+        
+        # Cada elemento llega como {"code": 200, "body": {...}}
+        for entrada in data if isinstance(data, list) else []:
+            if not isinstance(entrada, dict):
+                continue
+            body = entrada.get('body')
+            if entrada.get('code') != 200 or not isinstance(body, dict):
+                continue
+            item_id = str(body.get('id', '')).upper()
+            if item_id in precios:
+                precios[item_id] = self._precio_item_mercadolibre(body)
+        return precios
+    
+    async def get_mercadolibre_prices(self, urls: List[str]) -> Dict[str, Optional[float]]:
+        """
+        Resuelve en lote los precios de las URLs de MercadoLibre usando la API
+        multi-get, con una petición por cada grupo de hasta 20 IDs.
+        
+        Args:
+            urls: URLs de productos (las que no son de MercadoLibre se ignoran)
+        
+        Returns:
+            Diccionario {url: precio o None} para cada URL de MercadoLibre con ID;
+            None indica que el lote no pudo resolverla
+        """
+        ids_por_url = {}
+        for url in urls:
+            if self._get_domain(url) == 'mercadolibre':
+                item_id = self._extract_mercadolibre_item_id(url)
+                if item_id:
+                    ids_por_url[url] = item_id
+        
+        ids = list(dict.fromkeys(ids_por_url.values()))
+        lotes = [ids[i:i + self.ml_batch_size] for i in range(0, len(ids), self.ml_batch_size)]
+        precios_por_id: Dict[str, Optional[float]] = {}
+        for precios in await asyncio.gather(*(self._get_mercadolibre_api_batch(lote) for lote in lotes)):
+            precios_por_id.update(precios)
+        
+        resueltos = sum(1 for precio in precios_por_id.values() if precio is not None)
+        if ids:
+            print(f"✅ API de MercadoLibre en lote: {resueltos}/{len(ids)} artículos con precio")
+        return {url: precios_por_id.get(item_id) for url, item_id in ids_por_url.items()}
+    
+    async def get_prices(self, urls: List[str], scheduler: Optional[DomainScheduler] = None) -> List:
+        """
+        Extrae los precios de varias URLs (actualizaciones masivas).
+        Los productos de MercadoLibre se resuelven primero en lote con la API;
+        el resto, y los que el lote no resolvió, pasan por get_price_info
+        respetando los límites por dominio del programador.
+        
+        Args:
+            urls: URLs de productos
+            scheduler: Programador por dominio (por defecto el compartido)
+        
+        Returns:
+            Lista en el mismo orden que urls con el precio, None o la excepción;
+            las variantes de una misma URL canónica comparten resultado
+        """
+        scheduler = scheduler or get_domain_scheduler()
+        
+        # Una sola extracción por URL canónica; las frescas salen de la caché compartida
+        por_clave = {}
+        unicas = {}
+        for url in urls:
+            clave = canonical_url(url)
+            if clave in por_clave or clave in unicas:
+                continue
+            guardado = self.results.lookup(url) if self.results else None
+            if guardado is not None:
+                por_clave[clave] = guardado['precio']
+            else:
+                unicas[clave] = url
+        
+        precios_api = await self.get_mercadolibre_prices(list(unicas.values()))
+        for url, precio in precios_api.items():
+            if precio is not None:
+                por_clave[canonical_url(url)] = precio
+                if self.results:
+                    self.results.store(url, self._resultado(precio, 'api', 'mercadolibre-multiget'))
+        
+        pendientes = [url for url in unicas.values() if precios_api.get(url) is None]
+        extraidos = await scheduler.map(
+            pendientes,
+            key=domain_key,
+            # La API ya se intentó en el lote: solo queda Playwright / HTML
+            func=lambda url: self.get_price_info(url, use_api=url not in precios_api),
+        )
+        for url, resultado in zip(pendientes, extraidos):
+            por_clave[canonical_url(url)] = resultado if isinstance(resultado, Exception) else resultado['precio']
+        
+        return [por_clave[canonical_url(url)] for url in urls]
+    
+    async def test_url(self, url: str, race: bool = False) -> Dict:
         """
         Prueba una URL y retorna información de diagnóstico.
+        Recorre la misma escalera que get_price (circuito abierto, render
+        desactivado y orden aprendido incluidos) y desglosa el tiempo de cada
+        estrategia y de cada fase de la descarga (DNS, conexión, primer byte,
+        descarga, parseo y extracción).
         
         Args:
             url: URL a probar
+            race: Correr las estrategias en paralelo (menor latencia; solo
+                informa el tiempo total, sin desglose por fase)
         
         Returns:
-            Diccionario con información de la prueba
+            Diccionario con información de la prueba, el nivel que obtuvo el
+            precio, los bytes descargados y los tiempos en milisegundos
         """
+        if race:
+            return await self._test_url_carrera(url)
+        
         resultado = {
             'url': url,
             'accesible': False,
             'precio': None,
             'error': None,
-            'domain': self._get_domain(url)
+            'domain': self._get_domain(url),
+            'tier': None,
+            'detalle': None,
+            'status_code': None,
+            'bytes': 0,
+            'tiempos': {},
         }
+        tiempos = resultado['tiempos']
+        inicio = time.perf_counter()
+        # Las fases de la escalera anotan sus tiempos en el diagnóstico
+        token = _diagnostico.set(resultado)
         
         try:
-            # Realiza la petición HTTP usando la sesión
-            response = self.session.get(url, timeout=15, allow_redirects=True)
-            resultado['accesible'] = response.status_code == 200
+            tiempos['dns_ms'] = await self._medir_dns(url)
+            # Misma escalera que get_price: circuito, API, HTTP, cookies y render (si está activo)
+            extraccion = await self._fetch_price_info(url)
+            resultado.update(precio=extraccion['precio'], tier=extraccion['tier'], detalle=extraccion['detalle'])
             
-            if resultado['accesible']:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                precio = await self.get_price(url)
-                resultado['precio'] = precio
-                
-                if precio is None:
-                    resultado['error'] = "No se pudo extraer el precio del HTML"
+            if resultado['precio'] is not None:
+                resultado.update(accesible=True, error=None)
+                if self.results:
+                    # El diagnóstico ya hizo el scrape: queda disponible para todos
+                    self.results.store(url, extraccion)
+            elif resultado['status_code'] not in (None, 200):
+                resultado['error'] = f"Código de estado: {resultado['status_code']}"
             else:
-                resultado['error'] = f"Código de estado: {response.status_code}"
+                resultado['accesible'] = resultado['status_code'] == 200
+                resultado['error'] = extraccion['detalle'] or "No se pudo extraer el precio del HTML"
                 
-        except requests.RequestException as e:
+        except RenderRejected:
+            # Sin turno de render: la API responde 503 con Retry-After
+            raise
+        except httpx.HTTPError as e:
             resultado['error'] = str(e)
         except Exception as e:
             resultado['error'] = f"Error inesperado: {str(e)}"
+        finally:
+            tiempos['total_ms'] = self._ms(inicio)
+            _diagnostico.reset(token)
         
         return resultado
+    
+    async def _test_url_carrera(self, url: str) -> Dict:
+        """
+        Diagnóstico de una URL en modo carrera (ver _carrera).
+        
+        Args:
+            url: URL a probar
+        
+        Returns:
+            Diccionario con el mismo formato que test_url; 'tiempos' solo
+            trae 'race_ms' y 'total_ms'
+        """
+        inicio = time.perf_counter()
+        extraccion = await self.get_price_info(url, race=True)
+        ms = self._ms(inicio)
+        precio = extraccion['precio']
+        return {
+            'url': url,
+            'accesible': precio is not None,
+            'precio': precio,
+            'error': None if precio is not None else (extraccion['detalle'] or "No se pudo extraer el precio"),
+            'domain': self._get_domain(url),
+            'tier': extraccion['tier'],
+            'detalle': extraccion['detalle'],
+            'status_code': None,
+            'bytes': 0,
+            'tiempos': {'race_ms': ms, 'total_ms': ms},
+        }
+    
+    @staticmethod
+    def _ms(desde: float) -> float:
+        """Milisegundos transcurridos desde una marca de perf_counter."""
+        return round((time.perf_counter() - desde) * 1000, 2)
+    
+    async def _medir_dns(self, url: str) -> Optional[float]:
+        """
+        Mide la resolución DNS del host (None si no aplica o falla).
+        Con un transporte alternativo (pruebas) no hay red real que medir.
+        """
+        parsed = urlparse(url)
+        if self.http.transport is not None or not parsed.hostname:
+            return None
+        t0 = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().getaddrinfo(
+                parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80)
+            )
+        except OSError:
+            return None
+        return self._ms(t0)
+    
+    @staticmethod
+    def _duracion_conexion(marcas: Dict[str, float]) -> Optional[float]:
+        """
+        Calcula el tiempo de conexión TCP + TLS a partir de los eventos 'trace'.
+        
+        Returns:
+            Milisegundos, 0.0 si se reutilizó una conexión del pool, o None si
+            el transporte no emite eventos
+        """
+        inicio = marcas.get('connection.connect_tcp.started')
+        fin = marcas.get('connection.start_tls.complete') or marcas.get('connection.connect_tcp.complete')
+        if inicio and fin:
+            return round((fin - inicio) * 1000, 2)
+        if any(evento.startswith(('http11.', 'http2.')) for evento in marcas):
+            return 0.0
+        return None
 
 
 # Función auxiliar para uso rápido
@@ -4,155 +4,296 @@ Renderiza JavaScript como un navegador real
 
 Author: HellSpawn
 """
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
-from bs4 import BeautifulSoup
+from playwright.async_api import TimeoutError as PlaywrightTimeout
+import os
 import re
-from typing import Optional
+import time
+from typing import Dict, List, Optional
 import asyncio
 
+from src.browser_pool import CONTEXT_OPTIONS, BrowserPool, get_browser_pool
+from src.html_parser import ParsedDocument, get_parser_backend
+from src.rate_limiter import domain_key
+from src.render_admission import RenderAdmission, RenderRejected, get_render_admission
+from src.selector_engine import CompiledSelectors
+from src.structured_data import extract_structured_price
+
+# Selectores de precio de MercadoLibre, compilados una sola vez al importar
+MERCADOLIBRE_SELECTORS = CompiledSelectors([
+    {'class': 'andes-money-amount__fraction'},
+    {'class': 'price-tag-fraction'},
+    {'class': 'ui-pdp-price__second-line__main-price'},
+    {'class': 'price-tag-amount'},
+    {'class': 'ui-pdp-price__part'},
+    {'attrs': {'data-testid': 'price-part'}},
+])
+
+# Modo ligero: tipos de recurso que no aportan al precio y se bloquean
+BLOCKED_RESOURCE_TYPES = frozenset(
+    t.strip() for t in os.getenv(
+        "PLAYWRIGHT_BLOCKED_RESOURCES", "image,media,font,stylesheet,texttrack,manifest,other"
+    ).split(",") if t.strip()
+)
+
+# Analítica y publicidad: scripts que nunca pintan el precio
+BLOCKED_URL_PATTERNS = re.compile(
+    r'google-analytics\.com|googletagmanager\.com|doubleclick\.net|googlesyndication\.com'
+    r'|facebook\.net|hotjar\.com|newrelic\.com|nr-data\.net|criteo\.|taboola\.com|clarity\.ms'
+)
+
 
 class PlaywrightScraper:
     """Scraper que usa Playwright para renderizar JavaScript"""
     
-    def __init__(self):
-        """Inicializa el scraper con Playwright"""
-        self.playwright = None
-        self.browser = None
-        self.context = None
+    def __init__(self, pool: Optional[BrowserPool] = None, admission: Optional[RenderAdmission] = None):
+        """
+        Inicializa el scraper sobre el pool de navegadores
+        
+        Args:
+            pool: Pool de navegadores a usar (por defecto, el compartido del proceso)
+            admission: Control de admisión de renders (por defecto, el compartido)
+        """
+        self.pool = pool
+        self.admission = admission or get_render_admission()
+        self.parser = get_parser_backend()
+        # Modo ligero: bloqueo de recursos y esperas guiadas por selector
+        self.lean = os.getenv("PLAYWRIGHT_LEAN_MODE", "True") == "True"
+        self.timeout_ms = int(os.getenv("PLAYWRIGHT_NAV_TIMEOUT_MS", "15000"))
+        self.selector_timeout_ms = int(os.getenv("PLAYWRIGHT_SELECTOR_TIMEOUT_MS", "8000"))
+        self.ultima_carga: Optional[Dict] = None
+        # Cookies del último render con capturar_sesion=True
+        self.ultima_sesion: Optional[List[Dict]] = None
         
     async def __aenter__(self):
-        """Context manager entry"""
-        print("🎬 [Playwright] Iniciando playwright...")
-        self.playwright = await async_playwright().start()
-        print("🎬 [Playwright] Lanzando navegador Chromium...")
-        # Lanzar navegador en modo headless
-        self.browser = await self.playwright.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--no-sandbox',
-                '--disable-dev-shm-usage',
-            ]
-        )
-        print("🎬 [Playwright] Creando contexto del navegador...")
-        # Crear contexto con configuración de navegador real
-        self.context = await self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            locale='es-MX',
-            timezone_id='America/Mexico_City',
-        )
-        print("✅ [Playwright] Contexto creado exitosamente")
+        """Context manager entry: asegura que el navegador del pool esté lanzado"""
+        if self.pool is None:
+            self.pool = get_browser_pool()
+        await self.pool.start()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Context manager exit"""
-        if self.context:
-            await self.context.close()
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+        """Context manager exit: el navegador sigue vivo en el pool"""
+        return None
     
-    async def get_price(self, url: str) -> Optional[float]:
+    async def get_price(
+        self,
+        url: str,
+        selectores: Optional[CompiledSelectors] = MERCADOLIBRE_SELECTORS,
+        capturar_sesion: bool = False,
+        clean_pattern: str = r'[^\d,.]',
+        regex_fallback: bool = True,
+    ) -> Optional[float]:
         """
         Extrae el precio de una URL usando Playwright
         
+        En modo ligero (PLAYWRIGHT_LEAN_MODE) bloquea imágenes, fuentes, estilos,
+        analítica y publicidad, navega solo hasta DOMContentLoaded y termina en
+        cuanto hay datos estructurados o aparece un selector de precio.
+        
         Args:
             url: URL de la página del producto
+            selectores: Selectores de precio de la tienda (por defecto los de
+                MercadoLibre; None para usar solo datos estructurados y regex)
+            capturar_sesion: Guardar en ultima_sesion las cookies que dejó la
+                página (retos de JavaScript, consentimiento) para reutilizarlas por HTTP
+            clean_pattern: Patrón de limpieza del precio de la tienda
+            regex_fallback: Buscar importes en $ / pesos en el texto si ningún
+                selector encuentra el precio (solo tiene sentido en MercadoLibre)
         
         Returns:
             Precio como float o None si no se pudo extraer
+        
+        Raises:
+            RenderRejected: Si no hubo turno de render (cola llena o espera agotada)
         """
         try:
             print(f"🌐 [Playwright] Navegando a: {url}")
+            inicio = time.perf_counter()
+            carga = {'bloqueadas': 0, 'bytes_cargados': 0}
             
-            page = await self.context.new_page()
+            # Esperar turno (cola acotada) y tomar una página prestada del pool
+            clave = domain_key(url)
+            async with self.admission.slot(), self.pool.page(clave) as page:
+                if self.lean:
+                    await page.route('**/*', lambda route: self._filtrar_recurso(route, carga))
+                medidor = await self._medir_bytes(page, carga)
+                try:
+                    html = await self._renderizar(page, url, selectores)
+                    if capturar_sesion or self.pool.sessions.needs_refresh(clave):
+                        await self._guardar_sesion(page, clave, capturar_sesion)
+                finally:
+                    if self.lean:
+                        await page.unroute('**/*')
+                    if medidor is not None:
+                        await medidor.detach()
             
-            # Navegar a la URL
-            await page.goto(url, wait_until='networkidle', timeout=30000)
+            ms = round((time.perf_counter() - inicio) * 1000, 1)
+            self.ultima_carga = {'modo': 'ligero' if self.lean else 'completo', 'ms': ms, **carga}
+            self.pool.record_render(ms, carga['bloqueadas'], carga['bytes_cargados'])
+            print(f"⏱️  [Playwright] Render en {ms} ms, {carga['bloqueadas']} peticiones bloqueadas, "
+                  f"{carga['bytes_cargados']} bytes cargados")
             
-            print(f"✓ Página cargada: {await page.title()}")
+            # Datos estructurados primero: evitan parsear el árbol renderizado
+            estructurado = extract_structured_price(html)
+            if estructurado:
+                print(f"💰 Precio encontrado en datos estructurados ({estructurado[1]}): ${estructurado[0]}")
+                return estructurado[0]
             
-            # Esperar a que el precio se cargue
-            try:
-                # Esperar por selectores comunes de precio en MercadoLibre
-                await page.wait_for_selector(
-                    '.andes-money-amount__fraction, .price-tag-fraction, .ui-pdp-price__part',
-                    timeout=10000
-                )
-                print("✓ Elemento de precio encontrado")
-            except PlaywrightTimeout:
-                print("⚠️  Timeout esperando elemento de precio")
-            
-            # Esperar un momento adicional para que todo cargue
-            await asyncio.sleep(2)
-            
-            # Obtener el HTML renderizado
-            html = await page.content()
-            
-            # Cerrar la página
-            await page.close()
-            
-            # Parsear con BeautifulSoup
-            soup = BeautifulSoup(html, 'html.parser')
+            # Parsear con el backend configurado
+            doc = self.parser.parse(html)
             
             # Intentar extraer el precio
-            precio = self._extract_price_mercadolibre(soup)
+            precio = self._extract_price(doc, selectores, clean_pattern, regex_fallback)
             
             if precio:
                 print(f"💰 Precio encontrado: ${precio}")
             else:
                 print("❌ No se pudo extraer el precio")
                 # Debug: mostrar primeros caracteres
-                text = soup.get_text()[:500]
+                text = doc.get_text()[:500]
                 print(f"📄 Primeros 500 caracteres: {text}")
             
             return precio
             
+        except RenderRejected:
+            # El llamador decide (503 con Retry-After en la API)
+            raise
         except Exception as e:
             print(f"❌ Error en Playwright scraper: {e}")
             import traceback
             print(traceback.format_exc())
             return None
     
-    def _extract_price_mercadolibre(self, soup: BeautifulSoup) -> Optional[float]:
+    async def _guardar_sesion(self, page, clave: str, capturar_sesion: bool):
+        """
+        Guarda el storage state del contexto (cookies y localStorage) para que
+        los contextos nuevos de la tienda no repitan la primera visita.
+        
+        Args:
+            page: Página recién renderizada
+            clave: Tienda de la URL
+            capturar_sesion: Dejar además las cookies en ultima_sesion
+        """
+        try:
+            estado = await page.context.storage_state()
+        except Exception as e:
+            print(f"⚠️  [Playwright] No se pudo leer el storage state de {clave}: {e}")
+            return
+        cookies = estado.get('cookies', [])
+        self.pool.sessions.put(clave, cookies, CONTEXT_OPTIONS['user_agent'], estado.get('origins', []))
+        if capturar_sesion:
+            self.ultima_sesion = cookies
+        print(f"🍪 [Playwright] Sesión de {clave} guardada ({len(cookies)} cookies)")
+    
+    async def _renderizar(self, page, url: str, selectores: Optional[CompiledSelectors]) -> str:
+        """
+        Navega a la URL y espera lo mínimo necesario para tener el precio
+        
+        Args:
+            page: Página prestada por el pool
+            url: URL del producto
+            selectores: Selectores cuya aparición indica que el precio ya está
+        
+        Returns:
+            HTML renderizado
+        """
+        if not self.lean:
+            # Modo completo: esperar a que la red quede inactiva
+            await page.goto(url, wait_until='networkidle', timeout=30000)
+            print(f"✓ Página cargada: {await page.title()}")
+            if selectores is not None:
+                try:
+                    await page.wait_for_selector(selectores.css, timeout=10000)
+                    print("✓ Elemento de precio encontrado")
+                except PlaywrightTimeout:
+                    print("⚠️  Timeout esperando elemento de precio")
+            # Esperar un momento adicional para que todo cargue
+            await asyncio.sleep(2)
+            return await page.content()
+        
+        await page.goto(url, wait_until='domcontentloaded', timeout=self.timeout_ms)
+        print(f"✓ DOM cargado: {await page.title()}")
+        
+        # El HTML inicial suele traer JSON-LD / metaetiquetas con el precio
+        html = await page.content()
+        if extract_structured_price(html):
+            return html
+        
+        # Si no, basta con que el primer selector de precio aparezca
+        try:
+            if selectores is not None:
+                await page.wait_for_selector(selectores.css, timeout=self.selector_timeout_ms)
+                print("✓ Elemento de precio encontrado")
+            else:
+                # Tienda sin selectores conocidos: esperar a que termine la carga
+                await page.wait_for_load_state('load', timeout=self.selector_timeout_ms)
+        except PlaywrightTimeout:
+            print("⚠️  Timeout esperando elemento de precio")
+        return await page.content()
+    
+    @staticmethod
+    async def _filtrar_recurso(route, carga: Dict):
+        """Aborta las peticiones que no aportan al precio (modo ligero)"""
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or BLOCKED_URL_PATTERNS.search(request.url):
+            carga['bloqueadas'] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+    
+    @staticmethod
+    async def _medir_bytes(page, carga: Dict):
+        """
+        Suma los bytes transferidos por la página con el protocolo DevTools
+        
+        Returns:
+            Sesión CDP (para cerrarla al terminar) o None si no está disponible
+        """
+        try:
+            sesion = await page.context.new_cdp_session(page)
+            await sesion.send('Network.enable')
+        except Exception:
+            return None
+        
+        def al_terminar(evento: Dict):
+            carga['bytes_cargados'] += int(evento.get('encodedDataLength', 0))
+        
+        sesion.on('Network.loadingFinished', al_terminar)
+        return sesion
+    
+    def _extract_price(
+        self,
+        doc: ParsedDocument,
+        selectores: Optional[CompiledSelectors] = MERCADOLIBRE_SELECTORS,
+        clean_pattern: str = r'[^\d,.]',
+        regex_fallback: bool = True,
+    ) -> Optional[float]:
         """
-        Extrae el precio de MercadoLibre del HTML renderizado
+        Extrae el precio del HTML renderizado con los selectores de la tienda
         
         Args:
-            soup: BeautifulSoup object
+            doc: Documento HTML parseado
+            selectores: Selectores de la tienda, o None para usar solo regex
+            clean_pattern: Patrón de limpieza del precio de la tienda
+            regex_fallback: Buscar importes en $ / pesos en el texto (MercadoLibre)
         
         Returns:
             Precio como float o None
         """
-        # Lista de selectores para probar
-        selectors = [
-            {'class': 'andes-money-amount__fraction'},
-            {'class': 'price-tag-fraction'},
-            {'class': 'ui-pdp-price__second-line__main-price'},
-            {'class': 'price-tag-amount'},
-            {'class': 'ui-pdp-price__part'},
-            {'attrs': {'data-testid': 'price-part'}},
-        ]
+        # Un solo recorrido del documento para todos los selectores
+        resultado = selectores.find_first(
+            doc, lambda texto: self._clean_price(texto.strip(), clean_pattern)
+        ) if selectores else None
+        if resultado:
+            precio, selector = resultado
+            print(f"✓ Precio extraído con selector {selector}: ${precio}")
+            return precio
         
-        for selector in selectors:
-            element = None
-            
-            if 'class' in selector:
-                element = soup.find(class_=selector['class'])
-            elif 'attrs' in selector:
-                element = soup.find(attrs=selector['attrs'])
-            
-            if element:
-                precio_texto = element.get_text().strip()
-                precio = self._clean_price(precio_texto)
-                if precio and precio > 0:
-                    print(f"✓ Precio extraído con selector {selector}: ${precio}")
-                    return precio
+        if not regex_fallback:
+            return None
         
-        # Intento genérico con regex
-        text = soup.get_text()
+        # Intento con regex sobre importes en pesos
+        text = doc.get_text()
         patterns = [
             r'\$\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',
             r'(\d{1,3}(?:,\d{3})*)\s*pesos',
@@ -169,19 +310,20 @@ class PlaywrightScraper:
         
         return None
     
-    def _clean_price(self, precio_texto: str) -> Optional[float]:
+    def _clean_price(self, precio_texto: str, pattern: str = r'[^\d,.]') -> Optional[float]:
         """
         Limpia y convierte texto de precio a float
         
         Args:
             precio_texto: Texto con el precio
+            pattern: Patrón regex para limpiar caracteres no deseados
         
         Returns:
             Precio como float o None
         """
         try:
-            # Eliminar todo excepto números, comas y puntos
-            precio_limpio = re.sub(r'[^\d,.]', '', precio_texto)
+            # Eliminar lo que indique el patrón de la tienda (por defecto todo excepto números, comas y puntos)
+            precio_limpio = re.sub(pattern, '', precio_texto)
             
             # Manejar separadores
             if ',' in precio_limpio and '.' in precio_limpio:
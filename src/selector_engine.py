@@ -0,0 +1,137 @@
+"""
+Motor de selectores compilados para el Price Tracker.
+Compila la lista de selectores de una tienda en un único matcher
+(índices por clase / id / atributos, y una consulta CSS combinada) para
+encontrar el mejor candidato de precio en un solo recorrido del documento,
+en lugar de un soup.find completo por selector.
+
+Author: HellSpawn
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def _quote(valor: str) -> str:
+    """Entrecomilla un literal para CSS."""
+    if '"' in valor:
+        raise ValueError(f"Selector con comillas no soportado: {valor}")
+    return f'"{valor}"'
+
+
+def _css(selector: Dict) -> str:
+    """Traduce un selector de domain_configs a CSS."""
+    if 'class' in selector:
+        return f".{selector['class']}"
+    if 'id' in selector:
+        return f"#{selector['id']}"
+    if 'attrs' in selector:
+        return ''.join(f'[{nombre}={_quote(valor)}]' for nombre, valor in selector['attrs'].items())
+    raise ValueError(f"Selector no soportado: {selector}")
+
+
+def selector_key(selector: Dict) -> str:
+    """
+    Clave legible y estable de un selector (su forma CSS), usada para
+    identificarlo en estadísticas y diagnósticos.
+
+    Args:
+        selector: Selector de domain_configs
+
+    Returns:
+        Selector en notación CSS (ej: '.a-price-whole', '#prcIsum')
+    """
+    return _css(selector)
+
+
+class CompiledSelectors:
+    """Conjunto de selectores de una tienda compilado en una sola consulta."""
+
+    def __init__(self, selectors: List[Dict]):
+        """
+        Compila los selectores.
+
+        Args:
+            selectors: Lista ordenada por prioridad ({'class': ...}, {'id': ...}, {'attrs': {...}})
+        """
+        self.selectors = list(selectors)
+        # Consulta combinada para backends con motor de selectores en C
+        self.css = ', '.join(_css(s) for s in self.selectors)
+
+        # Índices para clasificar cada coincidencia sin volver a recorrer el árbol
+        self._por_clase: Dict[str, List[int]] = {}
+        self._por_id: Dict[str, List[int]] = {}
+        self._por_attrs: List[Tuple[int, Tuple[Tuple[str, str], ...]]] = []
+        for indice, selector in enumerate(self.selectors):
+            if 'class' in selector:
+                self._por_clase.setdefault(selector['class'], []).append(indice)
+            elif 'id' in selector:
+                self._por_id.setdefault(selector['id'], []).append(indice)
+            elif 'attrs' in selector:
+                self._por_attrs.append((indice, tuple(selector['attrs'].items())))
+
+        # Prefiltro rápido para backends que recorren el árbol desde Python
+        self.class_names = frozenset(self._por_clase)
+        self.ids = frozenset(self._por_id)
+        self.attr_names = tuple({nombre for _, pares in self._por_attrs for nombre, _ in pares})
+
+    def indices(self, get: Callable[[str], Optional[str]]) -> List[int]:
+        """
+        Devuelve los índices de los selectores que cumple un elemento.
+
+        Args:
+            get: Función que devuelve el valor de un atributo del elemento
+
+        Returns:
+            Índices (prioridades) de los selectores que coinciden
+        """
+        indices = []
+        clases = get('class')
+        if clases:
+            for clase in clases.split():
+                indices.extend(self._por_clase.get(clase, ()))
+        element_id = get('id')
+        if element_id:
+            indices.extend(self._por_id.get(element_id, ()))
+        for indice, pares in self._por_attrs:
+            if all(get(nombre) == valor for nombre, valor in pares):
+                indices.append(indice)
+        return indices
+
+    def find_first(
+        self,
+        doc,
+        convert: Callable[[str], Optional[float]],
+    ) -> Optional[Tuple[float, Dict]]:
+        """
+        Busca el precio en un único recorrido del documento.
+
+        Conserva la semántica de probar los selectores en orden: para cada
+        selector solo cuenta su primera coincidencia, y gana el selector de
+        mayor prioridad cuyo texto se convierte en un precio válido.
+
+        Args:
+            doc: Documento parseado (ver src.html_parser)
+            convert: Función que convierte el texto del elemento en precio (o None)
+
+        Returns:
+            Tupla (precio, selector) o None si ningún selector produjo precio
+        """
+        total = len(self.selectors)
+        resueltos: Dict[int, Optional[float]] = {}
+
+        for indices, text in doc.iter_matches(self):
+            for indice in indices:
+                if indice in resueltos:
+                    continue
+                resueltos[indice] = convert(text())
+
+            # Corte temprano: el primer selector sin resolver decide si seguir
+            for indice in range(total):
+                if indice not in resueltos:
+                    break
+                if resueltos[indice] is not None:
+                    return resueltos[indice], self.selectors[indice]
+
+        for indice in range(total):
+            if resueltos.get(indice) is not None:
+                return resueltos[indice], self.selectors[indice]
+        return None
@@ -0,0 +1,171 @@
+"""
+Extracción de precios en streaming para el Price Tracker.
+Alimenta un parser HTML incremental (lxml) con los fragmentos de la
+descarga y permite cortarla en cuanto los datos estructurados (JSON-LD,
+metaetiquetas, microdatos) o un selector de la tienda producen un precio,
+con un límite duro de bytes para proteger la memoria.
+
+Author: HellSpawn
+"""
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.html_parser import LxmlDocument
+from src.selector_engine import CompiledSelectors, selector_key
+from src.structured_data import price_from_element
+
+
+def max_download_bytes() -> int:
+    """Límite de bytes descargados por página (SCRAPER_MAX_DOWNLOAD_BYTES)."""
+    return int(os.getenv("SCRAPER_MAX_DOWNLOAD_BYTES", str(3 * 1024 * 1024)))
+
+
+class StreamingExtractor:
+    """Parser incremental que busca el precio a medida que llegan los bytes."""
+
+    def __init__(
+        self,
+        compiled: Optional[CompiledSelectors],
+        convert: Callable[[str], Optional[float]],
+        max_bytes: Optional[int] = None,
+        encoding: Optional[str] = None,
+    ):
+        """
+        Inicializa el extractor.
+
+        Args:
+            compiled: Selectores compilados de la tienda (None para sitios genéricos)
+            convert: Función que convierte el texto de un elemento en precio
+            max_bytes: Bytes máximos a procesar antes de cortar la descarga
+            encoding: Codificación declarada por la respuesta HTTP
+        """
+        from lxml import etree
+        import lxml.html
+
+        self.compiled = compiled
+        self.convert = convert
+        self.max_bytes = max_bytes or max_download_bytes()
+        self.bytes_read = 0
+        self.truncated = False
+        self.result: Optional[Tuple[float, str, str]] = None
+
+        self._parser = etree.HTMLPullParser(events=('end',), encoding=encoding or 'utf-8')
+        # Elementos de lxml.html para tener text_content() como en LxmlBackend
+        self._parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+        self._root = None
+        # Índice de selector -> precio de su primera coincidencia (None si no convirtió)
+        self._resueltos: Dict[int, Optional[float]] = {}
+
+    @property
+    def done(self) -> bool:
+        """Indica si ya no hace falta seguir descargando."""
+        return self.result is not None or self.truncated
+
+    def feed(self, chunk: bytes) -> Optional[Tuple[float, str, str]]:
+        """
+        Procesa un fragmento de la descarga.
+
+        Args:
+            chunk: Bytes recibidos
+
+        Returns:
+            Tupla (precio, tier, detalle) en cuanto hay un precio seguro: tier
+            'structured' con la fuente, o 'selector' cuando el selector de mayor
+            prioridad aún pendiente dio precio (como find_first)
+        """
+        if self.done:
+            return self.result
+        restante = self.max_bytes - self.bytes_read
+        if len(chunk) >= restante:
+            chunk = chunk[:restante]
+            self.truncated = True
+        self.bytes_read += len(chunk)
+        self._parser.feed(chunk)
+        self._procesar_eventos()
+        if self.truncated:
+            self.finish()
+        return self.result
+
+    def _procesar_eventos(self):
+        """Revisa los elementos cerrados desde la última llamada."""
+        for _, element in self._parser.read_events():
+            if self.result is not None:
+                return
+            if not isinstance(element.tag, str):
+                continue
+            # Los datos estructurados cortan la descarga en cuanto aparecen
+            if element.tag in ('script', 'meta') or element.get('itemprop'):
+                estructurado = price_from_element(element.tag, element.get, element.text)
+                if estructurado:
+                    self.result = (estructurado[0], 'structured', estructurado[1])
+                    return
+            if self.compiled is None:
+                continue
+            nuevos = [i for i in self.compiled.indices(element.get) if i not in self._resueltos]
+            if not nuevos:
+                continue
+            # Como en find_first: solo cuenta la primera coincidencia de cada selector
+            precio = self.convert(element.text_content())
+            for indice in nuevos:
+                self._resueltos[indice] = precio
+            self._elegir(final=False)
+
+    def _elegir(self, final: bool):
+        """
+        Fija el resultado con la prioridad de los selectores.
+
+        Args:
+            final: Si ya no llegarán más elementos; si no, solo se decide cuando
+                todos los selectores de mayor prioridad ya se resolvieron sin precio
+        """
+        for indice in range(len(self.compiled.selectors)):
+            if indice not in self._resueltos:
+                if not final:
+                    return
+                continue
+            if self._resueltos[indice] is not None:
+                self.result = (
+                    self._resueltos[indice], 'selector', selector_key(self.compiled.selectors[indice])
+                )
+                return
+
+    def finish(self) -> Optional[Tuple[float, str, str]]:
+        """
+        Termina el parseo (fin de la descarga o límite de bytes) y, si no hubo
+        corte temprano, elige el selector de mayor prioridad que dio precio.
+
+        Returns:
+            Tupla (precio, tier, detalle) o None
+        """
+        if self._root is None:
+            try:
+                self._root = self._parser.close()
+            except Exception:
+                self._root = None
+            self._procesar_eventos()
+        if self.result is None and self.compiled is not None:
+            self._elegir(final=True)
+        return self.result
+
+    def failed_selectors(self) -> List[str]:
+        """
+        Claves de los selectores que no dieron precio por delante del ganador
+        (o todos si ninguno ganó), para las estadísticas adaptativas.
+        """
+        if self.compiled is None:
+            return []
+        claves = [selector_key(s) for s in self.compiled.selectors]
+        if self.result is not None and self.result[1] == 'selector':
+            return claves[:claves.index(self.result[2])]
+        return claves
+
+    def document(self) -> LxmlDocument:
+        """
+        Cierra el parser y devuelve lo recibido como documento completo,
+        para aplicar los métodos genéricos sin volver a parsear.
+        """
+        self.finish()
+        if self._root is None:
+            import lxml.html
+            self._root = lxml.html.document_fromstring('<html></html>')
+        return LxmlDocument(self._root)
@@ -0,0 +1,268 @@
+"""
+Extracción de precios desde datos estructurados para el Price Tracker.
+Busca el precio en JSON-LD, metaetiquetas OpenGraph / product, microdatos
+y estado embebido (__NEXT_DATA__, __PRELOADED_STATE__) con escaneos
+dirigidos sobre el HTML crudo, sin construir el árbol completo.
+
+Author: HellSpawn
+"""
+import json
+import re
+from typing import Any, Callable, Optional, Tuple, Union
+
+_JSON_LD = re.compile(
+    r'<script[^>]*type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL,
+)
+_META = re.compile(r'<meta\b[^>]*>', re.IGNORECASE)
+_ATTR = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_MICRODATA = re.compile(r'<[a-z]+\b[^>]*\bitemprop\s*=\s*["\']price["\'][^>]*>', re.IGNORECASE)
+_ESTADO = re.compile(
+    r'<script[^>]*(?:id\s*=\s*["\']__NEXT_DATA__["\'][^>]*>|>\s*window\.__PRELOADED_STATE__\s*=)(.*?)</script>',
+    re.IGNORECASE | re.DOTALL,
+)
+_ASIGNACION_ESTADO = re.compile(r'^\s*window\.__PRELOADED_STATE__\s*=\s*')
+
+# Claves de precio en el estado embebido y objetos donde se aceptan: un
+# "amount" suelto puede ser el envío, las cuotas o el carrito
+PRECIO_EN_ESTADO = ('price', 'salePrice', 'amount')
+OBJETOS_PRODUCTO = ('product', 'offer', 'offers', 'item')
+
+META_PRICE_KEYS = ('product:price:amount', 'og:price:amount', 'price')
+
+
+def to_price(valor: Any) -> Optional[float]:
+    """
+    Convierte un valor de datos estructurados (formato máquina) en precio.
+
+    Args:
+        valor: Número o texto como '1299.00', '1,299.00' o '1.299,00'
+
+    Returns:
+        Precio positivo o None (también si el separador decimal es ambiguo)
+    """
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, (int, float)):
+        return float(valor) if valor > 0 else None
+    if isinstance(valor, str):
+        texto = _normalizar_decimal(valor.strip())
+        if texto and re.fullmatch(r'\d+(?:\.\d+)?', texto):
+            precio = float(texto)
+            return precio if precio > 0 else None
+    return None
+
+
+def _normalizar_decimal(texto: str) -> Optional[str]:
+    """
+    Deja un número con punto decimal y sin separadores de miles.
+
+    Args:
+        texto: Número como '1299.00', '1,299.00', '1.299,00' o '1299,5'
+
+    Returns:
+        Número normalizado ('1299.00') o None si es ambiguo
+    """
+    if ',' in texto and '.' in texto:
+        # El último separador es el decimal
+        miles, decimal = (',', '.') if texto.rfind('.') > texto.rfind(',') else ('.', ',')
+        texto = texto.replace(miles, '').replace(decimal, '.')
+    elif ',' in texto:
+        if re.fullmatch(r'\d{1,3}(?:,\d{3})+', texto):
+            texto = texto.replace(',', '')
+        elif texto.count(',') == 1:
+            texto = texto.replace(',', '.')
+        else:
+            return None
+    elif texto.count('.') > 1:
+        if not re.fullmatch(r'\d{1,3}(?:\.\d{3})+', texto):
+            return None
+        texto = texto.replace('.', '')
+    return texto
+
+
+def _precio_de_oferta(oferta: Any) -> Optional[float]:
+    """Precio de un objeto Offer / AggregateOffer de schema.org."""
+    if isinstance(oferta, list):
+        for item in oferta:
+            precio = _precio_de_oferta(item)
+            if precio is not None:
+                return precio
+        return None
+    if not isinstance(oferta, dict):
+        return None
+    for clave in ('price', 'lowPrice'):
+        precio = to_price(oferta.get(clave))
+        if precio is not None:
+            return precio
+    especificacion = oferta.get('priceSpecification')
+    if isinstance(especificacion, list):
+        especificacion = especificacion[0] if especificacion else None
+    if isinstance(especificacion, dict):
+        return to_price(especificacion.get('price'))
+    return None
+
+
+def _buscar_producto(nodo: Any) -> Optional[float]:
+    """Recorre un documento JSON-LD buscando un Product con ofertas."""
+    if isinstance(nodo, list):
+        for item in nodo:
+            precio = _buscar_producto(item)
+            if precio is not None:
+                return precio
+        return None
+    if not isinstance(nodo, dict):
+        return None
+    tipo = nodo.get('@type')
+    tipos = tipo if isinstance(tipo, list) else [tipo]
+    if 'Product' in tipos or 'Offer' in tipos or 'AggregateOffer' in tipos:
+        precio = _precio_de_oferta(nodo.get('offers', nodo))
+        if precio is not None:
+            return precio
+    if '@graph' in nodo:
+        return _buscar_producto(nodo['@graph'])
+    return None
+
+
+def price_from_jsonld(texto: str) -> Optional[float]:
+    """
+    Extrae el precio del contenido de un bloque <script type="application/ld+json">.
+
+    Args:
+        texto: Contenido JSON del bloque
+
+    Returns:
+        Precio o None
+    """
+    try:
+        return _buscar_producto(json.loads(texto))
+    except (ValueError, TypeError):
+        return None
+
+
+def _buscar_en_estado(nodo: Any, en_producto: bool = False) -> Optional[float]:
+    """Recorre el estado embebido tomando el precio solo de objetos de producto u oferta."""
+    if isinstance(nodo, list):
+        for item in nodo:
+            precio = _buscar_en_estado(item, en_producto)
+            if precio is not None:
+                return precio
+        return None
+    if not isinstance(nodo, dict):
+        return None
+    if en_producto:
+        for clave in PRECIO_EN_ESTADO:
+            valor = nodo.get(clave)
+            # {"price": {"amount": 1500}}
+            precio = _buscar_en_estado(valor, True) if isinstance(valor, dict) else to_price(valor)
+            if precio is not None:
+                return precio
+    for clave, valor in nodo.items():
+        precio = _buscar_en_estado(valor, clave.lower() in OBJETOS_PRODUCTO)
+        if precio is not None:
+            return precio
+    return None
+
+
+def price_from_state(texto: str) -> Optional[float]:
+    """
+    Extrae el precio de un estado embebido (__NEXT_DATA__ o __PRELOADED_STATE__).
+
+    Args:
+        texto: Contenido del <script> (JSON o asignación a window.__PRELOADED_STATE__)
+
+    Returns:
+        Precio de un objeto product/offer/item o None
+    """
+    texto = _ASIGNACION_ESTADO.sub('', texto).strip().rstrip(';')
+    try:
+        return _buscar_en_estado(json.loads(texto))
+    except (ValueError, TypeError, RecursionError):
+        return None
+
+
+def price_from_meta(get: Callable[[str], Optional[str]]) -> Optional[float]:
+    """
+    Extrae el precio de una metaetiqueta o elemento con microdatos.
+
+    Args:
+        get: Función que devuelve un atributo del elemento
+
+    Returns:
+        Precio o None si el elemento no describe un precio
+    """
+    clave = get('property') or get('name') or get('itemprop')
+    if clave and clave.lower() in META_PRICE_KEYS:
+        return to_price(get('content'))
+    return None
+
+
+def price_from_element(tag: str, get: Callable[[str], Optional[str]], text: Optional[str]) -> Optional[Tuple[float, str]]:
+    """
+    Evalúa un único elemento ya parseado (usado por la extracción en streaming).
+
+    Args:
+        tag: Nombre de la etiqueta
+        get: Función que devuelve un atributo del elemento
+        text: Texto interno del elemento
+
+    Returns:
+        Tupla (precio, fuente) o None
+    """
+    if tag == 'script':
+        tipo = (get('type') or '').lower()
+        if tipo == 'application/ld+json':
+            precio = price_from_jsonld(text or '')
+            return (precio, 'json-ld') if precio is not None else None
+        if get('id') == '__NEXT_DATA__' or (text or '').lstrip().startswith('window.__PRELOADED_STATE__'):
+            precio = price_from_state(text or '')
+            return (precio, 'embedded-state') if precio is not None else None
+        return None
+    if tag == 'meta' or get('itemprop'):
+        precio = price_from_meta(get)
+        if precio is not None:
+            return precio, 'meta' if tag == 'meta' else 'microdata'
+    return None
+
+
+def _atributos(etiqueta: str) -> Callable[[str], Optional[str]]:
+    """Parsea los atributos de una etiqueta de apertura."""
+    atributos = {nombre.lower(): doble or simple for nombre, doble, simple in _ATTR.findall(etiqueta)}
+    return atributos.get
+
+
+def extract_structured_price(html: Union[bytes, str]) -> Optional[Tuple[float, str]]:
+    """
+    Busca el precio en los datos estructurados de la página.
+
+    Args:
+        html: HTML crudo de la página
+
+    Returns:
+        Tupla (precio, fuente) con fuente en 'json-ld', 'meta', 'microdata'
+        o 'embedded-state'; None si no hay datos estructurados con precio
+    """
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+
+    for bloque in _JSON_LD.findall(html):
+        precio = price_from_jsonld(bloque)
+        if precio is not None:
+            return precio, 'json-ld'
+
+    for etiqueta in _META.findall(html):
+        precio = price_from_meta(_atributos(etiqueta))
+        if precio is not None:
+            return precio, 'meta'
+
+    for etiqueta in _MICRODATA.findall(html):
+        precio = to_price(_atributos(etiqueta)('content'))
+        if precio is not None:
+            return precio, 'microdata'
+
+    for bloque in _ESTADO.findall(html):
+        precio = price_from_state(bloque)
+        if precio is not None:
+            return precio, 'embedded-state'
+
+    return None
@@ -4,12 +4,47 @@ Coordina las operaciones entre el scraper y la base de datos.
 
 Author: HellSpawn
 """
-from typing import List, Dict, Optional
+import asyncio
+import sys
+from typing import Any, Awaitable, List, Dict, Optional
 from datetime import datetime
-import time
 
 from .database import Database
+from .http_client import close_http_engine
 from .scraper import PriceScraper
+from .rate_limiter import get_domain_scheduler
+
+
+async def cerrar_recursos():
+    """
+    Cierra el cliente HTTP y el pool de navegadores compartidos.
+    Ambos quedan ligados al event loop donde se crearon: fuera de FastAPI,
+    cada asyncio.run debe cerrarlos antes de terminar o Chromium queda huérfano.
+    """
+    await close_http_engine()
+    # Playwright solo se importó si hubo algún render
+    if 'src.browser_pool' in sys.modules:
+        from .browser_pool import close_browser_pool
+        await close_browser_pool()
+
+
+def ejecutar(corrutina: Awaitable[Any]) -> Any:
+    """
+    Ejecuta una operación asíncrona del tracker desde código síncrono
+    (scheduler, Streamlit) y libera los recursos compartidos al terminar.
+    
+    Args:
+        corrutina: Corrutina a ejecutar (p. ej. tracker.actualizar_todos_los_precios())
+    
+    Returns:
+        Resultado de la corrutina
+    """
+    async def con_cierre():
+        try:
+            return await corrutina
+        finally:
+            await cerrar_recursos()
+    return asyncio.run(con_cierre())
 
 
 class Tracker:
@@ -24,6 +59,7 @@ class Tracker:
         """
         self.db = Database(db_path)
         self.scraper = PriceScraper()
+        self.scheduler = get_domain_scheduler()
     
     async def agregar_producto(self, nombre: str, url: str, precio_objetivo: Optional[float] = None) -> Dict:
         """
@@ -95,43 +131,9 @@ class Tracker:
                     'producto_id': producto_id
                 }
             
-            # Extrae datos del producto
-            _, nombre, url, precio_objetivo, activo, _ = producto
-            
-            if not activo:
-                return {
-                    'exito': False,
-                    'mensaje': 'El producto está inactivo',
-                    'producto_id': producto_id
-                }
-            
             # Obtiene el precio actual
-            precio_actual = await self.scraper.get_price(url)
-            
-            if precio_actual is None:
-                return {
-                    'exito': False,
-                    'mensaje': 'No se pudo extraer el precio actual',
-                    'producto_id': producto_id
-                }
-            
-            # Registra el nuevo precio
-            self.db.agregar_precio_historial(producto_id, precio_actual)
-            
-            # Verifica si hay alerta
-            alerta = False
-            if precio_objetivo and precio_actual <= precio_objetivo:
-                alerta = True
-            
-            return {
-                'exito': True,
-                'mensaje': 'Precio actualizado exitosamente',
-                'producto_id': producto_id,
-                'nombre': nombre,
-                'precio_actual': precio_actual,
-                'precio_objetivo': precio_objetivo,
-                'alerta': alerta
-            }
+            precio_actual = await self.scraper.get_price(producto[2]) if producto[4] else None
+            return self._registrar_precio(producto, precio_actual)
             
         except Exception as e:
             return {
@@ -140,6 +142,52 @@ class Tracker:
                 'producto_id': producto_id
             }
     
+    def _registrar_precio(self, producto: tuple, precio_actual: Optional[float]) -> Dict:
+        """
+        Registra en el historial el precio obtenido para un producto.
+        
+        Args:
+            producto: Fila del producto (id, nombre, url, precio_objetivo, activo, fecha)
+            precio_actual: Precio extraído (None si no se pudo extraer)
+        
+        Returns:
+            Diccionario con el resultado de la actualización
+        """
+        # Extrae datos del producto
+        producto_id, nombre, url, precio_objetivo, activo, _ = producto
+        
+        if not activo:
+            return {
+                'exito': False,
+                'mensaje': 'El producto está inactivo',
+                'producto_id': producto_id
+            }
+        
+        if precio_actual is None:
+            return {
+                'exito': False,
+                'mensaje': 'No se pudo extraer el precio actual',
+                'producto_id': producto_id
+            }
+        
+        # Registra el nuevo precio
+        self.db.agregar_precio_historial(producto_id, precio_actual)
+        
+        # Verifica si hay alerta
+        alerta = False
+        if precio_objetivo and precio_actual <= precio_objetivo:
+            alerta = True
+        
+        return {
+            'exito': True,
+            'mensaje': 'Precio actualizado exitosamente',
+            'producto_id': producto_id,
+            'nombre': nombre,
+            'precio_actual': precio_actual,
+            'precio_objetivo': precio_objetivo,
+            'alerta': alerta
+        }
+    
     async def actualizar_todos_los_precios(self) -> List[Dict]:
         """
         Actualiza los precios de todos los productos activos.
@@ -147,17 +195,31 @@ class Tracker:
         Returns:
             Lista de diccionarios con los resultados de cada actualización
         """
-        productos = self.db.obtener_productos(solo_activos=True)
-        resultados = []
+        productos = [self.db.obtener_producto(p[0]) for p in self.db.obtener_productos(solo_activos=True)]
         
-        for producto in productos:
-            producto_id = producto[0]
-            resultado = await self.actualizar_precio(producto_id)
-            resultados.append(resultado)
-            
-            # Pausa breve entre solicitudes para no sobrecargar los servidores
-            time.sleep(2)
+        # MercadoLibre se resuelve en lote con la API; el resto lo espacia el
+        # programador por tienda, procesando tiendas distintas en paralelo
+        precios = await self.scraper.get_prices([p[2] for p in productos], scheduler=self.scheduler)
+        # Los límites aprendidos en la tanda sobreviven al cierre del proceso
+        self.scheduler.save()
         
+        resultados = []
+        for producto, precio in zip(productos, precios):
+            if isinstance(precio, Exception):
+                resultados.append({
+                    'exito': False,
+                    'mensaje': f'Error: {str(precio)}',
+                    'producto_id': producto[0]
+                })
+                continue
+            try:
+                resultados.append(self._registrar_precio(producto, precio))
+            except Exception as e:
+                resultados.append({
+                    'exito': False,
+                    'mensaje': f'Error: {str(e)}',
+                    'producto_id': producto[0]
+                })
         return resultados
     
     def obtener_resumen_productos(self) -> List[Dict]:
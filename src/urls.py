@@ -0,0 +1,112 @@
+"""
+Normalización de URLs de producto para el Price Tracker.
+Reduce las variantes de una misma página (mayúsculas en el host,
+fragmentos, parámetros de rastreo, hosts móviles, slugs con el título) a
+una forma canónica que sirve de clave para cachés y para la tabla de
+listados compartidos. Amazon se reduce al ASIN, MercadoLibre al ID del
+artículo y eBay al número de artículo.
+
+Author: HellSpawn
+"""
+import re
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Parámetros de campañas / referidos que no cambian el producto
+TRACKING_PARAMS = frozenset({
+    'gclid', 'fbclid', 'msclkid', 'ref', 'ref_', 'tag',
+    'pf_rd_p', 'pf_rd_r', 'pd_rd_r', 'pd_rd_w', 'pd_rd_wg', 'qid', 'sr', 'spm',
+    'tracking_id', 'matt_tool', 'reco_id', '_trksid',
+})
+
+_AMAZON_ASIN = re.compile(r'/(?:dp|gp/product|gp/aw/d|exec/obidos/asin|o/asin)/([A-Z0-9]{10})(?:[/?]|$)', re.IGNORECASE)
+_ML_ITEM = re.compile(r'\b(M[A-Z]{2})-?(\d{6,})', re.IGNORECASE)
+_ML_CATALOGO = re.compile(r'/p/(M[A-Z]{2}\d+)', re.IGNORECASE)
+_ML_HOST = re.compile(r'(mercadoli[bv]re)\.(.+)$')
+# Subdominio de los artículos según la marca (Brasil usa mercadolivre / produto)
+_ML_ARTICULO = {'mercadolibre': 'articulo', 'mercadolivre': 'produto'}
+_EBAY_ITEM = re.compile(r'/itm/(?:[^/?#]+/)?(\d{9,15})(?:[/?#]|$)')
+
+
+def _host(url: str) -> str:
+    """Host en minúsculas sin 'www.' ni prefijos móviles."""
+    host = (urlsplit(url.strip()).hostname or '').lower()
+    for prefijo in ('www.', 'm.', 'mobile.'):
+        if host.startswith(prefijo):
+            host = host[len(prefijo):]
+    return host
+
+
+def _canonical_amazon(url: str, host: str) -> Optional[str]:
+    """https://amazon.<tld>/dp/<ASIN>"""
+    coincidencia = _AMAZON_ASIN.search(urlsplit(url).path + '/')
+    if not coincidencia:
+        return None
+    return f"https://{host}/dp/{coincidencia.group(1).upper()}"
+
+
+def _canonical_mercadolibre(url: str, host: str) -> Optional[str]:
+    """
+    https://articulo.mercadolibre.<tld>/<SITIO>-<ID> (produto.mercadolivre.com.br
+    en Brasil) o https://<marca>.<tld>/p/<ID> para el catálogo.
+    """
+    marca = _ML_HOST.search(host)
+    if not marca:
+        return None
+    marca, tld = marca.groups()
+    path = urlsplit(url).path
+    catalogo = _ML_CATALOGO.search(path)
+    if catalogo:
+        return f"https://{marca}.{tld}/p/{catalogo.group(1).upper()}"
+    item = _ML_ITEM.search(path) or _ML_ITEM.search(urlsplit(url).query)
+    if not item:
+        return None
+    return f"https://{_ML_ARTICULO[marca]}.{marca}.{tld}/{item.group(1).upper()}-{item.group(2)}"
+
+
+def _canonical_ebay(url: str, host: str) -> Optional[str]:
+    """https://ebay.<tld>/itm/<número>"""
+    partes = urlsplit(url)
+    coincidencia = _EBAY_ITEM.search(partes.path + '/')
+    if coincidencia:
+        return f"https://{host}/itm/{coincidencia.group(1)}"
+    numero = dict(parse_qsl(partes.query)).get('item')
+    if numero and numero.isdigit():
+        return f"https://{host}/itm/{numero}"
+    return None
+
+
+def canonical_url(url: str) -> str:
+    """
+    Devuelve la forma canónica de una URL de producto.
+
+    Args:
+        url: URL tal como la escribió el usuario
+
+    Returns:
+        Para Amazon, MercadoLibre y eBay, la URL mínima del listado (ASIN, ID
+        del artículo o número de artículo). Para otras tiendas, la URL con
+        esquema y host en minúsculas, sin 'www.' ni prefijo móvil, sin
+        fragmento, sin parámetros de rastreo y con el resto ordenados.
+    """
+    host = _host(url)
+    tienda = None
+    if '.amazon.' in f'.{host}':
+        tienda = _canonical_amazon(url, host)
+    elif 'mercadolibre.' in host or 'mercadolivre.' in host:
+        tienda = _canonical_mercadolibre(url, host.replace('articulo.', '').replace('produto.', ''))
+    elif '.ebay.' in f'.{host}':
+        tienda = _canonical_ebay(url, host)
+    if tienda:
+        return tienda
+
+    partes = urlsplit(url.strip())
+    if partes.port:
+        host = f"{host}:{partes.port}"
+    parametros = sorted(
+        (clave, valor)
+        for clave, valor in parse_qsl(partes.query, keep_blank_values=True)
+        if clave.lower() not in TRACKING_PARAMS and not clave.lower().startswith('utm_')
+    )
+    path = partes.path.rstrip('/') or '/'
+    return urlunsplit(((partes.scheme or 'https').lower(), host, path, urlencode(parametros), ''))